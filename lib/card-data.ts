@@ -0,0 +1,57 @@
+// lib/card-data.ts
+
+import type { CardParent, DataManifest, SetShard } from './types';
+
+// Lazy loading of the per-set shards built by scripts/build_frontend_data.py.
+// Fetch the manifest once, then only the sets the user opens; shards are
+// requested with their content hash so the browser cache can keep them.
+// page.tsx still imports cards.json; public/data/ is not committed, so run
+// scripts/build_frontend_data.py before switching a page over to this.
+
+const MANIFEST_URL = '/data/manifest.json';
+
+let manifestPromise: Promise<DataManifest> | null = null;
+const shardCache = new Map<string, Promise<CardParent[]>>();
+
+export function loadManifest(): Promise<DataManifest> {
+  if (!manifestPromise) {
+    manifestPromise = fetch(MANIFEST_URL, { cache: 'no-cache' })
+      .then(res => {
+        if (!res.ok) throw new Error(`Failed to load ${MANIFEST_URL}: ${res.status}`);
+        return res.json() as Promise<DataManifest>;
+      })
+      .catch(err => {
+        manifestPromise = null; // allow a retry
+        throw err;
+      });
+  }
+  return manifestPromise;
+}
+
+export async function loadSet(setId: string): Promise<CardParent[]> {
+  const manifest = await loadManifest();
+  const info = manifest.sets.find(s => s.set === setId);
+  if (!info) return [];
+
+  const key = `${info.set}@${info.hash}`;
+  let shard = shardCache.get(key);
+  if (!shard) {
+    shard = fetch(`${info.url}?v=${info.hash}`)
+      .then(res => {
+        if (!res.ok) throw new Error(`Failed to load ${info.url}: ${res.status}`);
+        return res.json() as Promise<SetShard>;
+      })
+      .then(data => data.cards)
+      .catch(err => {
+        shardCache.delete(key);
+        throw err;
+      });
+    shardCache.set(key, shard);
+  }
+  return shard;
+}
+
+export async function loadSets(setIds: string[]): Promise<CardParent[]> {
+  const shards = await Promise.all(setIds.map(loadSet));
+  return shards.flat();
+}
@@ -7,6 +7,8 @@ export interface CardVariant {
   price_jpy: number; // <--- BACK TO JPY
   isHighDemand: boolean;
   source?: string; // Optional source URL from scraper
+  price_php?: number; // Precomputed by scripts/build_frontend_data.py (same rule as calculateVariantPrice)
+  thumbnails?: Record<string, string>; // Width -> local thumbnail, when images are mirrored
 }
 
 export interface CardParent {
@@ -16,4 +18,27 @@ export interface CardParent {
   color?: string; // Optional, not always present in scraped data
   set: string;
   variants: CardVariant[];
-}
\ No newline at end of file
+}
+
+// public/data/manifest.json, written by scripts/build_frontend_data.py
+export interface SetShardInfo {
+  set: string;
+  url: string; // e.g. /data/sets/op01.json
+  hash: string; // content hash, changes whenever the shard does
+  bytes: number;
+  cards: number;
+  variants: number;
+}
+
+export interface DataManifest {
+  version: number;
+  hash: string;
+  sets: SetShardInfo[];
+  search_index?: { url: string; hash: string; bytes: number }; // binary, see scripts/search_index.py
+}
+
+export interface SetShard {
+  version: number;
+  set: string;
+  cards: CardParent[];
+}
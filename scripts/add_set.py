@@ -1,5 +1,3 @@
-
-import json
 import os
 import sys
 import argparse
@@ -7,14 +5,35 @@ import argparse
 # Add current dir to path to import scrape_cards
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from scrape_cards import scrape_set, build_flat_database, DATA_FILE
+from scrape_cards import scrape_set, merge_into, new_unit_state, DATA_FILE
+from flat_builder import build_flat_database
+from set_registry import SetRegistry
+from card_store import CardStore
+from price_history import record_snapshot
+from build_frontend_data import build_frontend_data
+import run_metrics
 
-def add_set(set_code):
+def add_set(set_code, export=True):
     set_code = set_code.lower()
     print(f"🔄 Updating/Adding Set: {set_code.upper()}")
+    metrics = run_metrics.current()
     
     # 1. Scrape the new set
-    new_data = scrape_set(set_code)
+    state = new_unit_state()
+    with metrics.stage("scrape"):
+        new_data = scrape_set(set_code, state=state)
+
+    # A failed request says nothing about the set (and a partial scrape must
+    # not replace it), so neither the registry nor the store is touched
+    if state["error"]:
+        print(f"❌ {set_code.upper()} failed after page {state['pages_done']}: {state['error']}")
+        return
+
+    # Keep the set registry in sync so main() picks up / skips this code
+    registry = SetRegistry()
+    registry.record(set_code, sum(len(v) for v in new_data.values()))
+    registry.save()
+
     if not new_data:
         print(f"❌ No data found for {set_code}")
         return
@@ -22,50 +41,50 @@ def add_set(set_code):
     # 2. Flatten properly
     # Note: scrape_set returns {code: [variants...]}
     # build_flat_database expects exactly that
-    flat_new = build_flat_database(new_data)
+    # merge_into collapses a listing that shows up twice on the set pages
+    merged = {}
+    with metrics.stage("build_flat_database"):
+        merge_into(merged, new_data, {})
+        flat_new = build_flat_database(merged)
+    metrics.count("records", len(flat_new))
     print(f"✅ Scraped {len(flat_new)} cards for {set_code.upper()}")
 
-    # 3. Load existing DB
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            try:
-                db = json.load(f)
-            except:
-                db = []
-    else:
-        db = []
-    
-    print(f"📉 Current DB size: {len(db)}")
+    # 3. Load the card store (re-imports cards.json if it changed since the last export)
+    store = CardStore(json_path=DATA_FILE)
+    try:
+        store.sync_from_json()
+        print(f"📉 Current DB size: {store.count()}")
 
-    # 4. Remove existing entries for this set (to allow updating)
-    # We filter out cards where 'set' matches or 'card_code' starts with set prefix
-    # EB04-001 -> set is 'EB04' ideally.
-    # Check flat record structure: 'set': set_id
-    
-    original_count = len(db)
-    # Filter out by explicit set field match (case insensitive)
-    db = [c for c in db if c.get('set', '').lower() != set_code]
-    
-    # Also double check by card_code prefix just in case set parsing was weird
-    # But trusting 'set' field is safer if logic is sound.
-    # scrape_cards.py line 234: set_id = code.split("-")[0]
-    
-    removed_count = original_count - len(db)
-    if removed_count > 0:
-        print(f"🗑️ Removed {removed_count} old entries for {set_code.upper()}")
+        # 4. Replace this set's rows in one transaction
+        # Rows are matched on the 'set' field, case insensitive
+        # (scrape_cards.py build_flat_database: set_id = code.split("-")[0])
+        old_ids = {r["unique_id"] for r in store.iter_records(set_code)}
+        with metrics.stage("store_replace_set"):
+            removed_count = store.replace_set(set_code, flat_new)
+        if removed_count > 0:
+            print(f"🗑️ Removed {removed_count} old entries for {set_code.upper()}")
 
-    # 5. Append new
-    db.extend(flat_new)
-    
-    # 6. Save
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(db, f, indent=2, ensure_ascii=False)
-        
-    print(f"🎉 Success! New DB size: {len(db)}")
+        # 5. Export cards.json for the frontend
+        if export:
+            with metrics.stage("write_cards_json"): store.export_json()
+            with metrics.stage("frontend_data"): build_frontend_data(store.iter_records())
+            print(f"🎉 Success! New DB size: {store.count()}")
+        else:
+            print(f"🎉 Success! Store size: {store.count()} (cards.json not exported)")
+        # Only this set was scraped; the other sets keep their last prices
+        with metrics.stage("price_history"):
+            record_snapshot(flat_new, partial=True, removed=old_ids - {r["unique_id"] for r in flat_new})
+    finally:
+        store.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Add or Update a specific set")
     parser.add_argument("set_code", help="Set code to add, e.g. eb04")
+    parser.add_argument("--no-export", action="store_true", help="Only update the card store, leave cards.json as is")
     args = parser.parse_args()
     
-    add_set(args.set_code)
+    run_metrics.start("add_set")
+    try:
+        add_set(args.set_code, export=not args.no_export)
+    finally:
+        run_metrics.finish()
@@ -0,0 +1,481 @@
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import multiprocessing
+import platform
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from scrape_cards import (
+    CODE_REGEX, VARIANTS, classify_tile, classify_variant, collect_page, extract_price,
+    find_product_container, merge_into, new_unit_state,
+)
+from tile_extractor import Tile, extract_tiles
+from flat_builder import build_flat_database
+from fixture_server import FIXTURE_DIR
+from card_store import CardStore
+from parse_pool import InlineParser, ParsePool
+from translate_cards import StubBackend, TranslationCache, apply_translations, decompose_name, needs_translation
+
+# Offline benchmarks over recorded yuyu-tei pages (see fixture_server.py).
+#
+#   python scripts/benchmark.py extract [--fixtures DIR] [--repeat N]
+#   python scripts/benchmark.py classify [--fixtures DIR] [--repeat N]
+#   python scripts/benchmark.py memory [--fixtures DIR] [--repeat N]   # N copies of the corpus
+#   python scripts/benchmark.py parse [--fixtures DIR] [--workers 0 1 2 4]
+#   python scripts/benchmark.py suite [--fixtures DIR] [--save-baseline] [--tolerance 0.2]
+#
+# `suite` times every offline stage of a scrape over the corpus (container
+# lookup, page extraction, classification, flattening, translation apply,
+# the cards.json write) and reports pages/sec, records/sec and peak traced
+# memory per stage. It compares against the baseline stored next to the
+# corpus (fixtures/benchmark_baseline.json). A stage more than --tolerance
+# slower or bigger, or one whose output changed, fails the run. Record a
+# new baseline with --save-baseline after an intended change.
+#
+# `parse` runs the scraper's fetch -> parse -> merge pipeline over the corpus
+# with every page already "fetched", once per parse_pool worker count, and
+# reports pages/sec against inline parsing. The merged master must be the
+# same for every worker count.
+
+# -------------------- REFERENCE --------------------
+def legacy_tiles(html):
+    # The pre-tile_extractor path: BeautifulSoup tree + per-<img> parent walk
+    soup = BeautifulSoup(html, "html.parser")
+    product_imgs = soup.find_all("img", attrs={"alt": True})
+    if not product_imgs: return None
+    tiles = []
+    for img in product_imgs:
+        container = find_product_container(img) or img.parent
+        h4 = container.find("h4")
+        tiles.append(Tile(
+            (img.get("alt") or "").strip(),
+            img.get("data-original") or img.get("src"),
+            str(container),
+            container.get_text(" ", strip=True),
+            h4.get_text(" ", strip=True) if h4 else None,
+        ))
+    return tiles
+
+LEGACY_RARITY_REGEX = re.compile(r"(P-SEC|P-SR|P-R|P-L|SEC|SR|R|L|SP|UC|C|DON!!)")
+
+def legacy_extract_rarity(text):
+    if "DON" in text or "ドン" in text:
+        return "DON"
+    m = LEGACY_RARITY_REGEX.search(text or "")
+    return m.group(1) if m else None
+
+def legacy_classify_variant(text, price, index):
+    label = "Base / Normal"
+    rank = 0
+    is_high = False
+    for jp, en, r in VARIANTS:
+        if jp in text:
+            if r > rank:
+                label = en
+                rank = r
+    if price >= 5000 and rank == 0:
+        label = "High Value Variant (Unknown Type)"
+        rank = 6
+    elif price >= 1500 and rank == 0:
+        label = "Parallel (Unmarked)"
+        rank = 5
+    if rank == 0 and index > 0:
+        label = f"Variant #{index + 1}"
+    if rank >= 5: is_high = True
+    return label, rank, is_high
+
+def legacy_classify_tile(alt, container_text, price, index):
+    rarity = legacy_extract_rarity(alt) or legacy_extract_rarity(container_text)
+    return (rarity, *legacy_classify_variant(alt + " " + container_text, price, index))
+
+def legacy_collect_page(html, page_url, state, don_prefix, default_rarity):
+    # collect_page before variant_record.Variant: one dict per variant
+    tiles = extract_tiles(html)
+    if not tiles: return None
+    cards, code_counts, seen = state["cards"], state["code_counts"], state["seen"]
+    found = 0
+    for tile in tiles:
+        alt = tile.alt
+        code_match = CODE_REGEX.search(alt)
+        if code_match: code = code_match.group(0).upper()
+        elif "DON" in alt or "ドン" in alt: code = f"DON-{don_prefix}-{found+1:03d}"
+        else: continue
+        if tile.signature in seen: continue
+        seen.add(tile.signature)
+        price = extract_price(tile.text) or extract_price(alt)
+        code_counts[code] = code_counts.get(code, -1) + 1
+        rarity, label, rank, is_high = classify_tile(alt, tile.text, price, code_counts[code])
+        cards.setdefault(code, []).append({
+            "label": label,
+            "name": tile.name or alt.replace(code, "").strip(),
+            "rarity": rarity if rarity else default_rarity,
+            "price": price,
+            "rank": rank,
+            "is_high_rarity": is_high,
+            "image": tile.image,
+            "source_url": page_url,
+        })
+        found += 1
+    return found
+
+def fixture_pages(root=FIXTURE_DIR):
+    paths = sorted(glob.glob(os.path.join(root, "**", "*.html"), recursive=True))
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            pages.append((os.path.relpath(path, root), f.read()))
+    return pages
+
+def time_per_page(fn, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _, html in pages: fn(html)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(pages)
+
+# -------------------- BENCHMARKS --------------------
+def bench_extract(pages, repeat):
+    # Both paths must see the same tiles; the signature differs by design
+    # (raw markup vs re-serialized markup) so it is compared by grouping.
+    mismatches = 0
+    for rel, html in pages:
+        old, new = legacy_tiles(html), extract_tiles(html)
+        same = (old is None) == (new is None)
+        if same and old is not None:
+            same = [t[:2] + t[3:] for t in old] == [t[:2] + t[3:] for t in new] and \
+                _groups([t.signature for t in old]) == _groups([t.signature for t in new])
+        if not same:
+            mismatches += 1
+            print(f"   ❌ tile mismatch: {rel}")
+
+    legacy = time_per_page(legacy_tiles, pages, repeat)
+    single = time_per_page(extract_tiles, pages, repeat)
+    print(f"📄 {len(pages)} pages, {mismatches} mismatches")
+    print(f"   legacy (bs4 + parent walk): {legacy * 1000:8.2f} ms/page")
+    print(f"   extract_tiles:             {single * 1000:8.2f} ms/page  ({legacy / single:.1f}x)")
+    return mismatches == 0
+
+def bench_classify(pages, repeat):
+    # Tile texts from the corpus, each with a few prices/indexes so the
+    # price fallbacks and Variant #N labelling are exercised as well
+    cases = []
+    for _, html in pages:
+        for t in extract_tiles(html) or []:
+            for price, index in ((0, 0), (1500, 1), (6000, 2)):
+                cases.append((t.alt, t.text, price, index))
+    if not cases:
+        print("❌ No tiles in the corpus")
+        return False
+
+    mismatches = sum(1 for c in cases if legacy_classify_tile(*c) != classify_tile(*c))
+
+    def run(fn):
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for c in cases: fn(*c)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        return best / len(cases)
+
+    legacy = run(legacy_classify_tile)
+    single = run(classify_tile)
+    print(f"🏷️ {len(cases)} tile texts, {mismatches} mismatches")
+    print(f"   legacy (substring scans + regex): {legacy * 1e6:7.2f} µs/tile")
+    print(f"   classify_tile:                    {single * 1e6:7.2f} µs/tile  ({legacy / single:.1f}x)")
+    return mismatches == 0
+
+def build_master(pages, copies, collect):
+    # The corpus parsed `copies` times as separate units, the way a full run
+    # accumulates set and search results in one master dict
+    master = {}
+    for copy in range(copies):
+        state = new_unit_state()
+        for rel, html in pages:
+            state["page_seen"], state["page_cards"] = [], []
+            collect(html, f"https://yuyu-tei.jp/{copy}/{rel}", state, "OP01", "COMMON")
+        for code, variants in state["cards"].items():
+            master.setdefault(f"{copy}:{code}", []).extend(variants)
+    return master
+
+def _measure(pages, copies, collect):
+    # Runs in a child process: -> (variants, bytes held by master, peak RSS in KB)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    master = build_master(pages, copies, collect)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return sum(len(v) for v in master.values()), held, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _measure_rss(pages, copies, collect):
+    # Same build without tracemalloc's bookkeeping, for a clean peak RSS
+    master = build_master(pages, copies, collect)
+    return sum(len(v) for v in master.values()), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def bench_memory(pages, copies):
+    # Both representations must hold the same data
+    new = build_master(pages[:50], 1, collect_page)
+    old = build_master(pages[:50], 1, legacy_collect_page)
+    same = {k: [v.to_dict() for v in vs] for k, vs in new.items()} == old
+    del new, old
+
+    # Fresh processes so one run's garbage does not inflate the other's RSS
+    ctx = multiprocessing.get_context("fork")
+    results = {}
+    for name, collect in (("dict", legacy_collect_page), ("Variant", collect_page)):
+        with ctx.Pool(1) as pool:
+            variants, held, _ = pool.apply(_measure, (pages, copies, collect))
+        with ctx.Pool(1) as pool:
+            _, rss = pool.apply(_measure_rss, (pages, copies, collect))
+        results[name] = (variants, held, rss)
+
+    (n, old_held, old_rss), (_, new_held, new_rss) = results["dict"], results["Variant"]
+    print(f"🧠 {n} variants ({copies}x {len(pages)} pages), {'same data' if same else '❌ data differs'}")
+    print(f"   dict records:    {old_held / 1024 / 1024:7.1f} MB held ({old_held / n:.0f} B/variant), peak RSS {old_rss / 1024:.0f} MB")
+    print(f"   Variant records: {new_held / 1024 / 1024:7.1f} MB held ({new_held / n:.0f} B/variant), peak RSS {new_rss / 1024:.0f} MB "
+          f"({1 - new_held / old_held:.0%} less held)")
+    return same
+
+# -------------------- SUITE --------------------
+BASELINE_FILE = os.path.join(os.path.dirname(FIXTURE_DIR), "benchmark_baseline.json")
+
+def digest(data):
+    return hashlib.sha256(json.dumps(data, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+def corpus_units(pages):
+    # Pages grouped the way the scraper sees them: one unit per set/keyword
+    # directory, pages in page order
+    units = {}
+    for rel, html in pages:
+        unit, name = os.path.split(rel)
+        number = os.path.splitext(name)[0]
+        units.setdefault(unit, []).append((int(number) if number.isdigit() else 0, rel, html))
+    return {unit: [(rel, html) for _, rel, html in sorted(found)] for unit, found in sorted(units.items())}
+
+def extract_master(units):
+    master, seen = {}, {}
+    for unit, unit_pages in units.items():
+        state = new_unit_state()
+        prefix = unit.split(os.sep)[-1].upper()
+        for rel, html in unit_pages:
+            state["page_seen"], state["page_cards"] = [], []
+            if collect_page(html, f"https://yuyu-tei.jp/{rel}", state, prefix, "COMMON") is None: break
+        merge_into(master, state["cards"], seen)
+    return master
+
+MIN_SAMPLE = 0.2   # seconds; quick stages are looped until a sample takes this long
+
+def run_stage(fn, repeat, setup=None):
+    # -> (best wall time per call, peak traced bytes, result). setup() builds
+    # fresh input for stages that modify it, outside the timed part.
+    t0 = time.perf_counter()
+    fn(setup() if setup else None)
+    loops = max(1, int(MIN_SAMPLE / max(time.perf_counter() - t0, 1e-6)))
+    best = None
+    for _ in range(repeat):
+        args = [setup() if setup else None for _ in range(loops)]
+        t0 = time.perf_counter()
+        for arg in args: fn(arg)
+        elapsed = (time.perf_counter() - t0) / loops
+        best = elapsed if best is None else min(best, elapsed)
+    arg = setup() if setup else None
+    tracemalloc.start()
+    result = fn(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, result
+
+def run_suite(pages, repeat):
+    # -> {stage: {"seconds", "pages", "records", "peak_kb", "digest"}}
+    units = corpus_units(pages)
+    master = extract_master(units)
+    db = build_flat_database(master)
+    cases = [(t.alt + " " + t.text, price, index)
+             for _, html in pages for t in extract_tiles(html) or []
+             for price, index in ((0, 0), (1500, 1), (6000, 2))]
+
+    workdir = tempfile.mkdtemp(prefix="optcg-bench-")
+    cache = TranslationCache(os.path.join(workdir, "translation_cache.json"))
+    bases = sorted({decompose_name(r["base_name"])[0] for r in db if r.get("base_name") and needs_translation(r["base_name"])})
+    cache.add_many(zip(bases, StubBackend().translate_batch(bases)))
+    store = CardStore(os.path.join(workdir, "cards.sqlite"), json_path=os.path.join(workdir, "cards.json"))
+    store.replace_all(db)
+
+    def write(_):
+        store.export_json()
+        with open(store.json_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    stages = [
+        # name, fn(setup result) -> output, setup, pages, records
+        ("container", lambda _: [t and [tuple(x[:2]) + tuple(x[3:]) for x in t] for t in map(legacy_tiles, (h for _, h in pages))],
+         None, len(pages), None),
+        ("extract", lambda _: {k: [v.to_dict() for v in vs] for k, vs in extract_master(units).items()},
+         None, len(pages), sum(len(v) for v in master.values())),
+        ("classify", lambda _: [classify_variant(*c) for c in cases], None, None, len(cases)),
+        ("flatten", lambda _: build_flat_database(master), None, None, len(db)),
+        ("translate", lambda cards: (apply_translations(cards, cache), [c["base_name"] for c in cards])[1],
+         lambda: [dict(r) for r in db], None, len(db)),
+        ("write", write, None, None, len(db)),
+    ]
+    results = {}
+    try:
+        for name, fn, setup, n_pages, n_records in stages:
+            seconds, peak, output = run_stage(fn, repeat, setup)
+            results[name] = {
+                "seconds": round(seconds, 6),
+                "pages_per_sec": round(n_pages / seconds, 1) if n_pages else None,
+                "records_per_sec": round(n_records / seconds, 1) if n_records else None,
+                "peak_kb": peak // 1024,
+                "digest": digest(output),
+            }
+    finally:
+        store.close()
+        cache.compact()
+    return results
+
+def corpus_info(pages):
+    return {"pages": len(pages), "bytes": sum(len(h) for _, h in pages), "digest": digest([rel for rel, _ in pages])}
+
+def compare(results, baseline, tolerance):
+    # -> list of problems against the baseline
+    problems = []
+    for name, now in results.items():
+        old = baseline.get(name)
+        if not old: continue
+        if now["seconds"] > old["seconds"] * (1 + tolerance):
+            problems.append(f"{name}: {now['seconds'] / old['seconds'] - 1:.0%} slower")
+        if now["peak_kb"] > old["peak_kb"] * (1 + tolerance) + 64:
+            problems.append(f"{name}: peak memory {old['peak_kb']} -> {now['peak_kb']} KB")
+        if now["digest"] != old["digest"]:
+            problems.append(f"{name}: output changed")
+    return problems
+
+def bench_suite(pages, repeat, baseline_path=BASELINE_FILE, save=False, tolerance=0.2):
+    corpus = corpus_info(pages)
+    results = run_suite(pages, repeat)
+    baseline = None
+    if os.path.exists(baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print(f"⏱️ {corpus['pages']} pages ({corpus['bytes'] / 1024 / 1024:.1f} MB), best of {repeat}")
+    print(f"   {'stage':<10} {'time':>9} {'pages/s':>9} {'records/s':>11} {'peak':>9}  vs baseline")
+    for name, r in results.items():
+        old = (baseline or {}).get("stages", {}).get(name)
+        vs = f"{old['seconds'] / r['seconds']:.2f}x speed" if old else "-"
+        if old and old["digest"] != r["digest"]: vs += ", output changed"
+        print(f"   {name:<10} {r['seconds'] * 1000:7.1f}ms {r['pages_per_sec'] or '':>9} {r['records_per_sec'] or '':>11} "
+              f"{r['peak_kb']:>7}KB  {vs}")
+
+    if save:
+        os.makedirs(os.path.dirname(baseline_path) or ".", exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump({"corpus": corpus, "python": platform.python_version(), "created_at": int(time.time()),
+                       "stages": results}, f, indent=2)
+        print(f"💾 Baseline saved to {baseline_path}")
+        return True
+    if baseline is None:
+        print(f"ℹ️ No baseline at {baseline_path} yet (run with --save-baseline)")
+        return True
+    if baseline.get("corpus", {}).get("digest") != corpus["digest"]:
+        print("⚠️ The baseline was recorded on a different corpus; re-record it with --save-baseline")
+        return True
+    problems = compare(results, baseline.get("stages", {}), tolerance)
+    for p in problems: print(f"   ❌ {p}")
+    if not problems: print(f"✅ Within {tolerance:.0%} of the baseline")
+    return not problems
+
+# -------------------- PARSE POOL --------------------
+async def pipeline_master(units, parser):
+    # scrape_pages without the network: all pages of all units are queued
+    # for parsing at once, results are applied per unit in page order
+    tasks = {unit: [asyncio.ensure_future(parser.parse(html)) for _, html in unit_pages]
+             for unit, unit_pages in units.items()}
+    master, seen = {}, {}
+    try:
+        for unit, unit_pages in units.items():
+            state = new_unit_state()
+            prefix = unit.split(os.sep)[-1].upper()
+            for (rel, html), task in zip(unit_pages, tasks[unit]):
+                parsed = await task
+                state["page_seen"], state["page_cards"] = [], []
+                if collect_page(html, f"https://yuyu-tei.jp/{rel}", state, prefix, "COMMON", tiles=parsed.tiles) is None:
+                    break
+            merge_into(master, state["cards"], seen)
+    finally:
+        for unit_tasks in tasks.values():
+            for task in unit_tasks: task.cancel()
+        await asyncio.gather(*(t for unit_tasks in tasks.values() for t in unit_tasks), return_exceptions=True)
+    return master
+
+def bench_parse(pages, repeat, workers_list):
+    units = corpus_units(pages)
+    cores = os.cpu_count() or 1
+    print(f"🧵 {len(pages)} pages, {cores} CPU core(s)")
+    expected = None
+    inline = None
+    ok = True
+    for workers in workers_list:
+        parser = ParsePool(workers) if workers else InlineParser()
+        try:
+            asyncio.run(parser.parse(pages[0][1]))   # start the worker processes
+            best = None
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                master = asyncio.run(pipeline_master(units, parser))
+                elapsed = time.perf_counter() - t0
+                best = elapsed if best is None else min(best, elapsed)
+        finally:
+            parser.close()
+        output = digest({k: [v.to_dict() for v in vs] for k, vs in master.items()})
+        expected = expected or output
+        inline = inline or best
+        same = output == expected
+        ok &= same
+        print(f"   {workers or 'inline':>6} workers: {len(pages) / best:8.1f} pages/s  ({inline / best:.2f}x)  "
+              f"{'same master' if same else '❌ master differs'}")
+    if cores < max(workers_list): print(f"   ⚠️ More workers than cores: speedups above {cores}x are not possible here")
+    return ok
+
+def _groups(keys):
+    # Partition of positions by equal key, independent of the key values
+    first = {}
+    return [first.setdefault(k, i) for i, k in enumerate(keys)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline scraper benchmarks")
+    parser.add_argument("bench", choices=["extract", "classify", "memory", "suite", "parse"])
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="suite: baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="suite: store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="suite: allowed slowdown / memory growth")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4], help="parse: worker counts to compare")
+    args = parser.parse_args()
+
+    pages = fixture_pages(args.fixtures)
+    if not pages:
+        print(f"❌ No fixture pages under {args.fixtures} (record some with fixture_server.py)")
+        sys.exit(1)
+
+    if args.bench == "extract": ok = bench_extract(pages, args.repeat)
+    elif args.bench == "memory": ok = bench_memory(pages, args.repeat)
+    elif args.bench == "suite": ok = bench_suite(pages, args.repeat, args.baseline, args.save_baseline, args.tolerance)
+    elif args.bench == "parse": ok = bench_parse(pages, args.repeat, args.workers)
+    else: ok = bench_classify(pages, args.repeat)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,205 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from card_store import CardStore
+from search_index import build_index
+
+# Precomputed data for the site: one minified shard per set under
+# public/data/sets/, already grouped into the CardParent / CardVariant shape
+# of lib/types.ts, plus public/data/manifest.json listing the sets. With
+# lib/card-data.ts a page fetches the manifest and then only the shards of
+# the sets that are opened, instead of bundling the whole of cards.json.
+#
+#   python scripts/build_frontend_data.py    # from the card store / cards.json
+#
+# scrape_cards.py, add_set.py and refresh_prices.py run this after writing
+# cards.json. Shards whose content did not change are not rewritten, and each
+# manifest entry carries a content hash to use as a cache buster. The search
+# index (search_index.py) is rebuilt next to them and listed in the manifest.
+# public/data/ is build output like the card store and is not committed; it
+# has to be built from the same cards.json that is deployed.
+
+# -------------------- CONFIG --------------------
+PROJECT_ROOT = os.getcwd()
+DATA_FILE = os.path.join(PROJECT_ROOT, "src", "data", "cards.json")
+OUT_DIR = os.path.join(PROJECT_ROOT, "public", "data")
+PUBLIC_PREFIX = "/data"
+MANIFEST_NAME = "manifest.json"
+SHARD_DIR = "sets"
+INDEX_NAME = "search-index.bin"
+FORMAT_VERSION = 1
+
+# Same rule as calculateVariantPrice in lib/market-utils.ts
+JPY_TO_PHP_RATE = 0.35
+
+# -------------------- PRICES --------------------
+def php_price(jpy):
+    # Python floats are IEEE doubles like JS numbers, so ceil(jpy * 0.35)
+    # lands on the same integer the browser would compute
+    if not jpy: return 0
+    php = math.ceil(jpy * JPY_TO_PHP_RATE)
+    if php > 50: php = math.ceil(php / 10) * 10
+    return php
+
+# -------------------- GROUPING --------------------
+def code_sort_key(code):
+    # OP01-002 before OP01-010; same order as the card grid in page.tsx
+    prefix, _, number = code.partition("-")
+    return (prefix, 0, int(number), code) if number.isdigit() else (prefix, 1, 0, code)
+
+def set_of(r):
+    return r.get("set") or r["card_code"].split("-")[0]
+
+def shard_name(set_id):
+    return re.sub(r"[^a-z0-9_-]", "_", set_id.lower()) + ".json"
+
+def to_variant(r):
+    variant = {
+        "variant_id": r["unique_id"],
+        "variant_name": r.get("variant_name", ""),
+        "rarity": r.get("rarity", ""),
+        "finish": r.get("finish", ""),
+        "image_url": r.get("image_url") or r.get("official_image_url") or "",
+        "price_jpy": r.get("price_jpy") or 0,
+        "price_php": php_price(r.get("price_jpy")),
+        "isHighDemand": bool(r.get("is_high_demand")),
+    }
+    if r.get("thumbnails"): variant["thumbnails"] = r["thumbnails"]
+    return variant
+
+def group_records(records):
+    # -> {set: [CardParent, ...]} with cards in code order and variants in
+    # record order (build_flat_database already sorts them by price)
+    sets = {}
+    for r in records:
+        set_id = set_of(r)
+        cards = sets.setdefault(set_id, {})
+        card = cards.get(r["card_code"])
+        if card is None:
+            card = cards[r["card_code"]] = {
+                "card_code": r["card_code"],
+                "base_name": r.get("base_name") or r["card_code"],
+                "set": set_id,
+                "variants": [],
+            }
+        card["variants"].append(to_variant(r))
+    return {s: [cards[c] for c in sorted(cards, key=code_sort_key)] for s, cards in sets.items()}
+
+# -------------------- OUTPUT --------------------
+def dump(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def write_if_changed(path, body):
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if f.read() == body: return False
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f: f.write(body)
+    os.replace(tmp, path)
+    return True
+
+def load_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path): return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == FORMAT_VERSION else None
+
+def build_frontend_data(records, out_dir=OUT_DIR, prefix=PUBLIC_PREFIX, changed_sets=None):
+    # Writes the shards and the manifest; -> manifest. With changed_sets (the
+    # sets whose records changed since the last build, see flat_builder) the
+    # other sets keep their shard and manifest entry as they are, and an
+    # unchanged build does not rebuild the search index either.
+    started = time.time()
+    records = list(records)
+    shard_dir = os.path.join(out_dir, SHARD_DIR)
+    os.makedirs(shard_dir, exist_ok=True)
+
+    previous = load_manifest(out_dir) if changed_sets is not None else None
+    kept = {}
+    if previous is not None:
+        changed_sets = set(changed_sets)
+        for e in previous["sets"]:
+            if e["set"] not in changed_sets and e["url"].startswith(prefix + "/") and os.path.exists(os.path.join(shard_dir, shard_name(e["set"]))):
+                kept[e["set"]] = e
+
+    present = {set_of(r) for r in records}
+    kept = {s: e for s, e in kept.items() if s in present}
+    entries = list(kept.values())
+    written = {shard_name(s) for s in kept}
+    changed = 0
+    for set_id, cards in group_records([r for r in records if set_of(r) not in kept]).items():
+        name = shard_name(set_id)
+        body = dump({"version": FORMAT_VERSION, "set": set_id, "cards": cards})
+        changed += write_if_changed(os.path.join(shard_dir, name), body)
+        written.add(name)
+        entries.append({
+            "set": set_id,
+            "url": f"{prefix}/{SHARD_DIR}/{name}",
+            "hash": hashlib.sha256(body).hexdigest()[:12],
+            "bytes": len(body),
+            "cards": len(cards),
+            "variants": sum(len(c["variants"]) for c in cards),
+        })
+    entries.sort(key=lambda e: e["set"])
+
+    # Shards of sets that are gone
+    for name in os.listdir(shard_dir):
+        if name.endswith(".json") and name not in written:
+            os.remove(os.path.join(shard_dir, name))
+
+    index_path = os.path.join(out_dir, INDEX_NAME)
+    if previous is not None and not changed_sets and "search_index" in previous and os.path.exists(index_path):
+        search_index = previous["search_index"]
+    else:
+        build_index(records, index_path)
+        with open(index_path, "rb") as f:
+            index_body = f.read()
+        search_index = {
+            "url": f"{prefix}/{INDEX_NAME}",
+            "hash": hashlib.sha256(index_body).hexdigest()[:12],
+            "bytes": len(index_body),
+        }
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "hash": hashlib.sha256("".join(e["hash"] for e in entries).encode()).hexdigest()[:12],
+        "sets": entries,
+        "search_index": search_index,
+    }
+    write_if_changed(os.path.join(out_dir, MANIFEST_NAME), dump(manifest))
+    total = sum(e["bytes"] for e in entries)
+    print(f"🧩 Frontend data: {len(entries)} set shards ({total / 1024:.0f} KB, {changed} rewritten, {len(kept)} unchanged) "
+          f"in {time.time() - started:.1f}s")
+    return manifest
+
+def main(out_dir=OUT_DIR):
+    store = CardStore(json_path=DATA_FILE)
+    try:
+        store.sync_from_json()
+        records = list(store.iter_records())
+    finally:
+        store.close()
+    if not records:
+        print(f"❌ No records in {DATA_FILE}")
+        return False
+    build_frontend_data(records, out_dir)
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build per-set frontend data shards from cards.json")
+    parser.add_argument("--out", default=OUT_DIR, help="Output directory (served as /data)")
+    args = parser.parse_args()
+
+    sys.exit(0 if main(args.out) else 1)
@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+from cards_file import CARDS_FORMAT, WRITERS, iter_records, write_records
+
+# Indexed local store for the flat records produced by build_flat_database.
+#
+# cards.json stays the artifact the frontend imports; it is exported from
+# this store. Replacing one set only touches that set's rows, and the
+# export streams rows straight to a temp file that is renamed over
+# cards.json (cards_file.py), so concurrent runs never leave a half-written
+# file; imports read it back one record at a time.
+#
+#   python scripts/card_store.py import   # (re)load src/data/cards.json
+#   python scripts/card_store.py export [--format pretty]   # write src/data/cards.json
+#   python scripts/card_store.py stats
+
+PROJECT_ROOT = os.getcwd()
+DATA_FILE = os.path.join(PROJECT_ROOT, "src", "data", "cards.json")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,  -- export order (append order, like the old list)
+    key TEXT NOT NULL UNIQUE,               -- unique_id, or unique_id#n for a colliding record
+    unique_id TEXT NOT NULL,
+    card_code TEXT NOT NULL,
+    set_id TEXT NOT NULL,
+    rarity TEXT,
+    data TEXT NOT NULL                       -- the record as JSON
+);
+CREATE INDEX IF NOT EXISTS cards_uid ON cards(unique_id);
+CREATE INDEX IF NOT EXISTS cards_set ON cards(set_id COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS cards_code ON cards(card_code);
+CREATE INDEX IF NOT EXISTS cards_rarity ON cards(rarity);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+UPSERT = """
+INSERT INTO cards (key, unique_id, card_code, set_id, rarity, data) VALUES (?1, ?1, ?2, ?3, ?4, ?5)
+ON CONFLICT(key) DO UPDATE SET
+    card_code = excluded.card_code, set_id = excluded.set_id,
+    rarity = excluded.rarity, data = excluded.data
+"""
+INSERT = "INSERT OR IGNORE INTO cards (key, unique_id, card_code, set_id, rarity, data) VALUES (?, ?, ?, ?, ?, ?)"
+
+def store_path_for(json_path):
+    # cards.json -> cards.sqlite next to it
+    return os.path.splitext(json_path)[0] + ".sqlite"
+
+def _row(record):
+    return (
+        record["unique_id"],
+        record.get("card_code", ""),
+        record.get("set", ""),
+        record.get("rarity"),
+        json.dumps(record, ensure_ascii=False),
+    )
+
+# -------------------- STORE --------------------
+# unique_id is not unique in practice (a reprint scraped from another set can
+# produce the same unique_id), so rows are keyed by `key`: appends keep
+# a colliding record as unique_id#n, exactly like extending the old list did,
+# while upsert() updates the row whose key is the unique_id.
+class CardStore:
+    def __init__(self, path=None, json_path=DATA_FILE):
+        self.json_path = json_path
+        self.path = path or store_path_for(json_path)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        self.db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def _begin(self):
+        # Takes the write lock up front so concurrent writers queue instead of failing
+        self.db.execute("BEGIN IMMEDIATE")
+
+    def _write(self, fn, *args):
+        self._begin()
+        try:
+            result = fn(*args)
+            self.db.execute("COMMIT")
+            return result
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def count(self, set_id=None):
+        if set_id is None:
+            return self.db.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+        return self.db.execute("SELECT COUNT(*) FROM cards WHERE set_id = ? COLLATE NOCASE", (set_id,)).fetchone()[0]
+
+    def upsert(self, records):
+        # Insert or update by unique_id; updated rows keep their position
+        return self._write(self._upsert, records)
+
+    def _upsert(self, records):
+        self.db.executemany(UPSERT, (_row(r) for r in records))
+
+    def _append(self, records):
+        for r in records:
+            row = _row(r)
+            if self.db.execute(INSERT, (row[0], *row)).rowcount: continue
+            n = 1
+            while not self.db.execute(INSERT, (f"{row[0]}#{n}", *row)).rowcount: n += 1
+
+    def replace_set(self, set_id, records):
+        # Drop every row of `set_id` (case-insensitive) and add `records`, atomically.
+        # Returns the number of rows removed.
+        return self._write(self._replace_set, set_id, records)
+
+    def _replace_set(self, set_id, records):
+        removed = self.db.execute("DELETE FROM cards WHERE set_id = ? COLLATE NOCASE", (set_id,)).rowcount
+        self._append(records)
+        return removed
+
+    def replace_all(self, records):
+        return self._write(self._replace_all, records)
+
+    def _replace_all(self, records):
+        self.db.execute("DELETE FROM cards")
+        self._append(records)
+
+    def replace_records(self, records, removed=()):
+        # Upserts `records` by unique_id and drops the rows of the unique_ids
+        # in `removed`, plus any uid#n duplicates of the upserted ids, atomically
+        return self._write(self._replace_records, list(records), removed)
+
+    def _replace_records(self, records, removed):
+        self.db.executemany("DELETE FROM cards WHERE unique_id = ?", ((uid,) for uid in removed))
+        self.db.executemany("DELETE FROM cards WHERE unique_id = ? AND key != unique_id",
+                            ((r["unique_id"],) for r in records))
+        self._upsert(records)
+
+    def iter_records(self, set_id=None):
+        if set_id is None:
+            rows = self.db.execute("SELECT data FROM cards ORDER BY seq")
+        else:
+            rows = self.db.execute("SELECT data FROM cards WHERE set_id = ? COLLATE NOCASE ORDER BY seq", (set_id,))
+        for (data,) in rows:
+            yield json.loads(data)
+
+    def iter_keyed(self):
+        # -> (key, record) in export order; key addresses the row for update_records()
+        for key, data in self.db.execute("SELECT key, data FROM cards ORDER BY seq"):
+            yield key, json.loads(data)
+
+    def update_records(self, records_by_key):
+        # Rewrites rows in place (position, key and unique_id stay as they are)
+        return self._write(self._update_records, records_by_key)
+
+    def _update_records(self, records_by_key):
+        self.db.executemany(
+            "UPDATE cards SET rarity = ?, data = ? WHERE key = ?",
+            ((r.get("rarity"), json.dumps(r, ensure_ascii=False), key) for key, r in records_by_key.items()),
+        )
+
+    # -------------------- cards.json --------------------
+    def _json_stamp(self):
+        st = os.stat(self.json_path)
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+    def sync_from_json(self):
+        # (Re)import cards.json when it changed outside the store (first run,
+        # translate_cards.py, manual edits). Returns True if it was imported.
+        if not os.path.exists(self.json_path): return False
+        stamp = self._json_stamp()
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'json_stamp'").fetchone()
+        if row and row[0] == stamp: return False
+        try:
+            self._write(self._import, iter_records(self.json_path), stamp)
+        except ValueError:
+            print(f"⚠️ {self.json_path} is not valid JSON, keeping the store as is")
+            return False
+        return True
+
+    def _import(self, records, stamp):
+        self._replace_all(records)
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('json_stamp', ?)", (stamp,))
+
+    def export_json(self, fmt=CARDS_FORMAT):
+        # Written row by row from one read snapshot
+        self.db.execute("BEGIN")
+        try:
+            rows = self.db.execute("SELECT data FROM cards ORDER BY seq")
+            write_records((json.loads(data) for (data,) in rows), self.json_path, fmt)
+        finally:
+            self.db.execute("COMMIT")
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('json_stamp', ?)", (self._json_stamp(),))
+
+    def close(self):
+        self.db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local card store behind cards.json")
+    parser.add_argument("command", choices=["import", "export", "stats"])
+    parser.add_argument("--json", default=DATA_FILE, help="Path of cards.json")
+    parser.add_argument("--format", choices=sorted(WRITERS), default=CARDS_FORMAT, help="Export format (see cards_file.py)")
+    args = parser.parse_args()
+
+    store = CardStore(json_path=args.json)
+    if args.command == "import":
+        if not os.path.exists(args.json):
+            print(f"❌ {args.json} not found")
+            sys.exit(1)
+        store.db.execute("DELETE FROM meta WHERE key = 'json_stamp'")
+        store.sync_from_json()
+        print(f"📥 Imported {store.count()} records into {store.path}")
+    elif args.command == "export":
+        store.export_json(args.format)
+        print(f"📤 Exported {store.count()} records to {args.json}")
+    else:
+        print(f"🗄️ {store.path}: {store.count()} records")
+        for set_id, n in store.db.execute("SELECT set_id, COUNT(*) FROM cards GROUP BY set_id ORDER BY set_id"):
+            print(f"   {set_id}: {n}")
+    store.close()
@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+# Streaming reader and writer for cards.json (and other files of flat
+# records).
+#
+# Records are written one at a time to a temp file next to the target, which
+# is then renamed over it, so a crash never leaves a half-written file and
+# the whole list never has to be in memory. Formats:
+#   pretty   json.dump(records, indent=2) as before (default)
+#   compact  a JSON array with one minified record per line, which page.tsx
+#            imports like the pretty one (CARDS_FORMAT=compact)
+#   ndjson   one record per line without the array; NOT importable by
+#            page.tsx, so only for copies / other consumers
+# iter_records() reads any of the three lazily, one record at a time, so a
+# stage that only looks at each record once runs in constant memory.
+#
+#   python scripts/cards_file.py convert [--format pretty|compact|ndjson]
+
+# -------------------- CONFIG --------------------
+PROJECT_ROOT = os.getcwd()
+DATA_FILE = os.path.join(PROJECT_ROOT, "src", "data", "cards.json")
+CARDS_FORMAT = os.environ.get("CARDS_FORMAT", "pretty")
+READ_CHUNK = 1 << 16
+
+_decoder = json.JSONDecoder()
+_GAP = re.compile(r"[\s,]*")
+
+# -------------------- READING --------------------
+def iter_records(path):
+    # Yields the records of a JSON array or NDJSON file one by one; a file
+    # that is not one of them (or is cut off) raises ValueError
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(READ_CHUNK)
+        pos = _GAP.match(buf).end()
+        in_array = buf[pos:pos + 1] == "["
+        if in_array: pos += 1
+        eof = False
+        while True:
+            pos = _GAP.match(buf, pos).end()
+            if pos == len(buf):
+                if eof: break
+                buf, pos = f.read(READ_CHUNK), 0
+                eof = not buf
+                continue
+            if in_array and buf[pos] == "]":
+                if buf[pos + 1:].strip() or f.read(1).strip(): raise ValueError(f"data after the closing ] in {path}")
+                return
+            try:
+                record, end = _decoder.raw_decode(buf, pos)
+            except ValueError:
+                # A record cut by the chunk boundary; read on and try again
+                more = f.read(READ_CHUNK)
+                if not more: raise
+                buf, pos = buf[pos:] + more, 0
+                continue
+            yield record
+            pos = end
+    if in_array: raise ValueError(f"{path} ends before the closing ]")
+
+def load_records(path):
+    # -> list of records, [] if the file does not exist
+    if not os.path.exists(path): return []
+    return list(iter_records(path))
+
+# -------------------- WRITING --------------------
+def _write_pretty(records, f):
+    # Same bytes as json.dump(records, f, indent=2, ensure_ascii=False)
+    n = 0
+    for record in records:
+        f.write(",\n  " if n else "[\n  ")
+        f.write(json.dumps(record, indent=2, ensure_ascii=False).replace("\n", "\n  "))
+        n += 1
+    f.write("\n]" if n else "[]")
+    return n
+
+def _write_compact(records, f):
+    n = 0
+    for record in records:
+        f.write(",\n" if n else "[\n")
+        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        n += 1
+    f.write("\n]\n" if n else "[]\n")
+    return n
+
+def _write_ndjson(records, f):
+    n = 0
+    for record in records:
+        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        f.write("\n")
+        n += 1
+    return n
+
+WRITERS = {"compact": _write_compact, "pretty": _write_pretty, "ndjson": _write_ndjson}
+
+def write_records(records, path, fmt=CARDS_FORMAT):
+    # Streams `records` (any iterable) to path atomically; -> records written.
+    # Reading path while writing it is fine: it is only replaced at the end.
+    write = WRITERS[fmt]
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    name, ext = os.path.splitext(os.path.basename(path))
+    fd, tmp = tempfile.mkstemp(prefix=f".{name}-", suffix=ext, dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            n = write(records, f)
+        os.chmod(tmp, 0o644)   # mkstemp files are private
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise
+    return n
+
+# -------------------- CLI --------------------
+def convert(path=DATA_FILE, fmt=CARDS_FORMAT):
+    if not os.path.exists(path):
+        print(f"❌ {path} not found")
+        return False
+    started = time.time()
+    before = os.path.getsize(path)
+    n = write_records(iter_records(path), path, fmt)
+    after = os.path.getsize(path)
+    print(f"💾 {n} records rewritten as {fmt}: {before / 1024:.0f} KB -> {after / 1024:.0f} KB "
+          f"in {time.time() - started:.1f}s")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rewrite cards.json in another format")
+    parser.add_argument("command", choices=["convert"])
+    parser.add_argument("--file", default=DATA_FILE, help="Path of cards.json")
+    parser.add_argument("--format", choices=sorted(WRITERS), default=CARDS_FORMAT)
+    args = parser.parse_args()
+
+    sys.exit(0 if convert(args.file, args.format) else 1)
@@ -1,16 +1,245 @@
-import requests
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
 
-URLS = [
-    "https://card.yuyu-tei.jp/opc/100_140/op01/10150.jpg",
-    "https://card.yuyu-tei.jp/opc/100_140/prb01/10022.jpg", # PRB01
-    "https://card.yuyu-tei.jp/opc/100_140/op02/10001.jpg"  # Guessing OP02
-]
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-print("--- Testing 200_280 Replacement ---")
-for url in URLS:
-    target = url.replace("100_140", "200_280")
+from fetch_engine import HEADERS, make_session
+from http_cache import CACHE_DIR
+from card_store import CardStore
+from flat_builder import changed_ids, load_changes
+from rate_limiter import THROTTLE_STATUSES, RateController, parse_retry_after
+
+# Verifies every image_url / official_image_url in the card store and
+# upgrades yuyu-tei images to the largest size that exists
+# (…/opc/100_140/op01/10150.jpg -> …/opc/200_280/op01/10150.jpg).
+# Checks run concurrently over pooled keep-alive connections, paced per
+# host by a rate_limiter.RateController (429 / 5xx / timeouts are retried),
+# and results are cached, so a re-run only re-checks what expired.
+#
+#   python scripts/check_images.py [--dry-run] [--no-upgrade]
+#
+# Offline, records pointing at fixture_server.py are checked against
+# fixtures/images instead of the image hosts.
+
+# -------------------- CONFIG --------------------
+PROJECT_ROOT = os.getcwd()
+DATA_FILE = os.path.join(PROJECT_ROOT, "src", "data", "cards.json")
+REPORT_FILE = os.path.join(PROJECT_ROOT, "src", "data", "image_report.json")
+CHECK_CACHE_FILE = os.path.join(CACHE_DIR, "image_checks.sqlite")
+OK_TTL = 7 * 24 * 3600       # working URLs are re-checked after a week
+BROKEN_TTL = 24 * 3600       # broken ones after a day
+CONCURRENCY = 16
+TIMEOUT = 10
+IMAGE_RATE = 20.0            # starting requests per second per image host
+IMAGE_MAX_RATE = 50.0
+
+# yuyu-tei serves each card image in several sizes; best first
+YUYUTEI_SIZES = ["200_280", "100_140"]
+SIZE_REGEX = re.compile(r"/opc/(\d+_\d+)/")
+
+# -------------------- CACHE --------------------
+class CheckCache:
+    def __init__(self, path=CHECK_CACHE_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute("CREATE TABLE IF NOT EXISTS checks (url TEXT PRIMARY KEY, status INTEGER NOT NULL, checked_at REAL NOT NULL)")
+
+    def fresh(self, urls, now=None):
+        # -> {url: status} for the urls whose cached result has not expired
+        now = now or time.time()
+        found = {}
+        urls = list(urls)
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i+500]
+            rows = self._db.execute(
+                f"SELECT url, status, checked_at FROM checks WHERE url IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for url, status, checked_at in rows:
+                if now - checked_at < (OK_TTL if is_ok(status) else BROKEN_TTL):
+                    found[url] = status
+        return found
+
+    def put_many(self, results, now=None):
+        # A URL that was still throttled after the retries says nothing about
+        # the image, so it is not cached and gets checked again next run
+        now = now or time.time()
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO checks VALUES (?, ?, ?)",
+                ((url, status, now) for url, status in results.items() if status not in THROTTLE_STATUSES),
+            )
+
+    def close(self):
+        self._db.close()
+
+# -------------------- CHECKING --------------------
+def is_ok(status):
+    return 200 <= status < 300
+
+def make_limiter():
+    return RateController(initial_rate=IMAGE_RATE, max_rate=IMAGE_MAX_RATE, burst=CONCURRENCY)
+
+def request_status(session, url):
+    # -> (HTTP status, Retry-After seconds)
+    r = session.head(url, timeout=TIMEOUT, allow_redirects=True)
+    if r.status_code in (403, 405, 501):
+        # Some hosts refuse HEAD; a streamed GET that is closed right away
+        with session.get(url, timeout=TIMEOUT, stream=True) as r:
+            return r.status_code, parse_retry_after(r.headers.get("Retry-After"))
+    return r.status_code, parse_retry_after(r.headers.get("Retry-After"))
+
+def check_url(session, url, limiter=None):
+    # -> HTTP status, 0 when the host could not be reached
+    limiter = limiter or make_limiter()
+    host = urlsplit(url).netloc
+    attempt = 0
+    while True:
+        limiter.wait(host)
+        t0 = time.perf_counter()
+        try:
+            status, retry_after = request_status(session, url)
+        except Exception:
+            status, retry_after = None, None
+        limiter.feedback(host, status, time.perf_counter() - t0, retry_after)
+        if not limiter.should_retry(status, attempt): return status or 0
+        time.sleep(limiter.retry_delay(attempt, retry_after))
+        attempt += 1
+
+def check_all(urls, cache=None, concurrency=CONCURRENCY, limiter=None):
+    # -> {url: status} for every url, from the cache where still valid
+    urls = list(dict.fromkeys(u for u in urls if u))
+    results = cache.fresh(urls) if cache else {}
+    todo = [u for u in urls if u not in results]
+    print(f"🔎 {len(urls)} image URLs: {len(results)} cached, {len(todo)} to check")
+    if not todo: return results
+
+    session = make_session(concurrency, HEADERS)
+    limiter = limiter or make_limiter()
+    pending = {}
+    started = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {pool.submit(check_url, session, u, limiter): u for u in todo}
+            for n, future in enumerate(as_completed(futures), 1):
+                pending[futures[future]] = future.result()
+                if cache and len(pending) >= 500:
+                    cache.put_many(pending)
+                    results.update(pending)
+                    pending = {}
+                if n % 1000 == 0: print(f"   {n}/{len(todo)} checked")
+    finally:
+        if cache and pending: cache.put_many(pending)
+        results.update(pending)
+        session.close()
+    retried = f", {limiter.stats['retries']} retried" if limiter.stats["retries"] else ""
+    print(f"   checked {len(todo)} URLs in {time.time() - started:.1f}s{retried}")
+    return results
+
+def upgrade_candidates(url):
+    # Larger yuyu-tei sizes of the same image, best first
+    m = SIZE_REGEX.search(url or "")
+    if not m or m.group(1) not in YUYUTEI_SIZES: return []
+    better = YUYUTEI_SIZES[:YUYUTEI_SIZES.index(m.group(1))]
+    return [url[:m.start(1)] + size + url[m.end(1):] for size in better]
+
+# -------------------- VERIFY --------------------
+def remote_field(record, field):
+    # Records mirrored by mirror_images.py keep the remote URL in source_<field>
+    source = "source_" + field
+    return source if record.get(source) else field
+
+def verify(read_keyed, cache=None, concurrency=CONCURRENCY, upgrade=True):
+    # read_keyed() -> iterator of (key, record); it is read twice (URLs to
+    # check, then the results) so the records never all sit in memory.
+    # -> (changed {key: record}, report)
+    urls = {}   # insertion-ordered set
+    for _, r in read_keyed():
+        urls[r.get(remote_field(r, "image_url"))] = None
+        urls[r.get(remote_field(r, "official_image_url"))] = None
+        if upgrade: urls.update(dict.fromkeys(upgrade_candidates(r.get(remote_field(r, "image_url")))))
+    status = check_all(urls, cache, concurrency)
+
+    changed = {}
+    upgraded = 0
+    broken = {}
+    records = 0
+    for key, r in read_keyed():
+        records += 1
+        field = remote_field(r, "image_url")
+        best = next((u for u in upgrade_candidates(r.get(field)) if is_ok(status.get(u, 0))), None) if upgrade else None
+        if best:
+            r[field] = best
+            changed[key] = r
+            upgraded += 1
+        for field in (remote_field(r, "image_url"), remote_field(r, "official_image_url")):
+            url = r.get(field)
+            if url and not is_ok(status.get(url, 0)):
+                entry = broken.setdefault(url, {"url": url, "field": field, "status": status.get(url, 0), "records": []})
+                entry["records"].append(r["unique_id"])
+
+    report = {
+        "checked_at": int(time.time()),
+        "urls": len(status),
+        "records": records,
+        "upgraded": upgraded,
+        "broken": sorted(broken.values(), key=lambda b: (b["field"], b["url"])),
+    }
+    return changed, report
+
+def main(dry_run=False, upgrade=True, concurrency=CONCURRENCY, report_path=REPORT_FILE, only_changed=False):
+    store = CardStore(json_path=DATA_FILE)
+    cache = CheckCache()
     try:
-        r = requests.head(target, timeout=3)
-        print(f"[{r.status_code}] {target}")
-    except Exception as e:
-        print(f"[ERR] {target}: {e}")
+        store.sync_from_json()
+        if not store.count():
+            print(f"❌ No records in {store.path}")
+            return False
+        read_keyed = store.iter_keyed
+        if only_changed:
+            # Records added or updated by the last scrape (flat_builder)
+            changes = load_changes()
+            if changes is None:
+                print("⚠️ No change list from a scrape yet, checking every record")
+            else:
+                ids = changed_ids(changes)
+                read_keyed = lambda: ((key, r) for key, r in store.iter_keyed() if r.get("unique_id") in ids)
+                print(f"🧮 Checking the {len(ids)} records changed by the last scrape")
+        changed, report = verify(read_keyed, cache, concurrency, upgrade)
+
+        broken = report["broken"]
+        print(f"🖼️ {report['upgraded']} records upgraded to a larger image, {len(broken)} broken URLs "
+              f"({sum(len(b['records']) for b in broken)} records)")
+        for b in broken[:20]:
+            print(f"   ❌ [{b['status'] or 'ERR'}] {b['url']} ({len(b['records'])} records)")
+        if len(broken) > 20: print(f"   … {len(broken) - 20} more in {report_path}")
+
+        if dry_run:
+            print("🧪 Dry run: records and report not written")
+            return True
+        if changed:
+            store.update_records(changed)
+            store.export_json()
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        return True
+    finally:
+        cache.close()
+        store.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify card image links and upgrade them to the best resolution")
+    parser.add_argument("--dry-run", action="store_true", help="Check and report without writing anything")
+    parser.add_argument("--no-upgrade", action="store_true", help="Only verify the current URLs")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--report", default=REPORT_FILE)
+    parser.add_argument("--changed", action="store_true", help="Only records added or updated by the last scrape")
+    args = parser.parse_args()
+
+    sys.exit(0 if main(args.dry_run, not args.no_upgrade, args.concurrency, args.report, args.changed) else 1)
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import RateController, parse_retry_after
+
+# -------------------- CONFIG --------------------
+MAX_CONCURRENCY = 6      # requests in flight across all hosts
+HOST_MAX_INFLIGHT = 2    # requests in flight per host
+HOST_INTERVAL = 0.5      # starting spacing of request starts per host; adapts from there
+TIMEOUT = 15
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+# status / text / final url of a fetched page (url includes encoded params),
+# plus request time, bytes on the wire and where it came from
+# (fresh: cache without a request / revalidated: 304 / downloaded), and the
+# server's Retry-After in seconds if it sent one
+Page = namedtuple("Page", ["status", "text", "url", "elapsed", "bytes", "source", "retry_after"],
+                  defaults=(0.0, 0, "downloaded", None))
+
+# -------------------- ENGINE --------------------
+# Async front for blocking requests calls. Requests run in worker threads;
+# the engine only decides when they may start: at most `max_concurrency`
+# overall, at most `host_inflight` per host, and request starts on one host
+# paced by a rate_limiter.RateController (this replaces the fixed
+# time.sleep(1)). The controller starts at one request per `host_interval`
+# and adapts to the host's latency and 429/503 answers. Timeouts, connection
+# errors, 429 and 5xx are retried with jittered backoff (honouring
+# Retry-After) before fetch gives up and returns the last answer / raises.
+class FetchEngine:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, host_inflight=HOST_MAX_INFLIGHT,
+                 host_interval=HOST_INTERVAL, headers=None, timeout=TIMEOUT, cache=None, limiter=None):
+        self.max_concurrency = max_concurrency
+        self.host_inflight = host_inflight
+        self.headers = headers or HEADERS
+        self.timeout = timeout
+        self.cache = cache
+        # host_interval 0: no pacing, only Retry-After pauses and retries
+        self.limiter = limiter or RateController(initial_rate=1 / host_interval if host_interval else None)
+        self.session = make_session(max_concurrency, self.headers)
+        # fresh: served from cache, no request / revalidated: 304 / downloaded: full body
+        # retries: requests repeated after a 429 / 5xx / network error
+        self.stats = {"fresh": 0, "revalidated": 0, "downloaded": 0, "bytes": 0, "retries": 0}
+        self._global = None
+        self._hosts = {}
+
+    def _host_gate(self, host):
+        # Semaphores bind to the running loop, so they are created lazily
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_concurrency)
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.host_inflight)
+        return self._hosts[host]
+
+    def _get(self, key, url, params, cached):
+        headers = {}
+        if cached:
+            if cached["etag"]: headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]: headers["If-Modified-Since"] = cached["last_modified"]
+
+        t0 = time.perf_counter()
+        r = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+        size = len(r.content)
+        elapsed = time.perf_counter() - t0
+        self.stats["bytes"] += size
+
+        if r.status_code == 304 and cached:
+            self.cache.touch(key)
+            self.stats["revalidated"] += 1
+            return Page(200, cached["text"], cached["url"], elapsed, size, "revalidated")
+
+        self.stats["downloaded"] += 1
+        if r.status_code == 200 and self.cache:
+            self.cache.put(key, r.url, r.text, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        return Page(r.status_code, r.text, r.url, elapsed, size, "downloaded",
+                    parse_retry_after(r.headers.get("Retry-After")))
+
+    async def fetch(self, url, params=None):
+        key = request_key(url, params)
+        cached = self.cache.get(key) if self.cache else None
+        if cached and cached["fresh"]:
+            self.cache.mark_used(key)
+            self.stats["fresh"] += 1
+            return Page(200, cached["text"], cached["url"], 0.0, 0, "fresh")
+
+        host = urlsplit(url).netloc
+        host_sem = self._host_gate(host)
+        attempt = 0
+        while True:
+            page = error = None
+            async with self._global, host_sem:
+                await self.limiter.acquire(host)
+                t0 = time.perf_counter()
+                try:
+                    page = await asyncio.to_thread(self._get, key, url, params, cached)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+            if page is not None:
+                self.limiter.feedback(host, page.status, page.elapsed, page.retry_after)
+            else:
+                self.limiter.feedback(host, None, time.perf_counter() - t0)
+            status = page.status if page is not None else None
+            if not self.limiter.should_retry(status, attempt):
+                if error is not None: raise error
+                return page
+            # Backoff sleeps outside the gates so other hosts keep going
+            self.stats["retries"] += 1
+            await asyncio.sleep(self.limiter.retry_delay(attempt, page.retry_after if page is not None else None))
+            attempt += 1
+
+    def close(self):
+        self.session.close()
+        if self.cache: self.cache.close()
+
+# -------------------- HELPERS --------------------
+def make_session(pool_size, headers):
+    # One keep-alive pool per host, sized to the engine's concurrency
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(headers)
+    return session
+
+def request_key(url, params=None):
+    # Same encoding requests uses on the wire, so the key is URL + params
+    return requests.Request("GET", url, params=params).prepare().url
@@ -0,0 +1,225 @@
+import argparse
+import hashlib
+import math
+import os
+import random
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, quote
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rate_limiter import TokenBucket
+
+# Local stand-in for yuyu-tei.jp that serves recorded listing/search pages.
+#
+#   python scripts/fixture_server.py record op05 --pages 3
+#   python scripts/fixture_server.py record index
+#   python scripts/fixture_server.py serve --port 8765
+#   YUYUTEI_HOST=http://127.0.0.1:8765 python scripts/scrape_cards.py
+#
+# Layout: fixtures/yuyutei/<set_code>/<page>.html
+#         fixtures/yuyutei/search/<quoted keyword>/<page>.html
+#         fixtures/yuyutei/top.html (set index)
+# Pages that were never recorded are served as an empty listing (HTTP 200),
+# which is what the live site does past the last page.
+#
+# The committed corpus is small and synthetic (op01, st01, eb01, the
+# op01-op10 range and the P- search, built from src/data/cards.json in the
+# three tile layouts the extractor handles); benchmark.py keeps its baseline
+# next to it and scripts/tests serve it. Recording real pages over it works
+# the same way.
+#
+# Card images (check_images.py, mirror tests) are served from
+# fixtures/images/<url path>, e.g. fixtures/images/opc/200_280/op01/10150.jpg;
+# missing ones are a 404 like on the image hosts.
+#
+# Throttling stand-in, to exercise rate_limiter.py offline:
+#   python scripts/fixture_server.py serve --rate-limit 20 --error-rate 0.05
+# answers 429 with Retry-After once clients go over 20 requests/s (burst
+# --burst), and a random 5% of the requests with 503.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(SCRIPT_DIR, "fixtures", "yuyutei")
+IMAGE_DIR = os.path.join(SCRIPT_DIR, "fixtures", "images")
+IMAGE_PREFIXES = ("opc", "images")   # card.yuyu-tei.jp/opc/..., onepiece-cardgame.com/images/...
+LIVE_HOST = "https://yuyu-tei.jp"
+
+EMPTY_PAGE = "<!DOCTYPE html><html><head><title>遊々亭</title></head><body><div id=\"card-list3\"></div></body></html>"
+
+# -------------------- LAYOUT --------------------
+def fixture_path(path, query, root=FIXTURE_DIR):
+    params = parse_qs(query)
+    page = (params.get("page") or ["1"])[0]
+    if not page.isdigit(): return None
+    parts = [p for p in path.split("/") if p]
+    if parts == ["top", "opc"]: return os.path.join(root, "top.html")
+    # /sell/opc/s/<set_code> or /sell/opc/s/search?search_word=...
+    if len(parts) != 4 or parts[:3] != ["sell", "opc", "s"]: return None
+    if parts[3] == "search":
+        word = (params.get("search_word") or [""])[0]
+        return os.path.join(root, "search", quote(word, safe=""), f"{page}.html")
+    return os.path.join(root, parts[3].lower(), f"{page}.html")
+
+def image_path(path, root=IMAGE_DIR):
+    parts = [p for p in path.split("/") if p and p not in (".", "..")]
+    if not parts or parts[0] not in IMAGE_PREFIXES: return None
+    return os.path.join(root, *parts)
+
+# -------------------- SERVER --------------------
+class FixtureHandler(BaseHTTPRequestHandler):
+    root = FIXTURE_DIR
+    images = IMAGE_DIR
+    latency = 0.0
+    bucket = None        # TokenBucket when --rate-limit is set
+    error_rate = 0.0
+    counts = None        # {"throttled", "errors", "served"} shared by the handler class
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def _refuse(self):
+        # Throttling mode: 429 past the rate limit, random 503s; -> True if refused
+        if self.counts is None: return False
+        if self.bucket is not None:
+            taken, wait = self.bucket.try_take()
+            if not taken:
+                self.counts["throttled"] += 1
+                self.send_response(429)
+                self.send_header("Retry-After", str(max(1, math.ceil(wait))))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return True
+        if self.error_rate and random.random() < self.error_rate:
+            self.counts["errors"] += 1
+            self.send_error(503)
+            return True
+        self.counts["served"] += 1
+        return False
+
+    def do_GET(self, head=False):
+        if self._refuse(): return
+        parts = urlsplit(self.path)
+        image = image_path(parts.path, self.images)
+        if image is not None:
+            self._send_image(image, head)
+            return
+        path = fixture_path(parts.path, parts.query, self.root)
+        if path is None:
+            self.send_error(404)
+            return
+        body = EMPTY_PAGE.encode("utf-8")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                body = f.read()
+        if self.latency: time.sleep(self.latency)
+        # Validators so conditional requests can be exercised offline
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_image(self, path, head):
+        if self.latency: time.sleep(self.latency)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png" if path.endswith(".png") else "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head: self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_server(port=0, root=FIXTURE_DIR, latency=0.0, images=IMAGE_DIR, rate_limit=None, burst=5, error_rate=0.0):
+    # rate_limit: requests/s before answering 429; the counts are on server.counts
+    counts = {"throttled": 0, "errors": 0, "served": 0} if rate_limit or error_rate else None
+    handler = type("Handler", (FixtureHandler,), {
+        "root": root, "latency": latency, "images": images, "error_rate": error_rate, "counts": counts,
+        "bucket": TokenBucket(rate_limit, burst, min_rate=rate_limit, max_rate=rate_limit) if rate_limit else None,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.counts = counts
+    return server
+
+# -------------------- RECORDER --------------------
+RECORD_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"}
+
+def _save(r, out, root):
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        f.write(r.text)
+    print(f"💾 {r.url} -> {os.path.relpath(out, root)}")
+
+def record_index(root=FIXTURE_DIR):
+    r = requests.get(f"{LIVE_HOST}/top/opc", headers=RECORD_HEADERS, timeout=15)
+    if r.status_code != 200:
+        print(f"❌ {r.status_code} for {r.url}")
+        return
+    _save(r, fixture_path("/top/opc", "", root), root)
+
+def record(unit, pages, search=False, root=FIXTURE_DIR):
+    headers = RECORD_HEADERS
+    for page in range(1, pages + 1):
+        if search:
+            url = f"{LIVE_HOST}/sell/opc/s/search"
+            params = {"search_word": unit, "page": page}
+            out = fixture_path("/sell/opc/s/search", f"search_word={quote(unit)}&page={page}", root)
+        else:
+            url = f"{LIVE_HOST}/sell/opc/s/{unit}"
+            params = {"page": page}
+            out = fixture_path(f"/sell/opc/s/{unit}", f"page={page}", root)
+        r = requests.get(url, params=params, headers=headers, timeout=15)
+        if r.status_code != 200:
+            print(f"❌ {r.status_code} for {r.url}")
+            break
+        _save(r, out, root)
+        time.sleep(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve or record yuyu-tei fixture pages")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_p = sub.add_parser("serve", help="Serve recorded pages")
+    serve_p.add_argument("--port", type=int, default=8765)
+    serve_p.add_argument("--root", default=FIXTURE_DIR)
+    serve_p.add_argument("--images", default=IMAGE_DIR, help="Directory of card images to serve")
+    serve_p.add_argument("--latency", type=float, default=0.0, help="Artificial delay per request (seconds)")
+    serve_p.add_argument("--rate-limit", type=float, default=None, help="Answer 429 above this many requests/s")
+    serve_p.add_argument("--burst", type=int, default=5, help="Requests allowed at once under --rate-limit")
+    serve_p.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    rec_p = sub.add_parser("record", help="Record live pages into the fixture directory")
+    rec_p.add_argument("unit", help="Set code (e.g. op05), search keyword with --search, or 'index' for the set index")
+    rec_p.add_argument("--pages", type=int, default=1)
+    rec_p.add_argument("--search", action="store_true")
+    rec_p.add_argument("--root", default=FIXTURE_DIR)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        if args.unit == "index" and not args.search: record_index(args.root)
+        else: record(args.unit, args.pages, search=args.search, root=args.root)
+        sys.exit(0)
+
+    server = make_server(args.port, args.root, args.latency, args.images, args.rate_limit, args.burst, args.error_rate)
+    print(f"🧪 Serving {args.root} on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    if server.counts:
+        c = server.counts
+        print(f"🚦 {c['served']} served, {c['throttled']} throttled (429), {c['errors']} failed (503)")
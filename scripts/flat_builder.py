@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from http_cache import CACHE_DIR
+from variant_record import keyword_label
+
+# master ({code: [Variant, ...]}) -> flat cards.json records.
+#
+# unique_id is CODE-SLUG-HASH: the card code, the keyword label reduced to
+# [A-Z0-9], and a short hash of the listing image (without host and size
+# directory, so .../100_140/op01/10150.jpg and .../200_280/op01/10150.jpg
+# agree). A listing without an image hashes its name, rarity and keyword
+# label instead, and listings of one code that share an image add their
+# names. The keyword label is the variant label with the price and position
+# fallbacks ("Parallel (Unmarked)", "Variant #2", ...) read as
+# "Base / Normal" (variant_record.keyword_label), since those change with
+# the price. So the id does not move when a price or the price order does,
+# and a portfolio entry or a price history series keeps pointing at the
+# same listing. Only listings that are identical in all of that get -2, -3,
+# ... in scrape order. Ids that stop existing while their listing is still
+# there (migrate_ids) are kept in src/data/id_migrations.json, old ->
+# current, and page.tsx heals saved portfolio entries through that map.
+#
+# FlatBuilder keeps the last build in scripts/.cache/flat_build.sqlite: one
+# row per card code with a digest of its variants and its flattened records.
+# Codes whose digest did not change are taken from there; only the others
+# are flattened again and diffed against their stored records. Each build
+# reports which unique_ids were added, updated or removed, and in which sets
+# (src/data/changed_ids.json), so the frontend data, image and translation
+# stages can stick to those.
+
+# -------------------- CONFIG --------------------
+BUILD_CACHE_FILE = os.path.join(CACHE_DIR, "flat_build.sqlite")
+CHANGES_FILE = os.path.join(os.getcwd(), "src", "data", "changed_ids.json")
+MIGRATIONS_FILE = os.path.join(os.getcwd(), "src", "data", "id_migrations.json")
+HASH_LENGTH = 8
+# Part of every code digest; bump it when flatten_code's output changes so
+# the next build re-diffs every code
+FLATTEN_VERSION = 2
+OFFICIAL_IMAGE = "https://asia-en.onepiece-cardgame.com/images/cardlist/card/{code}.png"
+SIZE_DIR = re.compile(r"/\d+_\d+/")
+
+# -------------------- IDS --------------------
+@lru_cache(maxsize=None)
+def slugify(label):
+    return re.sub(r"[^a-zA-Z0-9]", "", label).upper()
+
+def image_key(image):
+    if not image or "noimage" in image: return ""
+    return SIZE_DIR.sub("/", urlsplit(image).path)
+
+def uid_basis(v):
+    # What the id hash stands for
+    return image_key(v.image) or f"noimage:{v.name}|{v.rarity}|{keyword_label(v.label)}"
+
+def variant_uid(code, slug, basis):
+    h = hashlib.sha1(basis.encode("utf-8")).hexdigest()[:HASH_LENGTH]
+    return f"{code}-{slug}-{h}"
+
+def set_of(code):
+    # Generated DON cards stay in the set they came from: DON-OP01-001 -> OP01
+    if code.startswith("DON"):
+        parts = code.split("-")
+        if len(parts) > 1: return parts[1]
+    return code.split("-")[0]
+
+# -------------------- FLATTENING --------------------
+def flatten_code(code, variants):
+    # Records of one card code, cheapest first
+    set_id = set_of(code)
+    official = OFFICIAL_IMAGE.format(code=code)
+    keys = [(slugify(keyword_label(v.label)), uid_basis(v)) for v in variants]
+    shared = {}
+    for key in keys: shared[key] = shared.get(key, 0) + 1
+    taken = {}
+    uids = []
+    for (slug, basis), v in zip(keys, variants):
+        # Listings sharing one image are told apart by their names
+        if shared[slug, basis] > 1: basis = f"{basis}|{v.name}"
+        uid = variant_uid(code, slug, basis)
+        n = taken[uid] = taken.get(uid, 0) + 1
+        uids.append(uid if n == 1 else f"{uid}-{n}")
+
+    records = []
+    for uid, v in sorted(zip(uids, variants), key=lambda p: p[1].price):
+        records.append({
+            "card_code": code,
+            "set": set_id,
+            "base_name": v.name,
+            "variant_name": v.label or "Normal",
+            "rarity": (v.rarity or "UNK").upper(),
+            "price_jpy": v.price,
+            "image_url": v.image,
+            "official_image_url": official,
+            "finish": "Foil" if v.is_high_rarity else "Normal",
+            "is_high_demand": v.is_high_rarity,
+            "unique_id": uid,
+            # Every listing page this variant was found on (see merge_into)
+            "sources": list(v.sources) if v.sources else ([v.source_url] if v.source_url else []),
+        })
+    return records
+
+def build_flat_database(master):
+    flat_list = []
+    for code, variants in master.items():
+        flat_list.extend(flatten_code(code, variants))
+    return flat_list
+
+def code_digest(variants):
+    # Content of a code's variants in scrape order (which decides id suffixes)
+    h = hashlib.sha1(f"v{FLATTEN_VERSION}".encode("utf-8"))
+    for v in variants:
+        h.update(repr((v.label, v.name, v.rarity, v.price, v.is_high_rarity, v.image, v.source_url,
+                       v.sources)).encode("utf-8"))
+    return h.hexdigest()
+
+# -------------------- CHANGE TRACKING --------------------
+class FlatBuilder:
+    def __init__(self, path=BUILD_CACHE_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute("CREATE TABLE IF NOT EXISTS codes (code TEXT PRIMARY KEY, digest TEXT NOT NULL, records TEXT NOT NULL)")
+
+    def build(self, master):
+        # -> (records, changes); records are in master order, like build_flat_database
+        previous = {code: (digest, body) for code, digest, body in self._db.execute("SELECT code, digest, records FROM codes")}
+        flat_list = []
+        rows = []
+        changes = {"added": [], "updated": [], "removed": [], "sets": set(), "codes_changed": 0}
+        for code, variants in master.items():
+            digest = code_digest(variants)
+            old = previous.pop(code, None)
+            if old is not None and old[0] == digest:
+                flat_list.extend(json.loads(old[1]))
+                continue
+            records = flatten_code(code, variants)
+            flat_list.extend(records)
+            rows.append((code, digest, json.dumps(records, ensure_ascii=False, separators=(",", ":"))))
+            changes["codes_changed"] += 1
+            diff_records(json.loads(old[1]) if old is not None else [], records, changes)
+
+        for code, (_, body) in previous.items():
+            diff_records(json.loads(body), [], changes)
+
+        if rows or previous:
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO codes VALUES (?, ?, ?)", rows)
+                self._db.executemany("DELETE FROM codes WHERE code = ?", ((code,) for code in previous))
+        changes["sets"] = sorted(changes["sets"])
+        return flat_list, changes
+
+    def reset(self):
+        with self._db:
+            self._db.execute("DELETE FROM codes")
+
+    def close(self):
+        self._db.close()
+
+def diff_records(old, new, changes):
+    before = {r["unique_id"]: r for r in old}
+    for r in new:
+        prev = before.pop(r["unique_id"], None)
+        if prev == r: continue
+        changes["updated" if prev is not None else "added"].append(r["unique_id"])
+        changes["sets"].add(r["set"])
+    for uid, r in before.items():
+        changes["removed"].append(uid)
+        changes["sets"].add(r["set"])
+
+def changed_ids(changes):
+    return set(changes["added"]) | set(changes["updated"])
+
+def migrate_ids(old_records, new_records):
+    # Old records whose unique_id is gone but whose listing (code, keyword
+    # label, image) is still there; -> {old unique_id: new unique_id}
+    new_ids = set()
+    by_listing = {}
+    for r in new_records:
+        new_ids.add(r["unique_id"])
+        by_listing.setdefault(listing_key(r), r["unique_id"])
+    renamed = {}
+    for r in old_records:
+        uid = r["unique_id"]
+        if uid in new_ids or uid in renamed: continue
+        new = by_listing.get(listing_key(r))
+        if new is not None: renamed[uid] = new
+    return renamed
+
+def listing_key(record):
+    # Mirrored records keep the remote image in source_image_url
+    image = record.get("source_image_url") or record.get("image_url")
+    # and translated ones the scraped name in name_ja
+    name = record.get("name_ja") or record.get("base_name")
+    return (record["card_code"], keyword_label(record.get("variant_name")), image_key(image) or name)
+
+def save_migrations(renamed, path=MIGRATIONS_FILE):
+    # Adds `renamed` ({old: new}) to the map in path; older entries that
+    # pointed at a now renamed id are re-pointed, so every entry maps
+    # straight to a current id. -> the merged map
+    migrations = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            migrations = json.load(f)
+    migrations = {old: renamed.get(new, new) for old, new in migrations.items()}
+    migrations.update(renamed)
+    migrations = {old: new for old, new in migrations.items() if old != new}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(migrations, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+    return migrations
+
+# -------------------- CHANGE LIST --------------------
+def write_changes(changes, path=CHANGES_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"generated_at": int(time.time()), **changes}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+def load_changes(path=CHANGES_FILE):
+    # -> changes of the last build, None if there is no change list
+    if not os.path.exists(path): return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# -------------------- CONFIG --------------------
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+CACHE_FILE = os.path.join(CACHE_DIR, "http_cache.sqlite")
+CACHE_TTL = 30 * 60                 # serve without any request while younger than this
+CACHE_MAX_BYTES = 256 * 1024 * 1024 # compressed bodies; least recently used evicted first
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used);
+"""
+
+# -------------------- CACHE --------------------
+# Persistent cache of 200 responses keyed by the fully encoded request URL
+# (URL + params). Entries past the TTL are revalidated with
+# If-None-Match / If-Modified-Since when the server sent validators.
+class ResponseCache:
+    def __init__(self, path=CACHE_FILE, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def get(self, key):
+        # -> dict(url, text, etag, last_modified, fresh) or None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, etag, last_modified, fetched_at, body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if not row: return None
+        url, etag, last_modified, fetched_at, body = row
+        return {
+            "url": url,
+            "text": zlib.decompress(body).decode("utf-8"),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": time.time() - fetched_at < self.ttl,
+        }
+
+    def put(self, key, url, text, etag=None, last_modified=None):
+        body = zlib.compress(text.encode("utf-8"))
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, etag, last_modified, now, now, len(body), body),
+            )
+            self._evict()
+
+    def touch(self, key):
+        # A 304 renews the entry for another TTL
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("UPDATE responses SET fetched_at = ?, last_used = ? WHERE key = ?", (now, now, key))
+
+    def mark_used(self, key):
+        with self._lock, self._db:
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes: return
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes: break
+
+    def close(self):
+        with self._lock:
+            self._db.close()
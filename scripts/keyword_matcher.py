@@ -0,0 +1,44 @@
+import re
+
+# Multi-pattern keyword matcher: which keywords of a list occur in a text,
+# and which of them ranks highest.
+#
+# The keywords are compiled once into a single regex alternation, longest
+# first, so one findall() walks the text in C and returns the longest
+# keyword at each hit. A hit implies every keyword inside it (SPパラレル
+# implies SP and パラレル), so the best keyword for each possible hit is
+# precomputed. What a single pass cannot see is a keyword that starts inside
+# a hit and runs past its end (P-L followed by "et's Start Campaign"). Those
+# are known up front as well; the few that would outrank the hit are tested
+# with `in` when it occurs. The result is the same as testing every keyword.
+
+def _straddles(w, k):
+    # Can k start inside an occurrence of w and end after it?
+    return any(len(k) > len(w) - i and k.startswith(w[i:]) for i in range(1, len(w)))
+
+class KeywordMatcher:
+    def __init__(self, keywords, priority):
+        # priority(i) -> sort key of keywords[i]; the highest one wins
+        self.keywords = list(keywords)
+        self._order = sorted(range(len(self.keywords)), key=priority, reverse=True)
+        place = {i: n for n, i in enumerate(self._order)}
+        words = set(self.keywords)
+        # For each distinct keyword: place of the best keyword inside it
+        self._best = {w: min(place[i] for i, k in enumerate(self.keywords) if k in w) for w in words}
+        self._hidden = {}
+        for w in words:
+            hidden = tuple(k for k in words if self._best[k] < self._best[w] and _straddles(w, k))
+            if hidden: self._hidden[w] = hidden
+        alternation = "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+        self._findall = re.compile(alternation).findall
+
+    def best(self, text):
+        # -> index of the highest-priority keyword found in text, None if none
+        found = self._findall(text)
+        if not found: return None
+        best = min(map(self._best.__getitem__, found))
+        if not self._hidden.keys().isdisjoint(found):
+            for w in found:
+                for k in self._hidden.get(w, ()):
+                    if k in text: best = min(best, self._best[k])
+        return self._order[best]
@@ -0,0 +1,237 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fetch_engine import HEADERS, make_session
+from card_store import CardStore
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Local mirror of the card images under public/, so the site serves them
+# itself instead of hotlinking yuyu-tei / onepiece-cardgame.com.
+#
+# Images are stored by content hash (public/card-images/ab/abcdef….jpg), so
+# the same picture used by several variants or sources is kept once, and
+# thumbnails are rendered next to it in a process pool (needs Pillow; without
+# it only the originals are mirrored). manifest.json remembers which URL
+# maps to which object, so re-runs only download what is new.
+#
+# Records get image_url / official_image_url pointing at the local copy; the
+# remote URLs move to source_image_url / source_official_image_url and
+# thumbnails to thumbnails = {"160": "/card-images/…-160.webp", ...}.
+#
+#   python scripts/mirror_images.py [--no-thumbnails] [--workers N]
+#   python scripts/scrape_cards.py --mirror-images   # as part of a full scrape
+
+# -------------------- CONFIG --------------------
+PROJECT_ROOT = os.getcwd()
+DATA_FILE = os.path.join(PROJECT_ROOT, "src", "data", "cards.json")
+MIRROR_DIR = os.path.join(PROJECT_ROOT, "public", "card-images")
+PUBLIC_PREFIX = "/card-images"
+MANIFEST_NAME = "manifest.json"
+THUMB_SIZES = (160, 320)     # widths; the grid uses 160, the detail view 320
+THUMB_FORMAT = "webp"
+DOWNLOAD_CONCURRENCY = 8
+TIMEOUT = 20
+
+IMAGE_FIELDS = (("image_url", "source_image_url"), ("official_image_url", "source_official_image_url"))
+CONTENT_TYPES = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/gif": ".gif"}
+
+# -------------------- MANIFEST --------------------
+class Mirror:
+    def __init__(self, directory=MIRROR_DIR, prefix=PUBLIC_PREFIX):
+        self.directory = directory
+        self.prefix = prefix
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        # urls: source url -> object ("ab/<hash>.jpg"); thumbs: object -> [widths]
+        self.manifest = {"urls": {}, "thumbs": {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+
+    def path(self, obj):
+        return os.path.join(self.directory, *obj.split("/"))
+
+    def public(self, obj):
+        return f"{self.prefix}/{obj}"
+
+    def object_for(self, url):
+        # Mirrored object of url, if its file is still there
+        obj = self.manifest["urls"].get(url)
+        return obj if obj and os.path.exists(self.path(obj)) else None
+
+    def store(self, url, body, content_type):
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        ext = os.path.splitext(urlsplit(url).path)[1].lower() or CONTENT_TYPES.get(content_type, ".img")
+        obj = f"{digest[:2]}/{digest}{ext}"
+        path = self.path(obj)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f: f.write(body)
+            os.replace(tmp, path)
+        self.manifest["urls"][url] = obj
+        return obj
+
+    def thumb_obj(self, obj, width):
+        return f"{os.path.splitext(obj)[0]}-{width}.{THUMB_FORMAT}"
+
+    def save(self):
+        tmp = self.manifest_path + ".tmp"
+        os.makedirs(self.directory, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        os.replace(tmp, self.manifest_path)
+
+# -------------------- DOWNLOAD --------------------
+def download(session, url):
+    # -> (body, content type) or None
+    try:
+        r = session.get(url, timeout=TIMEOUT)
+        if r.status_code != 200 or not r.content: return None
+        return r.content, r.headers.get("Content-Type", "").split(";")[0].strip()
+    except Exception:
+        return None
+
+def download_all(mirror, urls, concurrency=DOWNLOAD_CONCURRENCY):
+    # Downloads every url that is not mirrored yet; -> number of failures
+    todo = [u for u in dict.fromkeys(urls) if u and u.startswith("http") and not mirror.object_for(u)]
+    print(f"⬇️ {len(todo)} images to download")
+    if not todo: return 0
+    failed = 0
+    session = make_session(concurrency, HEADERS)
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {pool.submit(download, session, u): u for u in todo}
+            for n, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                if result is None:
+                    failed += 1
+                else:
+                    mirror.store(futures[future], *result)
+                if n % 500 == 0:
+                    print(f"   {n}/{len(todo)} downloaded")
+                    mirror.save()
+    finally:
+        session.close()
+        mirror.save()
+    return failed
+
+# -------------------- THUMBNAILS --------------------
+def render_thumbnails(src, targets):
+    # Runs in a worker process: targets = [(width, path)]; -> widths written
+    img = Image.open(src)
+    img.load()
+    if img.mode not in ("RGB", "RGBA"): img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+    done = []
+    for width, path in targets:
+        height = max(1, round(img.height * width / img.width))
+        thumb = img.resize((width, height), Image.LANCZOS) if img.width > width else img
+        tmp = path + ".tmp"
+        thumb.save(tmp, format=THUMB_FORMAT.upper(), quality=82)
+        os.replace(tmp, path)
+        done.append(width)
+    return done
+
+def make_thumbnails(mirror, objects, sizes=THUMB_SIZES, workers=None):
+    if Image is None:
+        print("⚠️ Pillow is not installed, skipping thumbnails (pip install Pillow)")
+        return 0
+    jobs = {}
+    for obj in dict.fromkeys(objects):
+        have = set(mirror.manifest["thumbs"].get(obj, []))
+        targets = [(w, mirror.path(mirror.thumb_obj(obj, w))) for w in sizes
+                   if w not in have or not os.path.exists(mirror.path(mirror.thumb_obj(obj, w)))]
+        if targets: jobs[obj] = targets
+    print(f"🖼️ {len(jobs)} images need thumbnails")
+    if not jobs: return 0
+    made = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_thumbnails, mirror.path(obj), targets): obj for obj, targets in jobs.items()}
+        for future in as_completed(futures):
+            obj = futures[future]
+            try:
+                widths = future.result()
+            except Exception as e:
+                print(f"   ❌ {obj}: {e}")
+                continue
+            mirror.manifest["thumbs"][obj] = sorted(set(mirror.manifest["thumbs"].get(obj, [])) | set(widths))
+            made += 1
+    mirror.save()
+    return made
+
+# -------------------- RECORDS --------------------
+def source_url(record, field, source_field):
+    # The remote URL of a field, also for records mirrored on a previous run
+    return record.get(source_field) or record.get(field)
+
+def is_mirrored(mirror, record):
+    return all(mirror.object_for(source_url(record, f, s)) for f, s in IMAGE_FIELDS if source_url(record, f, s))
+
+def mirror_records(records, mirror=None, thumbnails=True, concurrency=DOWNLOAD_CONCURRENCY, workers=None, only=None):
+    # Mirrors the images of `records` and points them at the local copies in
+    # place. Returns the records that changed. With `only` (unique_ids, see
+    # flat_builder.changed_ids) just those records and the ones not mirrored
+    # yet are downloaded and thumbnailed; the rest only get their local URLs.
+    mirror = mirror or Mirror()
+    work = records if only is None else [r for r in records if r.get("unique_id") in only or not is_mirrored(mirror, r)]
+    urls = [source_url(r, f, s) for r in work for f, s in IMAGE_FIELDS]
+    failed = download_all(mirror, urls, concurrency)
+    if failed: print(f"   ⚠️ {failed} images could not be downloaded; their records keep the remote URL")
+
+    if thumbnails:
+        make_thumbnails(mirror, [mirror.object_for(u) for u in urls if u and mirror.object_for(u)], workers=workers)
+
+    changed = []
+    for r in records:
+        before = (r.get("image_url"), r.get("official_image_url"), r.get("thumbnails"))
+        for field, src_field in IMAGE_FIELDS:
+            url = source_url(r, field, src_field)
+            obj = mirror.object_for(url) if url else None
+            if not obj: continue
+            r[src_field] = url
+            r[field] = mirror.public(obj)
+            if field == "image_url":
+                widths = mirror.manifest["thumbs"].get(obj, [])
+                if widths: r["thumbnails"] = {str(w): mirror.public(mirror.thumb_obj(obj, w)) for w in widths}
+        if (r.get("image_url"), r.get("official_image_url"), r.get("thumbnails")) != before:
+            changed.append(r)
+    return changed
+
+def main(thumbnails=True, concurrency=DOWNLOAD_CONCURRENCY, workers=None):
+    store = CardStore(json_path=DATA_FILE)
+    try:
+        store.sync_from_json()
+        keyed = list(store.iter_keyed())
+        if not keyed:
+            print(f"❌ No records in {store.path}")
+            return False
+        started = time.time()
+        by_id = {id(r): key for key, r in keyed}
+        changed = mirror_records([r for _, r in keyed], thumbnails=thumbnails, concurrency=concurrency, workers=workers)
+        if changed:
+            store.update_records({by_id[id(r)]: r for r in changed})
+            store.export_json()
+        print(f"🎉 {len(changed)} records now point at the local mirror ({time.time() - started:.1f}s)")
+        return True
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mirror card images locally and render thumbnails")
+    parser.add_argument("--no-thumbnails", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=DOWNLOAD_CONCURRENCY, help="Parallel downloads")
+    parser.add_argument("--workers", type=int, default=None, help="Thumbnail processes (default: CPU count)")
+    args = parser.parse_args()
+
+    sys.exit(0 if main(not args.no_thumbnails, args.concurrency, args.workers) else 1)
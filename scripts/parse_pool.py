@@ -0,0 +1,81 @@
+import asyncio
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from tile_extractor import extract_tiles, page_count
+
+# Listing page parsing off the event loop.
+#
+# Fetches finish on the asyncio loop; parsing a page (tile_extractor) is pure
+# CPU work, so with fast fetching a single core becomes the limit. Fetched
+# pages are handed to a process pool instead: a fetch task puts the page on a
+# bounded queue (at most `queue_size` pages waiting for or being parsed; a
+# fetcher blocks while it is full), a worker process turns the HTML into
+# tiles and the page count, and scrape_pages consumes the results in page
+# order, so the state updates and the merge into master stay deterministic.
+#
+# Like run_metrics, the command starts a pool (start()) and the scrapers use
+# current(); outside of one, or with 0 workers, pages are parsed inline on
+# the loop as before.
+
+# -------------------- CONFIG --------------------
+# One core stays with the event loop; SCRAPE_PARSE_WORKERS overrides
+PARSE_WORKERS = int(os.environ.get("SCRAPE_PARSE_WORKERS", max(0, min(4, (os.cpu_count() or 1) - 1))))
+QUEUE_PER_WORKER = 4
+
+# tiles: extract_tiles() result (None: no <img alt> at all)
+# last_page: page_count() of the pagination widget
+# seconds: parse time in the worker
+ParsedPage = namedtuple("ParsedPage", ["tiles", "last_page", "seconds"])
+
+def parse_page(html):
+    t0 = time.perf_counter()
+    tiles = extract_tiles(html)
+    return ParsedPage(tiles, page_count(html), time.perf_counter() - t0)
+
+# -------------------- POOLS --------------------
+class InlineParser:
+    workers = 0
+
+    async def parse(self, html):
+        return parse_page(html)
+
+    def close(self):
+        pass
+
+class ParsePool:
+    def __init__(self, workers=PARSE_WORKERS, queue_size=None):
+        self.workers = workers
+        self.queue_size = queue_size or workers * QUEUE_PER_WORKER
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._slots = (None, None)
+
+    async def parse(self, html):
+        # The semaphore binds to the running loop, so there is one per loop
+        loop = asyncio.get_running_loop()
+        if self._slots[0] is not loop: self._slots = (loop, asyncio.Semaphore(self.queue_size))
+        async with self._slots[1]:
+            return await loop.run_in_executor(self._executor, parse_page, html)
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+
+# -------------------- ACTIVE POOL --------------------
+_INLINE = InlineParser()
+_active = None
+
+def start(workers=PARSE_WORKERS, queue_size=None):
+    global _active
+    close()
+    _active = ParsePool(workers, queue_size) if workers > 0 else None
+    return current()
+
+def current():
+    return _active or _INLINE
+
+def close():
+    global _active
+    pool, _active = _active, None
+    if pool is not None: pool.close()
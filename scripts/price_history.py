@@ -0,0 +1,264 @@
+import argparse
+import datetime
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+from cards_file import iter_records
+
+# Append-only price history, one snapshot per scrape/refresh.
+#
+# Every unique_id gets a series number (ids.txt, append-only). A snapshot is
+# one column of prices over all series, stored as a block in prices.bin:
+# only the series whose price moved since the previous snapshot are written,
+# as [run of unchanged series, price delta] pairs (run-length + delta
+# encoding) in an int32 array, zlib-compressed. A day where nothing moved
+# costs one header. latest.bin holds the last column so appending does not
+# replay the history, and the queries stream the blocks one at a time.
+#
+#   python scripts/price_history.py record              # snapshot src/data/cards.json
+#   python scripts/price_history.py history OP01-120-NOENGRAVING-dbd199a1
+#   python scripts/price_history.py movers --since 2026-01-01 [--limit 20]
+
+PROJECT_ROOT = os.getcwd()
+DATA_FILE = os.path.join(PROJECT_ROOT, "src", "data", "cards.json")
+HISTORY_DIR = os.path.join(PROJECT_ROOT, "src", "data", "price_history")
+
+MAGIC = b"OPPH1\n"
+BLOCK = struct.Struct("<qIII")   # timestamp, series count, changes, payload bytes
+LATEST = struct.Struct("<QI")    # prices.bin size, block count
+MISSING = -1                     # price of a series that is not in the snapshot
+
+# -------------------- STORE --------------------
+class PriceHistory:
+    def __init__(self, directory=HISTORY_DIR):
+        self.directory = directory
+        self.ids_path = os.path.join(directory, "ids.txt")
+        self.blocks_path = os.path.join(directory, "prices.bin")
+        self.latest_path = os.path.join(directory, "latest.bin")
+        os.makedirs(directory, exist_ok=True)
+
+        self.ids = []
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, "r", encoding="utf-8") as f:
+                self.ids = f.read().splitlines()
+        self.series = {uid: i for i, uid in enumerate(self.ids)}
+
+        self.latest = array("i")
+        self.blocks = 0
+        size = len(MAGIC)
+        if os.path.exists(self.latest_path):
+            with open(self.latest_path, "rb") as f:
+                size, self.blocks = LATEST.unpack(f.read(LATEST.size))
+                self.latest.frombytes(f.read())
+        self._recover(size)
+
+    def _recover(self, size):
+        # A run that died between appending a block and saving latest.bin
+        # leaves a tail that latest.bin does not know about: drop it
+        if not os.path.exists(self.blocks_path):
+            with open(self.blocks_path, "wb") as f: f.write(MAGIC)
+            return
+        if os.path.getsize(self.blocks_path) > size:
+            with open(self.blocks_path, "r+b") as f: f.truncate(size)
+        # Series registered by that run (or never priced) read as missing
+        self.latest.extend([MISSING] * (len(self.ids) - len(self.latest)))
+
+    def append(self, records, ts=None, partial=False, removed=()):
+        # Snapshot of price_jpy per unique_id (first record wins for
+        # duplicated ids); ids not in `records` become missing. With
+        # `partial` the records are only the listings a run looked at (one
+        # set, a few sets): the other series keep their last price, and
+        # only the unique_ids in `removed` become missing.
+        # Returns the number of series whose price changed.
+        ts = int(ts if ts is not None else time.time())
+        new_ids = []
+        if partial:
+            column = array("i", self.latest)
+            for uid in removed:
+                i = self.series.get(uid)
+                if i is not None: column[i] = MISSING
+        else:
+            column = array("i", [MISSING]) * len(self.ids)
+        filled = set()
+        for r in records:
+            uid = r["unique_id"]
+            i = self.series.get(uid)
+            if i is None:
+                i = self.series[uid] = len(self.ids)
+                self.ids.append(uid)
+                new_ids.append(uid)
+                column.append(MISSING)
+            if i in filled: continue
+            filled.add(i)
+            column[i] = r.get("price_jpy") or 0
+
+        latest = self.latest
+        latest.extend([MISSING] * (len(column) - len(latest)))
+        payload = array("i")
+        run = 0
+        for i, price in enumerate(column):
+            if price == latest[i]:
+                run += 1
+                continue
+            payload.append(run)
+            payload.append(price - latest[i])
+            run = 0
+        body = zlib.compress(payload.tobytes()) if payload else b""
+
+        if new_ids:
+            with open(self.ids_path, "a", encoding="utf-8") as f:
+                f.write("".join(uid + "\n" for uid in new_ids))
+        with open(self.blocks_path, "ab") as f:
+            f.write(BLOCK.pack(ts, len(column), len(payload) // 2, len(body)))
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        self.latest = column
+        self.blocks += 1
+        tmp = self.latest_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(LATEST.pack(size, self.blocks))
+            f.write(column.tobytes())
+        os.replace(tmp, self.latest_path)
+        return len(payload) // 2
+
+    def rename(self, mapping):
+        # Moves series to new unique_ids ({old: new}); a new id that already
+        # has a series of its own is left alone. -> number of series renamed
+        moved = 0
+        for old, new in mapping.items():
+            i = self.series.get(old)
+            if i is None or new in self.series: continue
+            del self.series[old]
+            self.series[new] = i
+            self.ids[i] = new
+            moved += 1
+        if moved:
+            tmp = self.ids_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write("".join(uid + "\n" for uid in self.ids))
+            os.replace(tmp, self.ids_path)
+        return moved
+
+    # -------------------- READING --------------------
+    def _blocks(self, decode=True):
+        # Streams (timestamp, series count, [run, delta, ...] or None) in order
+        with open(self.blocks_path, "rb") as f:
+            f.seek(len(MAGIC))
+            for _ in range(self.blocks):
+                ts, n, changes, length = BLOCK.unpack(f.read(BLOCK.size))
+                if not decode or not length:
+                    f.seek(length, os.SEEK_CUR)
+                    yield ts, n, None
+                    continue
+                payload = array("i")
+                payload.frombytes(zlib.decompress(f.read(length)))
+                yield ts, n, payload
+
+    def snapshots(self):
+        return [ts for ts, _, _ in self._blocks(decode=False)]
+
+    def history(self, unique_id):
+        # -> [(timestamp, price or None)] for every snapshot where the price
+        # of unique_id changed (None: not listed); the series is a step function
+        target = self.series.get(unique_id)
+        if target is None: return []
+        points = []
+        price = MISSING
+        for ts, _, payload in self._blocks():
+            if payload is None: continue
+            idx = -1
+            for k in range(0, len(payload), 2):
+                idx += payload[k] + 1
+                if idx < target: continue
+                if idx == target:
+                    price += payload[k + 1]
+                    points.append((ts, None if price == MISSING else price))
+                break
+        return points
+
+    def column_at(self, ts):
+        # Prices of every series as of the last snapshot at or before ts
+        column = array("i")
+        for block_ts, n, payload in self._blocks():
+            if block_ts > ts: break
+            column.extend([MISSING] * (n - len(column)))
+            if payload is None: continue
+            idx = -1
+            for k in range(0, len(payload), 2):
+                idx += payload[k] + 1
+                column[idx] += payload[k + 1]
+        return column
+
+    def top_movers(self, since, limit=20, relative=False):
+        # Largest price changes between `since` (timestamp) and the latest
+        # snapshot, among series listed at both ends.
+        # -> [(unique_id, old, new, change)], change in JPY or as a ratio
+        before = self.column_at(since)
+        moves = []
+        for i, old in enumerate(before):
+            new = self.latest[i]
+            if old == new or old == MISSING or new == MISSING: continue
+            if relative:
+                if not old: continue
+                change = (new - old) / old
+            else:
+                change = new - old
+            moves.append((self.ids[i], old, new, change))
+        moves.sort(key=lambda m: abs(m[3]), reverse=True)
+        return moves[:limit]
+
+def parse_since(text):
+    # "2026-01-31" (local midnight) or a unix timestamp
+    try:
+        return int(text)
+    except ValueError:
+        return int(datetime.datetime.strptime(text, "%Y-%m-%d").timestamp())
+
+def record_snapshot(records, directory=HISTORY_DIR, renamed=None, partial=False, removed=()):
+    # Used by the scrapers after every write of cards.json; `renamed` moves
+    # series of records whose unique_id changed first (flat_builder.migrate_ids).
+    # partial / removed: see PriceHistory.append
+    history = PriceHistory(directory)
+    if renamed:
+        moved = history.rename(renamed)
+        if moved: print(f"📈 Price history: {moved} series moved to new ids")
+    changed = history.append(records, partial=partial, removed=removed)
+    print(f"📈 Price history: snapshot {history.blocks}, {changed} series changed")
+    return changed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query or extend the price history")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("record", help="Append a snapshot of cards.json")
+    p = sub.add_parser("history", help="Price changes of one card")
+    p.add_argument("unique_id")
+    p = sub.add_parser("movers", help="Biggest price changes since a date")
+    p.add_argument("--since", required=True, help="YYYY-MM-DD or unix timestamp")
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--relative", action="store_true", help="Rank by percent change")
+    parser.add_argument("--dir", default=HISTORY_DIR)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record_snapshot(iter_records(DATA_FILE), args.dir)
+        sys.exit(0)
+
+    history = PriceHistory(args.dir)
+    fmt = lambda ts: datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")
+    if args.command == "history":
+        points = history.history(args.unique_id)
+        if not points:
+            print(f"❌ No history for {args.unique_id}")
+            sys.exit(1)
+        for ts, price in points:
+            print(f"   {fmt(ts)}  {'—' if price is None else f'{price:,} 円'}")
+    else:
+        for uid, old, new, change in history.top_movers(parse_since(args.since), args.limit, args.relative):
+            shown = f"{change:+.1%}" if args.relative else f"{change:+,}"
+            print(f"   {uid}: {old:,} → {new:,} 円 ({shown})")
@@ -0,0 +1,170 @@
+import asyncio
+import email.utils
+import math
+import random
+import threading
+import time
+
+# Adaptive request pacing shared by the fetch engine, check_images.py and
+# the translator.
+#
+# Every host (or backend) gets a token bucket: requests take a token, tokens
+# come back at `rate` per second up to `burst`. The rate follows the host:
+#   - a fast 2xx/3xx/404 answer adds INCREASE of the starting rate (up to
+#     max_rate), so recovery takes as many answers on every host
+#   - a slow answer (over target_latency) scales it by SLOW_FACTOR
+#   - 429 / 503 halves it (once per pause) and pauses the bucket for
+#     Retry-After (or 1/rate)
+#   - other 5xx and network errors scale it by ERROR_FACTOR
+# so a run goes as fast as the host tolerates and backs off as soon as it
+# pushes back. retry_delay() gives the jittered exponential backoff for a
+# retry, never shorter than the server's Retry-After.
+#
+# reserve() only books a slot and returns how long to wait, so the same
+# controller works from threads (wait) and from asyncio (acquire).
+
+# -------------------- CONFIG --------------------
+INITIAL_RATE = 2.0        # requests per second per host
+MIN_RATE = 0.2
+MAX_RATE = 8.0
+BURST = 2
+TARGET_LATENCY = 2.0      # seconds; slower answers mean the host is struggling
+INCREASE = 0.05           # share of the starting rate added per fast answer
+SLOW_FACTOR = 0.9
+THROTTLE_FACTOR = 0.5
+ERROR_FACTOR = 0.75
+
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0        # seconds; doubled per retry, with full jitter
+BACKOFF_MAX = 60.0
+
+THROTTLE_STATUSES = {429, 503}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# -------------------- BUCKET --------------------
+class TokenBucket:
+    def __init__(self, rate, burst=BURST, min_rate=MIN_RATE, max_rate=MAX_RATE):
+        # rate None: no pacing, but Retry-After pauses still apply
+        self.rate = math.inf if rate is None else rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = math.inf if rate is None else max(max_rate, rate)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()   # in the future while paused
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, n=1, now=None):
+        # Takes n tokens (a negative n gives some back); -> seconds until the
+        # caller may send
+        with self.lock:
+            now = time.monotonic() if now is None else now
+            self._refill(now)
+            self.tokens = min(self.burst, self.tokens - n)
+            wait = max(0.0, self.updated - now)
+            if self.tokens < 0: wait += -self.tokens / self.rate
+            return wait
+
+    def try_take(self, now=None):
+        # Takes a token only if one is there; -> (taken, seconds until one is)
+        with self.lock:
+            now = time.monotonic() if now is None else now
+            self._refill(now)
+            if now >= self.updated and self.tokens >= 1:
+                self.tokens -= 1
+                return True, 0.0
+            return False, max(0.0, self.updated - now) + max(0.0, 1 - self.tokens) / self.rate
+
+    def pause(self, seconds, now=None):
+        with self.lock:
+            now = time.monotonic() if now is None else now
+            self._refill(now)
+            self.tokens = min(self.tokens, 0.0)
+            self.updated = max(self.updated, now + seconds)
+
+    def paused(self, now=None):
+        return self.updated > (time.monotonic() if now is None else now)
+
+    def scale(self, factor=1.0, add=0.0):
+        with self.lock:
+            if self.rate != math.inf:
+                self.rate = min(self.max_rate, max(self.min_rate, self.rate * factor + add))
+
+# -------------------- CONTROLLER --------------------
+class RateController:
+    def __init__(self, initial_rate=INITIAL_RATE, burst=BURST, min_rate=MIN_RATE, max_rate=MAX_RATE,
+                 target_latency=TARGET_LATENCY, retries=MAX_RETRIES, backoff=BACKOFF_BASE):
+        self.initial_rate = initial_rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.target_latency = target_latency
+        self.retries = retries
+        self.backoff = backoff
+        self.increase = INCREASE * (initial_rate or 0)
+        self.buckets = {}
+        self.stats = {"throttled": 0, "errors": 0, "retries": 0}
+        self._lock = threading.Lock()
+
+    def bucket(self, key):
+        with self._lock:
+            b = self.buckets.get(key)
+            if b is None:
+                b = self.buckets[key] = TokenBucket(self.initial_rate, self.burst, self.min_rate, self.max_rate)
+            return b
+
+    def rate(self, key):
+        return self.bucket(key).rate
+
+    # -------------------- PACING --------------------
+    def wait(self, key):
+        delay = self.bucket(key).reserve()
+        if delay > 0: time.sleep(delay)
+
+    async def acquire(self, key):
+        delay = self.bucket(key).reserve()
+        if delay > 0: await asyncio.sleep(delay)
+
+    # -------------------- FEEDBACK --------------------
+    def feedback(self, key, status=None, latency=None, retry_after=None):
+        # status None: the request failed without an answer (timeout, reset)
+        b = self.bucket(key)
+        if status in THROTTLE_STATUSES:
+            self.stats["throttled"] += 1
+            # Requests that were in flight together get throttled together;
+            # slow down once per pause, not once per answer
+            if not b.paused(): b.scale(THROTTLE_FACTOR)
+            b.pause(retry_after if retry_after is not None else 1 / b.rate if b.rate != math.inf else 1.0)
+        elif status is None or status >= 500:
+            self.stats["errors"] += 1
+            b.scale(ERROR_FACTOR)
+        elif latency is not None and latency > self.target_latency:
+            b.scale(SLOW_FACTOR)
+        else:
+            b.scale(add=self.increase)
+
+    def should_retry(self, status=None, attempt=0):
+        # status None: network error
+        return attempt < self.retries and (status is None or status in RETRY_STATUSES)
+
+    def retry_delay(self, attempt, retry_after=None):
+        # Full-jitter exponential backoff, at least the server's Retry-After
+        self.stats["retries"] += 1
+        delay = random.uniform(0, min(BACKOFF_MAX, self.backoff * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+# -------------------- HELPERS --------------------
+def parse_retry_after(value, now=None):
+    # Retry-After is either seconds or an HTTP date; -> seconds or None
+    if not value: return None
+    value = value.strip()
+    if value.isdigit(): return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when - (time.time() if now is None else now))
@@ -0,0 +1,210 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from scrape_cards import (
+    CODE_REGEX, DATA_FILE, SEARCH_KEYWORDS, SETS,
+    classify_tile, extract_price, make_engine, new_unit_state, print_fetch_stats,
+    scrape_search_async, scrape_set_async,
+)
+from tile_extractor import extract_tiles
+from flat_builder import image_key
+from set_registry import SetRegistry
+from card_store import CardStore
+from price_history import record_snapshot
+from build_frontend_data import build_frontend_data
+import run_metrics
+import parse_pool
+
+# Price-only refresh: walks the same listings as scrape_cards.py but only
+# reads code, image and price from each tile, matches it to the records that
+# are already in the card store and updates price_jpy in place. Names,
+# translations, variant labels and unique_ids are left untouched, and a
+# compact diff of the changes is written next to cards.json.
+#
+#   python scripts/refresh_prices.py                  # every set + promo searches
+#   python scripts/refresh_prices.py --sets op05 eb02 --no-search
+
+DIFF_FILE = os.path.join(os.path.dirname(DATA_FILE), "price_diff.json")
+
+# -------------------- COLLECT --------------------
+def collect_prices(html, page_url, state, don_prefix, default_rarity, tiles=None):
+    # Same tile walk as collect_page (dedup + per-code index) without the
+    # name/classification work; the label is only derived if a tile has to
+    # be matched by code + label because its image is unknown.
+    if tiles is None: tiles = extract_tiles(html)
+    if not tiles: return None
+
+    seen = state["seen"]
+    code_counts = state["code_counts"]
+    found = 0
+    for tile in tiles:
+        code_match = CODE_REGEX.search(tile.alt)
+        if code_match:
+            code = code_match.group(0).upper()
+        elif "DON" in tile.alt or "ドン" in tile.alt:
+            code = f"DON-{don_prefix}-{found+1:03d}"
+        else:
+            continue
+
+        if tile.signature in seen: continue
+        seen.add(tile.signature)
+
+        code_counts[code] = code_counts.get(code, -1) + 1
+        state["cards"].setdefault(code, []).append({
+            "image": tile.image,
+            "price": extract_price(tile.text) or extract_price(tile.alt),
+            "index": code_counts[code],
+            "tile": (tile.alt, tile.text),
+        })
+        found += 1
+    return found
+
+# -------------------- MATCH --------------------
+def match_prices(keyed_records, observed, matched=None):
+    # keyed_records: [(store key, record)]; observed: [(code, observation)] in
+    # scrape order. An observation updates every record with its image
+    # (duplicates of one product share it). Images are compared by
+    # flat_builder.image_key, without host and size directory, because
+    # check_images.py upgrades stored URLs to a larger size than the listing
+    # shows. Observations without an image or with an unknown one then claim
+    # one not yet matched record with their card_code + variant label. The
+    # first observation of a record wins (set listings come before searches).
+    # `matched` (a set) collects the keys of every record that was seen.
+    # -> (changed {key: record}, diff [[unique_id, old, new]], stats)
+    records = dict(keyed_records)
+    by_image, by_label = {}, {}
+    for key, r in keyed_records:
+        # Mirrored records (mirror_images.py) keep the yuyu-tei URL in source_image_url
+        image = image_key(r.get("source_image_url") or r.get("image_url"))
+        if image: by_image.setdefault(image, []).append(key)
+        by_label.setdefault((r.get("card_code"), r.get("variant_name")), []).append(key)
+
+    if matched is None: matched = set()
+    changed = {}
+    diff = []
+    stats = {"tiles": len(observed), "by_image": 0, "by_label": 0, "unmatched": 0}
+
+    def apply(key, price):
+        matched.add(key)
+        record = records[key]
+        if record.get("price_jpy") == price: return
+        diff.append([record["unique_id"], record.get("price_jpy"), price])
+        record["price_jpy"] = price
+        changed[key] = record
+
+    leftover = []
+    for code, obs in observed:
+        keys = by_image.get(image_key(obs["image"]))
+        if not keys:
+            leftover.append((code, obs))
+            continue
+        stats["by_image"] += 1
+        for key in keys:
+            if key not in matched: apply(key, obs["price"])
+
+    for code, obs in leftover:
+        alt, text = obs["tile"]
+        label = classify_tile(alt, text, obs["price"], obs["index"])[1]
+        key = next((k for k in by_label.get((code, label), ()) if k not in matched), None)
+        if key is None:
+            stats["unmatched"] += 1
+            continue
+        stats["by_label"] += 1
+        apply(key, obs["price"])
+
+    stats["unseen"] = len(records) - len(matched)
+    return changed, diff, stats
+
+# -------------------- RUN --------------------
+async def observe_prices(engine, sets, keywords):
+    # -> [(code, observation)] in set then keyword order, like scrape_all
+    units = [(scrape_set_async, s) for s in sets] + [(scrape_search_async, k) for k in keywords]
+    states = [new_unit_state() for _ in units]
+    tasks = [
+        asyncio.ensure_future(scrape(engine, arg, state, collect=collect_prices))
+        for (scrape, arg), state in zip(units, states)
+    ]
+    observed = []
+    failed = []
+    try:
+        for (_, arg), state, task in zip(units, states, tasks):
+            cards = await task
+            if state["error"]: failed.append((arg, state["error"]))
+            for code, observations in cards.items():
+                observed.extend((code, o) for o in observations)
+    finally:
+        for task in tasks: task.cancel()
+    return observed, failed
+
+def write_diff(path, diff, stats):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"generated_at": int(time.time()), "stats": stats, "changed": diff},
+                  f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def refresh_prices(sets=None, search=True, diff_path=DIFF_FILE, dry_run=False):
+    if sets is None: sets, _ = SetRegistry().plan(SETS)
+    keywords = SEARCH_KEYWORDS if search else []
+
+    store = CardStore(json_path=DATA_FILE)
+    try:
+        store.sync_from_json()
+        keyed = list(store.iter_keyed())
+        if not keyed:
+            print(f"❌ No records in {store.path}; run scrape_cards.py first")
+            return None
+        print(f"💴 Refreshing prices of {len(keyed)} records from {len(sets)} sets and {len(keywords)} searches...")
+
+        engine = make_engine()
+        try:
+            observed, failed = asyncio.run(observe_prices(engine, sets, keywords))
+        finally:
+            engine.close()
+        print_fetch_stats(engine)
+
+        seen = set()
+        changed, diff, stats = match_prices(keyed, observed, seen)
+        stats["failed_units"] = len(failed)
+        for unit, error in failed: print(f"   ⚠️ {unit} failed: {error}")
+        print(f"🔗 {stats['tiles']} tiles: {stats['by_image']} matched by image, {stats['by_label']} by code + label, "
+              f"{stats['unmatched']} unmatched; {stats['unseen']} records not listed")
+
+        if dry_run:
+            print(f"🧪 Dry run: {len(diff)} price changes not written")
+            return diff
+        if changed:
+            store.update_records(changed)
+            store.export_json()
+            build_frontend_data(store.iter_records())
+        write_diff(diff_path, diff, stats)
+        # Records no refreshed page listed were not observed: they keep their last price
+        record_snapshot((record for key, record in keyed if key in seen), partial=True)
+        print(f"🎉 {len(diff)} prices changed; diff written to {diff_path}")
+        return diff
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update price_jpy of existing records without a full rebuild")
+    parser.add_argument("--sets", nargs="+", help="Set codes to refresh (default: every known set)")
+    parser.add_argument("--no-search", action="store_true", help="Skip the promo keyword searches")
+    parser.add_argument("--diff", default=DIFF_FILE, help="Where to write the price diff")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing anything")
+    args = parser.parse_args()
+
+    sets = [s.lower() for s in args.sets] if args.sets else None
+    run_metrics.start("refresh_prices")
+    parse_pool.start()
+    try:
+        result = refresh_prices(sets, not args.no_search, args.diff, args.dry_run)
+    finally:
+        parse_pool.close()
+        run_metrics.finish()
+    sys.exit(0 if result is not None else 1)
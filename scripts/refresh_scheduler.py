@@ -0,0 +1,384 @@
+import argparse
+import asyncio
+import datetime
+import heapq
+import json
+import os
+import re
+import sys
+import time
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from scrape_cards import (
+    DATA_FILE, SEARCH_KEYWORDS, SETS,
+    discover_sets, make_engine, merge_into, new_unit_state, scrape_search_async,
+    scrape_set_async,
+)
+from flat_builder import build_flat_database
+from refresh_prices import collect_prices, match_prices
+from set_registry import SetRegistry
+from card_store import CardStore
+from price_history import HISTORY_DIR, MISSING, PriceHistory, record_snapshot
+from build_frontend_data import build_frontend_data
+from rate_limiter import TokenBucket
+import run_metrics
+
+# Long-running refresh of the sets and promo searches, hottest first.
+#
+#   python scripts/refresh_scheduler.py plan              # show the queue, fetch nothing
+#   python scripts/refresh_scheduler.py run [--budget 600] [--once]
+#
+# Every unit (set:op05, search:P-, the names run_metrics uses) gets a score
+# in [0, 1] from
+#   volatility  mean relative price move of its records over the last
+#               VOLATILITY_WINDOW (price_history.py)
+#   demand      share of its records flagged is_high_demand (rank >= 5)
+#   recency     newest listed set of its series = 1, one release older =
+#               1/2, ...; codes past the newest one or found on the set
+#               index but never scraped = 1
+# and is refreshed every MAX_INTERVAL .. MIN_INTERVAL (log scale) according
+# to it: new sets and chase cards hourly, old starter decks weekly. Due units
+# run from a priority queue (earliest due, then highest score) within a
+# request budget per hour.
+#
+# Each refresh is written to the card store right away: a set replaces its
+# rows (like add_set.py), a search updates the prices of the records it
+# lists (like refresh_prices.py). cards.json, the frontend data and a price
+# history snapshot are exported from the store at most every
+# EXPORT_INTERVAL. The schedule is kept in refresh_schedule.json.
+
+# -------------------- CONFIG --------------------
+SCHEDULE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "refresh_schedule.json")
+REQUESTS_PER_HOUR = 600
+MIN_INTERVAL = 3600               # score 1
+MAX_INTERVAL = 7 * 24 * 3600      # score 0
+ERROR_RETRY = 15 * 60             # a failed unit is retried after this
+VOLATILITY_WINDOW = 7 * 24 * 3600
+VOLATILITY_FULL = 0.10            # a 10% mean move counts as fully volatile
+WEIGHTS = {"volatility": 0.5, "demand": 0.3, "recency": 0.2}
+SEARCH_RECENCY = 0.3              # promo searches have no release order
+DEFAULT_PAGES = 3                 # request estimate for a unit never run
+EXPORT_INTERVAL = 30 * 60
+RESCORE_INTERVAL = 3600
+MAX_SLEEP = 300                   # re-plan at least this often while idle
+
+SERIES_REGEX = re.compile(r"([a-z]+)(\d+)$")
+
+# -------------------- UNITS --------------------
+def unit_name(kind, arg):
+    return f"{kind}:{arg}"
+
+def unit_of_url(url):
+    # Listing URL -> unit name, None for anything else
+    parts = urlsplit(url or "")
+    path = [p for p in parts.path.split("/") if p]
+    if len(path) != 4 or path[:3] != ["sell", "opc", "s"]: return None
+    if path[3] == "search":
+        word = (parse_qs(parts.query).get("search_word") or [""])[0]
+        return unit_name("search", word) if word else None
+    return unit_name("set", path[3].lower())
+
+def records_by_unit(records):
+    # -> {unit: [record]}; a record found by several listings counts for each
+    units = {}
+    for r in records:
+        found = {unit_of_url(url) for url in r.get("sources") or []} - {None}
+        if not found and r.get("set"): found = {unit_name("set", r["set"].lower())}
+        for unit in found: units.setdefault(unit, []).append(r)
+    return units
+
+# -------------------- SCORING --------------------
+def volatility(records, history, before):
+    # Mean relative price move per record between `before` (a price column)
+    # and the latest snapshot, scaled so VOLATILITY_FULL -> 1
+    moves = []
+    for r in records:
+        i = history.series.get(r["unique_id"])
+        if i is None or i >= len(before) or i >= len(history.latest): continue
+        old, new = before[i], history.latest[i]
+        if old in (MISSING, 0) or new == MISSING: continue
+        moves.append(abs(new - old) / old)
+    if not moves: return 0.0
+    return min(1.0, sum(moves) / len(moves) / VOLATILITY_FULL)
+
+def demand(records):
+    if not records: return 0.0
+    return sum(bool(r.get("is_high_demand")) for r in records) / len(records)
+
+def recency(unit, registry, newest):
+    kind, _, arg = unit.partition(":")
+    if kind != "set": return SEARCH_RECENCY
+    if registry.sets.get(arg, {}).get("status") == "new": return 1.0
+    m = SERIES_REGEX.match(arg)
+    if not m: return 0.0
+    return 1 / (1 + max(0, newest.get(m.group(1), 0) - int(m.group(2))))
+
+def newest_by_series(set_codes):
+    newest = {}
+    for code in set_codes:
+        m = SERIES_REGEX.match(code)
+        if m: newest[m.group(1)] = max(newest.get(m.group(1), 0), int(m.group(2)))
+    return newest
+
+def interval_for(score):
+    # Log-scale between MAX_INTERVAL (score 0) and MIN_INTERVAL (score 1)
+    return MAX_INTERVAL * (MIN_INTERVAL / MAX_INTERVAL) ** max(0.0, min(1.0, score))
+
+def score_units(units, records, registry, history, now=None):
+    # -> {unit: {"score", "volatility", "demand", "recency", "records"}}
+    now = now or time.time()
+    by_unit = records_by_unit(records)
+    before = history.column_at(now - VOLATILITY_WINDOW) if history.blocks > 1 else []
+    # Seed codes of sets that are not out yet have no records and do not count
+    newest = newest_by_series(u.partition(":")[2] for u in units if u.startswith("set:") and by_unit.get(u))
+    scores = {}
+    for unit in units:
+        unit_records = by_unit.get(unit, [])
+        parts = {
+            "volatility": volatility(unit_records, history, before),
+            "demand": demand(unit_records),
+            "recency": recency(unit, registry, newest),
+        }
+        score = sum(WEIGHTS[k] * v for k, v in parts.items())
+        scores[unit] = {"score": round(score, 4), **{k: round(v, 4) for k, v in parts.items()},
+                        "records": len(unit_records)}
+    return scores
+
+# -------------------- SCHEDULE --------------------
+# {"scored_at": ts, "exported_at": ts,
+#  "units": {unit: {"score", "volatility", "demand", "recency", "records",
+#                   "last_run", "pages", "failed_at", "error"}}}
+class Schedule:
+    def __init__(self, path=SCHEDULE_FILE):
+        self.path = path
+        self.data = {"scored_at": 0, "exported_at": 0, "units": {}}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError):
+                print(f"⚠️ Could not read {path}, starting a fresh schedule")
+
+    @property
+    def units(self):
+        return self.data["units"]
+
+    def due_at(self, unit):
+        entry = self.units.get(unit, {})
+        due = entry.get("last_run", 0) + interval_for(entry.get("score", 0.0))
+        if entry.get("failed_at"): due = max(due, entry["failed_at"] + ERROR_RETRY)
+        return due
+
+    def queue(self, units):
+        # Heap of (due time, -score, unit)
+        heap = [(self.due_at(u), -self.units.get(u, {}).get("score", 0.0), u) for u in units]
+        heapq.heapify(heap)
+        return heap
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp, self.path)
+
+def keep_translation(old, new):
+    # translate_cards.py keeps the Japanese name in name_ja; while the listing
+    # still has that name, the stored translation stays
+    if old and old.get("name_ja") and old["name_ja"] == new.get("base_name"):
+        new["base_name"] = old["base_name"]
+        new["name_ja"] = old["name_ja"]
+
+# -------------------- SCHEDULER --------------------
+class RefreshScheduler:
+    def __init__(self, engine, store, registry, schedule, budget=REQUESTS_PER_HOUR, history_dir=HISTORY_DIR):
+        self.engine = engine
+        self.store = store
+        self.registry = registry
+        self.schedule = schedule
+        self.history_dir = history_dir
+        # A full hour of budget may be spent at once, then it refills evenly
+        self.budget = TokenBucket(budget / 3600, burst=budget, min_rate=0, max_rate=budget / 3600)
+        self.dirty = False
+
+    def units(self):
+        sets, _ = self.registry.plan(SETS)
+        return [unit_name("set", s) for s in sets] + [unit_name("search", k) for k in SEARCH_KEYWORDS]
+
+    def rescore(self, now=None):
+        now = now or time.time()
+        scores = score_units(self.units(), self.store.iter_records(), self.registry, PriceHistory(self.history_dir), now)
+        for unit, parts in scores.items():
+            self.schedule.units.setdefault(unit, {}).update(parts)
+        self.schedule.data["scored_at"] = now
+        self.schedule.save()
+
+    def requests_made(self):
+        s = self.engine.stats
+        return s["downloaded"] + s["revalidated"] + s["retries"]
+
+    # -------------------- REFRESH --------------------
+    async def refresh(self, unit):
+        # Scrapes one unit and writes it to the store; -> requests made
+        kind, _, arg = unit.partition(":")
+        entry = self.schedule.units.setdefault(unit, {})
+        estimate = entry.get("pages") or DEFAULT_PAGES
+        wait = self.budget.reserve(estimate)
+        if wait > 0:
+            print(f"⏳ Request budget used up, waiting {wait:.0f}s")
+            await asyncio.sleep(wait)
+
+        before = self.requests_made()
+        state = new_unit_state()
+        self.store.sync_from_json()
+        with run_metrics.current().stage(f"refresh_{kind}"):
+            if kind == "set":
+                written = await self.refresh_set(arg, state)
+            else:
+                written = await self.refresh_search(arg, state)
+        made = self.requests_made() - before
+        self.budget.reserve(made - estimate)
+
+        now = time.time()
+        if state["error"]:
+            entry.update(failed_at=now, error=state["error"])
+            print(f"   ⚠️ {unit} failed: {state['error']} (retry in {ERROR_RETRY // 60} min)")
+        else:
+            entry.update(last_run=now, pages=max(1, state["pages_done"]), failed_at=0, error=None)
+            print(f"   ✅ {unit}: {written} records written, {made} requests, "
+                  f"next in {interval_for(entry.get('score', 0.0)) / 3600:.1f}h")
+        self.dirty = self.dirty or bool(written)
+        self.schedule.save()
+        return made
+
+    async def refresh_set(self, set_code, state):
+        # The listing is upserted by unique_id (stable, see flat_builder), not
+        # swapped in by set: range and promo units (op01-op10, p-101) and
+        # reprints list records stored under other sets. Records that only
+        # this unit listed and that are gone from it are dropped; names
+        # translate_cards.py already translated are kept.
+        cards = await scrape_set_async(self.engine, set_code, state)
+        if state["error"]: return 0
+        self.registry.record(set_code, sum(len(v) for v in cards.values()))
+        self.registry.save()
+        if not cards: return 0
+        merged = {}
+        merge_into(merged, cards, {})
+        records = build_flat_database(merged)
+
+        unit = unit_name("set", set_code.lower())
+        ids = {r["unique_id"] for r in records}
+        existing = {}
+        gone = []
+        for r in self.store.iter_records():
+            uid = r["unique_id"]
+            if uid in ids:
+                existing.setdefault(uid, r)
+            elif r.get("sources") and all(unit_of_url(url) == unit for url in r["sources"]):
+                gone.append(uid)
+        for r in records: keep_translation(existing.get(r["unique_id"]), r)
+        self.store.replace_records(records, gone)
+        return len(records)
+
+    async def refresh_search(self, keyword, state):
+        # Same as refresh_prices.py: prices of the listed records are updated in place
+        cards = await scrape_search_async(self.engine, keyword, state, collect=collect_prices)
+        if state["error"]: return 0
+        observed = [(code, o) for code, observations in cards.items() for o in observations]
+        changed, _, _ = match_prices(list(self.store.iter_keyed()), observed)
+        if changed: self.store.update_records(changed)
+        return len(changed)
+
+    def export(self, force=False):
+        now = time.time()
+        if not self.dirty or (not force and now - self.schedule.data.get("exported_at", 0) < EXPORT_INTERVAL):
+            return False
+        self.store.export_json()
+        build_frontend_data(self.store.iter_records())
+        record_snapshot(self.store.iter_records(), self.history_dir)
+        self.dirty = False
+        self.schedule.data["exported_at"] = now
+        self.schedule.save()
+        return True
+
+    # -------------------- LOOP --------------------
+    async def run(self, once=False):
+        # once: refresh what is due now, export and return
+        refreshed = 0
+        self.schedule.data.setdefault("exported_at", 0)
+        if not self.schedule.data["exported_at"]: self.schedule.data["exported_at"] = time.time()
+        try:
+            while True:
+                await discover_sets(self.engine, self.registry)
+                now = time.time()
+                if now - self.schedule.data.get("scored_at", 0) >= RESCORE_INTERVAL: self.rescore(now)
+                queue = self.schedule.queue(self.units())
+                due, _, unit = queue[0]
+                if due > now:
+                    if once: break
+                    self.export()
+                    await asyncio.sleep(min(due - now, MAX_SLEEP))
+                    continue
+                await self.refresh(unit)
+                refreshed += 1
+                if self.export():
+                    # A new snapshot moves the volatility scores
+                    self.schedule.data["scored_at"] = 0
+                    # One metrics report per export, so a daemon's report does not grow forever
+                    if run_metrics.current().enabled:
+                        run_metrics.finish()
+                        run_metrics.start("scheduler")
+        finally:
+            self.export(force=True)
+            self.registry.save()
+        return refreshed
+
+def print_plan(schedule, units, now=None):
+    now = now or time.time()
+    fmt = lambda ts: "now" if ts <= now else datetime.datetime.fromtimestamp(ts).strftime("%m-%d %H:%M")
+    queue = schedule.queue(units)
+    print(f"🗓️ {len(queue)} units, {sum(d <= now for d, _, _ in queue)} due now")
+    while queue:
+        due, _, unit = heapq.heappop(queue)
+        e = schedule.units.get(unit, {})
+        print(f"   {fmt(due):>11}  every {interval_for(e.get('score', 0.0)) / 3600:6.1f}h  score {e.get('score', 0.0):.2f} "
+              f"(vol {e.get('volatility', 0.0):.2f} dem {e.get('demand', 0.0):.2f} new {e.get('recency', 0.0):.2f})  {unit}")
+
+def main(command="run", budget=REQUESTS_PER_HOUR, once=False, schedule_path=SCHEDULE_FILE):
+    store = CardStore(json_path=DATA_FILE)
+    registry = SetRegistry()
+    schedule = Schedule(schedule_path)
+    engine = make_engine()
+    scheduler = RefreshScheduler(engine, store, registry, schedule, budget)
+    try:
+        store.sync_from_json()
+        if command == "plan":
+            scheduler.rescore()
+            print_plan(schedule, scheduler.units())
+            return True
+        print(f"🕰️ Refresh scheduler: {budget} requests/hour{' (once)' if once else ''}")
+        refreshed = asyncio.run(scheduler.run(once))
+        print(f"🎉 {refreshed} units refreshed")
+        return True
+    except KeyboardInterrupt:
+        print("🛑 Stopped")
+        return True
+    finally:
+        engine.close()
+        store.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh sets and searches by price volatility, demand and recency")
+    parser.add_argument("command", choices=["run", "plan"], nargs="?", default="run")
+    parser.add_argument("--budget", type=int, default=REQUESTS_PER_HOUR, help="Requests per hour")
+    parser.add_argument("--once", action="store_true", help="Refresh the units due now, then exit")
+    parser.add_argument("--schedule", default=SCHEDULE_FILE)
+    args = parser.parse_args()
+
+    run_metrics.start("scheduler")
+    try:
+        ok = main(args.command, args.budget, args.once, args.schedule)
+    finally:
+        run_metrics.finish()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,227 @@
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+
+# Per-run instrumentation for the scrapers and the translator.
+#
+# A command starts a run (start("scrape")), the code it calls reports into
+# current() as it goes, and the command writes the report at the end:
+#
+#   src/data/metrics/<command>.json   stages, per-unit and per-page numbers
+#   $OPTCG_METRICS_TEXTFILE_DIR/optcg_<command>.prom
+#                                     the same totals for node_exporter's
+#                                     textfile collector (only if the env
+#                                     var is set)
+#
+# Per page: fetch latency, bytes, HTTP status / cache source, parse time,
+# tiles on the page, variants kept and tiles dropped (with the reason).
+# Per stage: wall time of build_flat_database, the cards.json write, the
+# translation batches, ... Exceptions that the code deliberately swallows
+# are counted by place and type, so they show up somewhere.
+# Outside of a run current() is a no-op collector.
+
+# -------------------- CONFIG --------------------
+PROJECT_ROOT = os.getcwd()
+METRICS_DIR = os.path.join(PROJECT_ROOT, "src", "data", "metrics")
+TEXTFILE_DIR = os.environ.get("OPTCG_METRICS_TEXTFILE_DIR")
+
+# -------------------- COLLECTOR --------------------
+class RunMetrics:
+    enabled = True
+
+    def __init__(self, command):
+        self.command = command
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.stages = {}        # name -> {"seconds", "calls"}
+        self.pages = []         # one dict per fetched page
+        self.unit_errors = {}   # unit -> error
+        self.counters = {}      # name -> number
+        self.exceptions = {}    # (where, type) -> count
+        self.extra = {}
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            entry["seconds"] += time.perf_counter() - t0
+            entry["calls"] += 1
+
+    def page(self, unit, page, resp=None, parse_seconds=0.0, tiles=0, variants=0, dropped=None, error=None):
+        # resp: fetch_engine.Page (status, elapsed, bytes, source)
+        self.pages.append({
+            "unit": unit,
+            "page": page,
+            "status": resp.status if resp is not None else None,
+            "source": resp.source if resp is not None else None,
+            "fetch_ms": round(resp.elapsed * 1000, 2) if resp is not None else None,
+            "bytes": resp.bytes if resp is not None else 0,
+            "parse_ms": round(parse_seconds * 1000, 2),
+            "tiles": tiles,
+            "variants": variants,
+            "dropped": dict(dropped or {}),
+            "error": error,
+        })
+
+    def unit_error(self, unit, error):
+        self.unit_errors[unit] = error
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def swallowed(self, where, exc):
+        key = (where, type(exc).__name__)
+        self.exceptions[key] = self.exceptions.get(key, 0) + 1
+
+    # -------------------- REPORT --------------------
+    def units(self):
+        # Per-unit totals in the order units were first seen
+        units = {}
+        for p in self.pages:
+            u = units.setdefault(p["unit"], {
+                "pages": 0, "bytes": 0, "fetch_ms": [], "parse_ms": 0.0, "tiles": 0, "variants": 0,
+                "dropped": {}, "statuses": {}, "error": None,
+            })
+            u["pages"] += 1
+            u["bytes"] += p["bytes"]
+            if p["fetch_ms"] is not None: u["fetch_ms"].append(p["fetch_ms"])
+            u["parse_ms"] += p["parse_ms"]
+            u["tiles"] += p["tiles"]
+            u["variants"] += p["variants"]
+            for reason, n in p["dropped"].items(): u["dropped"][reason] = u["dropped"].get(reason, 0) + n
+            key = p["source"] if p["source"] == "fresh" else str(p["status"])
+            u["statuses"][key] = u["statuses"].get(key, 0) + 1
+        for unit, error in self.unit_errors.items():
+            units.setdefault(unit, {"pages": 0, "bytes": 0, "fetch_ms": [], "parse_ms": 0.0, "tiles": 0,
+                                    "variants": 0, "dropped": {}, "statuses": {}, "error": None})["error"] = error
+        for u in units.values():
+            latencies = sorted(u.pop("fetch_ms"))
+            u["fetch_ms_total"] = round(sum(latencies), 2)
+            u["fetch_ms_p50"] = latencies[len(latencies) // 2] if latencies else None
+            u["fetch_ms_max"] = latencies[-1] if latencies else None
+            u["parse_ms"] = round(u["parse_ms"], 2)
+        return units
+
+    def report(self):
+        statuses = {}
+        for p in self.pages:
+            key = p["source"] if p["source"] == "fresh" else str(p["status"])
+            statuses[key] = statuses.get(key, 0) + 1
+        return {
+            "command": self.command,
+            "started_at": int(self.started_at),
+            "duration_s": round(time.perf_counter() - self._t0, 3),
+            "stages": {k: {"seconds": round(v["seconds"], 4), "calls": v["calls"]} for k, v in self.stages.items()},
+            "totals": {
+                "pages": len(self.pages),
+                "bytes": sum(p["bytes"] for p in self.pages),
+                "fetch_ms": round(sum(p["fetch_ms"] or 0 for p in self.pages), 2),
+                "parse_ms": round(sum(p["parse_ms"] for p in self.pages), 2),
+                "tiles": sum(p["tiles"] for p in self.pages),
+                "variants": sum(p["variants"] for p in self.pages),
+                "statuses": statuses,
+                "failed_units": len(self.unit_errors),
+            },
+            "counters": self.counters,
+            "exceptions": [{"where": w, "type": t, "count": n} for (w, t), n in sorted(self.exceptions.items())],
+            "units": self.units(),
+            "pages": self.pages,
+            **self.extra,
+        }
+
+    def prometheus(self, report=None):
+        report = report or self.report()
+        cmd = _label(self.command)
+        lines = []
+        def metric(name, help_text, kind, samples):
+            lines.append(f"# HELP optcg_{name} {help_text}")
+            lines.append(f"# TYPE optcg_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_label(v)}"' for k, v in [("command", cmd)] + labels)
+                lines.append(f"optcg_{name}{{{label_text}}} {value}")
+        metric("run_timestamp_seconds", "Start of the last run", "gauge", [([], report["started_at"])])
+        metric("run_duration_seconds", "Wall time of the last run", "gauge", [([], report["duration_s"])])
+        metric("stage_seconds", "Wall time per stage", "gauge",
+               [([("stage", k)], v["seconds"]) for k, v in report["stages"].items()])
+        metric("http_responses", "Pages by HTTP status (fresh: served from cache)", "gauge",
+               [([("status", k)], v) for k, v in report["totals"]["statuses"].items()])
+        units = report["units"].items()
+        metric("unit_pages", "Pages fetched per set/search", "gauge", [([("unit", u)], v["pages"]) for u, v in units])
+        metric("unit_bytes", "Bytes downloaded per set/search", "gauge", [([("unit", u)], v["bytes"]) for u, v in units])
+        metric("unit_fetch_seconds", "Fetch time per set/search", "gauge",
+               [([("unit", u)], round(v["fetch_ms_total"] / 1000, 4)) for u, v in units])
+        metric("unit_parse_seconds", "Parse time per set/search", "gauge",
+               [([("unit", u)], round(v["parse_ms"] / 1000, 4)) for u, v in units])
+        metric("unit_variants", "Variants kept per set/search", "gauge", [([("unit", u)], v["variants"]) for u, v in units])
+        metric("unit_tiles_dropped", "Tiles dropped per set/search and reason", "gauge",
+               [([("unit", u), ("reason", r)], n) for u, v in units for r, n in v["dropped"].items()])
+        metric("unit_failed", "1 if the set/search ended on an error", "gauge",
+               [([("unit", u)], int(bool(v["error"]))) for u, v in units])
+        metric("exceptions_swallowed", "Exceptions caught and skipped", "gauge",
+               [([("where", e["where"]), ("type", e["type"])], e["count"]) for e in report["exceptions"]])
+        metric("counter", "Run counters", "gauge", [([("name", k)], v) for k, v in report["counters"].items()])
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory=METRICS_DIR, textfile_dir=TEXTFILE_DIR):
+        # -> path of the JSON report
+        report = self.report()
+        path = os.path.join(directory, f"{self.command}.json")
+        _atomic_write(path, json.dumps(report, ensure_ascii=False, indent=1))
+        if textfile_dir:
+            _atomic_write(os.path.join(textfile_dir, f"optcg_{self.command}.prom"), self.prometheus(report))
+        t = report["totals"]
+        print(f"📊 Metrics: {t['pages']} pages, {t['bytes'] / 1024:.0f} KB, fetch {t['fetch_ms'] / 1000:.1f}s, "
+              f"parse {t['parse_ms'] / 1000:.1f}s -> {path}")
+        return path
+
+class NullMetrics(RunMetrics):
+    # Collector used outside of a run: accepts everything, keeps nothing
+    enabled = False
+
+    def __init__(self):
+        super().__init__("none")
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def page(self, *args, **kwargs): pass
+    def unit_error(self, unit, error): pass
+    def count(self, name, n=1): pass
+    def swallowed(self, where, exc): pass
+    def write(self, *args, **kwargs): return None
+
+# -------------------- ACTIVE RUN --------------------
+_NULL = NullMetrics()
+_active = None
+
+def start(command):
+    global _active
+    _active = RunMetrics(command)
+    return _active
+
+def current():
+    return _active or _NULL
+
+def finish(**extra):
+    # Writes the active run's report and ends the run; -> report path
+    global _active
+    run, _active = _active, None
+    if run is None: return None
+    run.extra.update(extra)
+    return run.write()
+
+# -------------------- HELPERS --------------------
+def _label(value):
+    return re.sub(r'["\\\n]', "_", str(value))
+
+def _atomic_write(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f: f.write(text)
+    os.replace(tmp, path)
@@ -1,18 +1,41 @@
-import requests
-from bs4 import BeautifulSoup
-import json
-import time
+import argparse
+import asyncio
 import os
 import re
 import sys
+import time
+
+from fetch_engine import FetchEngine
+from http_cache import ResponseCache
+from tile_extractor import extract_tiles
+from set_registry import SetRegistry, parse_set_index
+from card_store import CardStore
+from scrape_checkpoint import ScrapeCheckpoint
+from price_history import record_snapshot
+from mirror_images import Mirror, is_mirrored, mirror_records
+from build_frontend_data import build_frontend_data
+from variant_record import BASE_LABEL, HIGH_VALUE_LABEL, INDEX_LABEL, UNMARKED_LABEL, Variant
+from keyword_matcher import KeywordMatcher
+from flat_builder import FlatBuilder, changed_ids, migrate_ids, save_migrations, write_changes
+import run_metrics
+import parse_pool
 
 # -------------------- CONFIG --------------------
 PROJECT_ROOT = os.getcwd()
 DATA_FILE = os.path.join(PROJECT_ROOT, "src", "data", "cards.json")
-YUYUTEI_BASE = "https://yuyu-tei.jp/sell/opc/s"
+# Point YUYUTEI_HOST at a local stand-in (see fixture_server.py) to scrape offline
+YUYUTEI_HOST = os.environ.get("YUYUTEI_HOST", "https://yuyu-tei.jp").rstrip("/")
+YUYUTEI_BASE = f"{YUYUTEI_HOST}/sell/opc/s"
+SET_INDEX_URL = f"{YUYUTEI_HOST}/top/opc"
+MAX_PAGES = 100
+PAGE_LOOKAHEAD = 0 # extra pages probed ahead when the page count is unknown
+# Set YUYUTEI_CACHE=0 to bypass the on-disk response cache (see http_cache.py)
+USE_HTTP_CACHE = os.environ.get("YUYUTEI_CACHE", "1") != "0"
 
 # ✅ ALL SETS
 # ✅ ALL SETS (Expanded as requested)
+# Seed list only: codes that turn out empty are parked in set_registry.json
+# until their recheck is due, and new sets are found from the site's set index.
 SETS = [
     # Boosters
     *[f"op{i:02d}" for i in range(1, 21)], # op01 to op14
@@ -43,6 +66,8 @@ PRICE_REGEX = re.compile(r"(\d{1,3}(?:,\d{3})*)\s*円")
 RARITY_REGEX = re.compile(r"(P-SEC|P-SR|P-R|P-L|SEC|SR|R|L|SP|UC|C|DON!!)")
 
 # -------------------- HELPERS --------------------
+# Per-<img> container lookup on a BeautifulSoup tree. collect_page now uses
+# tile_extractor.extract_tiles; this stays as the reference for benchmark.py.
 def find_product_container(tag):
     try:
         for parent in tag.parents:
@@ -60,13 +85,6 @@ def extract_price(text):
         except: pass
     return 0
 
-def extract_rarity(text):
-    # Check explicitly for DON first
-    if "DON" in text or "ドン" in text:
-        return "DON"
-    m = RARITY_REGEX.search(text or "")
-    return m.group(1) if m else None
-
 # -------------------- KEYWORDS --------------------
 VARIANTS = [
     ("スーパーパラレル", "Super Parallel (Manga)", 10),
@@ -115,185 +133,219 @@ VARIANTS = [
     ("ドン!!", "DON!! Card", 4), 
     ("DON!!", "DON!! Card", 4), 
 ]
+# Highest rank wins, the earlier entry on ties
+VARIANT_MATCHER = KeywordMatcher([jp for jp, _, _ in VARIANTS], lambda i: (VARIANTS[i][2], -i))
+
+# -------------------- CLASSIFICATION --------------------
+def extract_rarity(text):
+    # Check explicitly for DON first
+    if not text: return None
+    if "DON" in text or "ドン" in text:
+        return "DON"
+    m = RARITY_REGEX.search(text)
+    return m.group(1) if m else None
 
 def classify_variant(text, price, index):
-    label = "Base / Normal"
+    label = BASE_LABEL
     rank = 0
     is_high = False
-   
-    for jp, en, r in VARIANTS:
-        if jp in text:
-            if r > rank:
-                label = en
-                rank = r
-   
+
+    best = VARIANT_MATCHER.best(text)
+    if best is not None and VARIANTS[best][2] > rank:
+        _, label, rank = VARIANTS[best]
+
     if price >= 5000 and rank == 0:
-        label = "High Value Variant (Unknown Type)"
+        label = HIGH_VALUE_LABEL
         rank = 6
     elif price >= 1500 and rank == 0:
-        label = "Parallel (Unmarked)"
+        label = UNMARKED_LABEL
         rank = 5
 
     if rank == 0 and index > 0:
-        label = f"Variant #{index + 1}"
+        label = INDEX_LABEL.format(index + 1)
 
     if rank >= 5: is_high = True
     return label, rank, is_high
 
-# -------------------- CORE SCRAPER --------------------
-def scrape_set(set_code):
-    print(f"🔍 Scraping {set_code.upper()}...")
-    cards = {}
-    code_counts = {}
-    processed_containers_in_set = set()
-    page = 1
-    
-    while True:
-        if page > 100: break
-        url = f"{YUYUTEI_BASE}/{set_code}?page={page}"
-        print(f"   Using URL: {url}")
-        
-        try:
-            r = requests.get(url, headers=HEADERS, timeout=15)
-            if r.status_code != 200: break
-            soup = BeautifulSoup(r.text, "html.parser")
-        except: break
+def classify_tile(alt, container_text, price, index):
+    rarity = extract_rarity(alt) or extract_rarity(container_text)
+    return (rarity, *classify_variant(alt + " " + container_text, price, index))
 
-        product_imgs = soup.find_all("img", attrs={"alt": True})
-        if not product_imgs: break
+# -------------------- CORE SCRAPER --------------------
+def make_engine():
+    return FetchEngine(headers=HEADERS, cache=ResponseCache() if USE_HTTP_CACHE else None)
 
-        new_cards_found = 0
+def run_with_engine(coro_fn, *args, engine=None):
+    # Sync entry point for callers like add_set.py; owns the engine if none is given
+    owned = engine is None
+    engine = engine or make_engine()
+    try:
+        return asyncio.run(coro_fn(engine, *args))
+    finally:
+        if owned: engine.close()
+
+def print_fetch_stats(engine):
+    s = engine.stats
+    print(f"📦 HTTP: {s['downloaded']} downloaded, {s['revalidated']} revalidated (304), "
+          f"{s['fresh']} served from cache, {s['bytes'] / 1024:.0f} KB transferred")
+    if s["retries"]:
+        throttled = engine.limiter.stats["throttled"]
+        print(f"🔁 {s['retries']} requests retried ({throttled} throttled by the server)")
+
+# Per-unit parse state. A unit is one set listing or one search keyword;
+# dedup and variant indexes carry over from page to page inside a unit.
+# page_seen / page_cards hold what the current page added (for checkpoints),
+# page_tiles / page_dropped what it had and skipped (for run_metrics).
+def new_unit_state():
+    return {
+        "cards": {}, "code_counts": {}, "seen": set(), "error": None,
+        "pages_done": 0, "last_page": 0, "page_seen": [], "page_cards": [],
+        "page_tiles": 0, "page_dropped": {},
+    }
+
+def collect_page(html, page_url, state, don_prefix, default_rarity, tiles=None):
+    # Returns the number of new variants found on the page,
+    # or None when the page has no <img alt> at all.
+    # `tiles`: the page already parsed by parse_pool
+    if tiles is None: tiles = extract_tiles(html)
+    state["page_tiles"] = len(tiles or [])
+    state["page_dropped"] = dropped = {}
+    if not tiles: return None
+
+    cards = state["cards"]
+    code_counts = state["code_counts"]
+    processed_containers = state["seen"]
+    new_cards_found = 0
+
+    for tile in tiles:
+        try:
+            alt = tile.alt
+
+            # ✅ IMPROVED LOGIC: Match Code OR Match DON!!
+            code_match = CODE_REGEX.search(alt)
+
+            if code_match:
+                code = code_match.group(0).upper()
+            elif "DON" in alt or "ドン" in alt:
+                # If it's a DON card with no code, generate a unique one
+                # Format: DON-SET-001
+                code = f"DON-{don_prefix}-{new_cards_found+1:03d}"
+            else:
+                dropped["no_code"] = dropped.get("no_code", 0) + 1
+                continue # Skip if not a card we recognize
+
+            if tile.signature in processed_containers:
+                dropped["duplicate"] = dropped.get("duplicate", 0) + 1
+                continue
+            processed_containers.add(tile.signature)
+            state["page_seen"].append(tile.signature)
+
+            container_text = tile.text
+            price = extract_price(container_text) or extract_price(alt)
+
+            code_counts[code] = code_counts.get(code, -1) + 1
+            current_index = code_counts[code]
+
+            rarity, label, rank, is_high = classify_tile(alt, container_text, price, current_index)
+
+            # Extract Name
+            name = tile.name
+            if not name: name = alt.replace(code, "").strip()
+
+            if code not in cards: cards[code] = []
+
+            variant = Variant(label, name, rarity if rarity else default_rarity, price, rank, is_high,
+                              tile.image, page_url)
+            cards[code].append(variant)
+            state["page_cards"].append((code, variant))
+            new_cards_found += 1
+        except Exception as e:
+            dropped["error"] = dropped.get("error", 0) + 1
+            run_metrics.current().swallowed("collect_page", e)
+            continue
+
+    return new_cards_found
+
+async def fetch_and_parse(engine, parser, url, params):
+    # -> (Page, ParsedPage or None for a non-200 answer)
+    resp = await engine.fetch(url, params)
+    if resp.status != 200: return resp, None
+    return resp, await parser.parse(resp.text)
+
+async def scrape_pages(engine, page_request, don_prefix, default_rarity, log_prefix, state=None, on_page=None,
+                       collect=collect_page, unit=None):
+    # Page 1 is fetched first; once the pagination widget reveals the page
+    # count, the remaining pages are requested together and parsed in page
+    # order. Pages are re-read for higher page links in case the widget only
+    # shows a window. Without a widget this falls back to probing pages one
+    # by one (plus PAGE_LOOKAHEAD) until one yields no new card.
+    # state["error"] is set when the unit ended on a failed request.
+    # A restored state (see scrape_checkpoint.py) continues after
+    # state["pages_done"]; on_page(page, state) runs after every page with cards.
+    # `collect` parses a page into the state (collect_page, or the price-only
+    # collector of refresh_prices.py). Every page is reported to run_metrics
+    # under `unit` (set:op01, search:<keyword>).
+    # Fetched pages are parsed by parse_pool.current() as soon as they arrive
+    # (in worker processes when a pool is running); `collect` then applies
+    # them to the state strictly in page order.
+    metrics = run_metrics.current()
+    parser = parse_pool.current()
+    state = state if state is not None else new_unit_state()
+    state["error"] = None
+    pending = {}
+    last_page = state["last_page"]
+    page = state["pages_done"] + 1
 
-        for img in product_imgs:
+    try:
+        while page <= MAX_PAGES:
+            upto = last_page if last_page >= page else page + PAGE_LOOKAHEAD
+            for p in range(page, min(upto, MAX_PAGES) + 1):
+                if p not in pending:
+                    url, params = page_request(p)
+                    pending[p] = asyncio.ensure_future(fetch_and_parse(engine, parser, url, params))
+
+            resp = None
             try:
-                alt = (img.get("alt") or "").strip()
-                
-                # ✅ IMPROVED LOGIC: Match Code OR Match DON!!
-                code_match = CODE_REGEX.search(alt)
-                
-                if code_match:
-                    code = code_match.group(0).upper()
-                elif "DON" in alt or "ドン" in alt:
-                    # If it's a DON card with no code, generate a unique one
-                    # Format: DON-SET-001
-                    code = f"DON-{set_code.upper()}-{new_cards_found+1:03d}"
-                else:
-                    continue # Skip if not a card we recognize
-                
-                container = find_product_container(img) or img.parent
-                if not container: continue
-                
-                container_sig = str(container)
-                if container_sig in processed_containers_in_set: continue
-                processed_containers_in_set.add(container_sig)
-
-                container_text = container.get_text(" ", strip=True)
-                price = extract_price(container_text) or extract_price(alt)
-                
-                code_counts[code] = code_counts.get(code, -1) + 1
-                current_index = code_counts[code]
-
-                rarity = extract_rarity(alt) or extract_rarity(container_text)
-                label, rank, is_high = classify_variant(alt + " " + container_text, price, current_index)
-
-                img_src = img.get("data-original") or img.get("src")
-                
-                # Extract Name
-                name = None
-                h4 = container.find("h4")
-                if h4: name = h4.get_text(" ", strip=True)
-                if not name: name = alt.replace(code, "").strip()
-
-                if code not in cards: cards[code] = []
-                
-                cards[code].append({
-                    "label": label,
-                    "name": name, 
-                    "rarity": rarity if rarity else "COMMON",
-                    "price": price,
-                    "rank": rank,
-                    "is_high_rarity": is_high,
-                    "image": img_src,
-                    "source_url": url,
-                })
-                new_cards_found += 1
-            except: continue
-        
-        if new_cards_found == 0: break
-        page += 1
-        time.sleep(1)
-
-    return cards
-
-# -------------------- FLATTENING LOGIC --------------------
-def build_flat_database(master):
-    flat_list = []
-    
-    for code, variants in master.items():
-        variants.sort(key=lambda x: x["price"])
-        set_id = code.split("-")[0]
-        
-        # If it's a generated DON card, keep it in the set it came from
-        if code.startswith("DON"):
-             # extract set from DON-OP01-001 -> OP01
-             parts = code.split("-")
-             if len(parts) > 1: set_id = parts[1]
-
-        # Base Official Image URL
-        # Pattern: https://asia-en.onepiece-cardgame.com/images/cardlist/card/{code}.png
-        simple_official_url = f"https://asia-en.onepiece-cardgame.com/images/cardlist/card/{code}.png"
-
-        for i, v in enumerate(variants):
-            # STABLE ID GENERATION
-            # Old: f"{code}-{v['price']}-{i}" << Bad, changes with price
-            # New: f"{code}-{variant_name_slug}"
-            
-            variant_name = v.get('label') or "Normal"
-            # create simple slug
-            slug = re.sub(r'[^a-zA-Z0-9]', '', variant_name).upper()
-            
-            # If duplicates exist (e.g. two "Normal" variants?), append index
-            # This is rare but possible if scraping detected two identical variants
-            # We already sort by price, but let's just make it unique
-            # better to resolve uniqueness during flattening if needed.
-            # actually scrape_set might produce duplicates if same card on multiple pages?
-            # scrape_set aggregates by code
-            
-            unique_id = f"{code}-{slug}"
-            
-            # Check collision in this specific code group?
-            # The standard logic iterates variants.
-            # If multiple variants have SAME label, we need index.
-            # Let's count occurrences of this slug so far in this loop?
-            # actually, just append index if we want to be safe, but index depends on sort order (price)
-            # variant name is usually distinct per card code.
-            # let's try to stick to name. if name is same, use price? no.
-            # let's just use Code-Slug-Index but Index of THAT slug type?
-            
-            # Simplest stable-ish: Code-Slug-{i} 
-            # where i is index in the sorted list.
-            # BUT sorted list is sorted by price. So if price changes order swap, ID swaps.
-            # Ideally we rely ONLY on name.
-            # Yuyu-tei usually has: "Normal", "Parallel", "SR Parallel". Distinct names.
-            # Occasionally "Variant #2" if we couldn't classify it.
-            
-            record = {
-                "card_code": code,
-                "set": set_id, 
-                "base_name": v.get("name"), 
-                "variant_name": variant_name,
-                "rarity": (v.get("rarity") or "UNK").upper(),
-                "price_jpy": v["price"],
-                "image_url": v["image"],
-                "official_image_url": simple_official_url,
-                "finish": "Foil" if v["is_high_rarity"] else "Normal",
-                "is_high_demand": v["is_high_rarity"],
-                "unique_id": f"{code}-{slug}-{i}" # Still using i to guarantee uniqueness but slug helps readability
-            }
-            flat_list.append(record)
-            
-    return flat_list
+                url, params = page_request(page)
+                resp, parsed = await pending.pop(page)
+                # Search pages record the encoded URL requests built from params
+                source_url = resp.url if params else url
+                print(f"   {log_prefix}: {source_url}")
+                if resp.status != 200:
+                    if resp.status >= 500 or resp.status == 429: state["error"] = f"HTTP {resp.status}"
+                    metrics.page(unit, page, resp, error=state["error"])
+                    break
+                last_page = max(last_page, parsed.last_page)
+                state["page_seen"], state["page_cards"] = [], []
+                t0 = time.perf_counter()
+                found = collect(resp.text, source_url, state, don_prefix, default_rarity, tiles=parsed.tiles)
+                metrics.page(unit, page, resp, parsed.seconds + time.perf_counter() - t0, state.get("page_tiles", 0),
+                             found or 0, state.get("page_dropped"))
+            except Exception as e:
+                state["error"] = repr(e)
+                metrics.page(unit, page, resp, error=state["error"])
+                break
+
+            if not found: break
+            state["pages_done"], state["last_page"] = page, last_page
+            if on_page: on_page(page, state)
+            if last_page and page >= last_page: break
+            page += 1
+    finally:
+        for task in pending.values(): task.cancel()
+
+    if state["error"]: metrics.unit_error(unit, state["error"])
+    return state["cards"]
+
+async def scrape_set_async(engine, set_code, state=None, on_page=None, collect=collect_page):
+    print(f"🔍 Scraping {set_code.upper()}...")
+    page_request = lambda p: (f"{YUYUTEI_BASE}/{set_code}?page={p}", None)
+    return await scrape_pages(engine, page_request, set_code.upper(), "COMMON", "Using URL", state, on_page, collect,
+                              f"set:{set_code}")
 
+def scrape_set(set_code, engine=None, state=None):
+    # state: a new_unit_state() to read state["error"] from afterwards
+    return run_with_engine(scrape_set_async, set_code, state, engine=engine)
 
 # -------------------- SEARCH CONFIG --------------------
 # We use Japanese keywords to catch specific promo categories that might be hidden
@@ -315,123 +367,208 @@ SEARCH_KEYWORDS = [
     "Girls Edition",
     "Treasure Campaign"  # Treasure Campaign
 ]
-SEARCH_BASE = "https://yuyu-tei.jp/sell/opc/s/search"
+SEARCH_BASE = f"{YUYUTEI_BASE}/search"
 
 # -------------------- SEARCH SCRAPER --------------------
-def scrape_search(keyword):
+async def scrape_search_async(engine, keyword, state=None, on_page=None, collect=collect_page):
     print(f"🔍 Searching for keyword: {keyword}...")
-    cards = {}
-    code_counts = {}
-    processed_containers_in_set = set()
-    page = 1
-    
-    while True:
-        if page > 100: break
-        
-        # Use params dict for proper encoding
-        params = {
-            "search_word": keyword,
-            "page": page
-        }
-        
-        try:
-            # Pass params to handle encoding of Japanese characters and ?search_word= format
-            r = requests.get(SEARCH_BASE, params=params, headers=HEADERS, timeout=15)
-            print(f"   Using Search URL: {r.url}")
-            
-            if r.status_code != 200: break
-            soup = BeautifulSoup(r.text, "html.parser")
-        except: break
-
-        product_imgs = soup.find_all("img", attrs={"alt": True})
-        if not product_imgs: break
-
-        new_cards_found = 0
-        
-        for img in product_imgs:
-            try:
-                alt = (img.get("alt") or "").strip()
-                code_match = CODE_REGEX.search(alt)
-                
-                if code_match:
-                    code = code_match.group(0).upper()
-                elif "DON" in alt or "ドン" in alt:
-                    code = f"DON-SEARCH-{new_cards_found+1:03d}"
-                else: continue
-
-                container = find_product_container(img) or img.parent
-                if not container: continue
-                
-                container_sig = str(container)
-                if container_sig in processed_containers_in_set: continue
-                processed_containers_in_set.add(container_sig)
-
-                container_text = container.get_text(" ", strip=True)
-                price = extract_price(container_text) or extract_price(alt)
-                
-                code_counts[code] = code_counts.get(code, -1) + 1
-                current_index = code_counts[code]
-
-                rarity = extract_rarity(alt) or extract_rarity(container_text)
-                label, rank, is_high = classify_variant(alt + " " + container_text, price, current_index)
-
-                img_src = img.get("data-original") or img.get("src")
-                
-                name = None
-                h4 = container.find("h4")
-                if h4: name = h4.get_text(" ", strip=True)
-                if not name: name = alt.replace(code, "").strip()
-
-                if code not in cards: cards[code] = []
-                
-                cards[code].append({
-                    "label": label,
-                    "name": name, 
-                    "rarity": rarity if rarity else "PROMO",
-                    "price": price,
-                    "rank": rank,
-                    "is_high_rarity": is_high,
-                    "image": img_src,
-                    "source_url": r.url,
-                })
-                new_cards_found += 1
-            except: continue
-        
-        if new_cards_found == 0: break
-        page += 1
-        time.sleep(1)
-
-    return cards
-
-def main():
+    # Use params dict for proper encoding of Japanese characters and ?search_word= format
+    page_request = lambda p: (SEARCH_BASE, {"search_word": keyword, "page": p})
+    return await scrape_pages(engine, page_request, "SEARCH", "PROMO", "Using Search URL", state, on_page, collect,
+                              f"search:{keyword}")
+
+def scrape_search(keyword, engine=None):
+    return run_with_engine(scrape_search_async, keyword, engine=engine)
+
+# -------------------- MERGE --------------------
+# The same listing is often found by its set page and again by a keyword
+# search ("P-", "プロモ", ...). Variants are fingerprinted by card code +
+# image + label; a repeat only adds its page to the first one's "sources".
+# Placeholder images say nothing about the listing, so those are never merged.
+def variant_fingerprint(code, v):
+    image = v.image
+    if not image or "noimage" in image: return None
+    return (code, image, v.label)
+
+def merge_into(master, new_data, seen=None):
+    # seen: {fingerprint: kept variant}, shared across calls for one master.
+    # Returns the number of variants collapsed into an existing one.
+    collapsed = 0
+    for code, variants in new_data.items():
+        bucket = master.setdefault(code, [])
+        for v in variants:
+            if v.sources is None: v.sources = [v.source_url] if v.source_url else []
+            fp = variant_fingerprint(code, v) if seen is not None else None
+            kept = seen.get(fp) if fp else None
+            if kept is None:
+                if fp: seen[fp] = v
+                bucket.append(v)
+                continue
+            for url in v.sources:
+                if url not in kept.sources: kept.sources.append(url)
+            collapsed += 1
+    return collapsed
+
+async def discover_sets(engine, registry):
+    # Reads the site's set index (at most every DISCOVERY_INTERVAL) so newly
+    # released sets are picked up without editing SETS
+    if not registry.index_due(): return []
+    try:
+        resp = await engine.fetch(SET_INDEX_URL)
+    except Exception as e:
+        print(f"⚠️ Set index unavailable: {e!r}")
+        return []
+    if resp.status != 200:
+        print(f"⚠️ Set index returned HTTP {resp.status}")
+        return []
+    new_codes = registry.add_discovered(parse_set_index(resp.text))
+    if new_codes: print(f"🆕 Discovered {len(new_codes)} set codes: {', '.join(new_codes)}")
+    return new_codes
+
+def start_unit(engine, unit, scrape, arg, checkpoint=None, resume=False):
+    # -> (state, task); task is None when the checkpoint already has the unit done.
+    # On resume, a failed or interrupted unit continues after its last saved page.
+    state = new_unit_state()
+    if checkpoint is None:
+        return state, asyncio.ensure_future(scrape(engine, arg, state))
+    if resume:
+        restored = checkpoint.restore(unit, state)
+        if checkpoint.status(unit) == "done":
+            return state, None
+        if restored: print(f"↩️ Resuming {unit} after page {restored}")
+    on_page = lambda page, st: checkpoint.save_page(unit, page, st)
+
+    async def run():
+        cards = await scrape(engine, arg, state, on_page)
+        checkpoint.finish(unit, state)
+        return cards
+
+    return state, asyncio.ensure_future(run())
+
+async def scrape_all(engine, registry=None, checkpoint=None, resume=False):
+    # Units run concurrently (bounded by the engine), but results are merged
+    # in set then SEARCH_KEYWORDS order so `master` is identical to a serial run.
+    # With a checkpoint every page is saved as it is parsed; resume=True takes
+    # finished units from it and only scrapes the rest.
+    sets = SETS
+    if registry is not None:
+        await discover_sets(engine, registry)
+        sets, skipped = registry.plan(SETS)
+        if skipped: print(f"⏭️ Skipping {skipped} known-empty set codes until their recheck is due")
+
+    set_units = [start_unit(engine, f"set:{s}", scrape_set_async, s, checkpoint, resume) for s in sets]
+    search_units = [start_unit(engine, f"search:{k}", scrape_search_async, k, checkpoint, resume) for k in SEARCH_KEYWORDS]
+    reused = sum(task is None for _, task in set_units + search_units)
+    if reused: print(f"♻️ {reused} units restored from the checkpoint")
+
     master = {}
+    seen = {}
+    collapsed = 0
+    try:
+        for s, (state, task) in zip(sets, set_units):
+            new_data = await task if task else state["cards"]
+            if state["error"]:
+                print(f"   ❌ Set {s} failed after page {state['pages_done']}: {state['error']}")
+            # A failed request says nothing about the set, so only clean results are recorded
+            elif registry is not None:
+                registry.record(s, sum(len(v) for v in new_data.values()))
+            if new_data:
+                collapsed += merge_into(master, new_data, seen)
+                print(f"   ✅ Processed Set: {s}")
+
+        for kword, (state, task) in zip(SEARCH_KEYWORDS, search_units):
+            new_data = await task if task else state["cards"]
+            if state["error"]:
+                print(f"   ❌ Search {kword} failed after page {state['pages_done']}: {state['error']}")
+            if new_data:
+                collapsed += merge_into(master, new_data, seen)
+                print(f"   ✅ Processed Search: {kword}")
+    finally:
+        for _, task in set_units + search_units:
+            if task: task.cancel()
+
+    if collapsed: print(f"🧬 Merged {collapsed} duplicate listings found by more than one set/search")
+    run_metrics.current().count("duplicates_merged", collapsed)
+    return master
+
+def main(resume=False, allow_partial=False, mirror=False, parse_workers=parse_pool.PARSE_WORKERS):
     print(f"🚀 Starting MASS SCRAPER with Sets + Global Search...")
-    
-    # 1. Scrape Sets
-    for s in SETS:
-        new_data = scrape_set(s)
-        if new_data:
-            for k, v in new_data.items():
-                if k in master: master[k].extend(v)
-                else: master[k] = v
-            print(f"   ✅ Processed Set: {s}")
-        time.sleep(1)
-
-    # 2. Scrape Search Keywords
-    for kword in SEARCH_KEYWORDS:
-        new_data = scrape_search(kword)
-        if new_data:
-            for k, v in new_data.items():
-                if k in master: master[k].extend(v)
-                else: master[k] = v
-            print(f"   ✅ Processed Search: {kword}")
-        time.sleep(1)
-
-    db = build_flat_database(master)
-    os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(db, f, indent=2, ensure_ascii=False)
+    metrics = run_metrics.start("scrape")
+    engine = make_engine()
+    parse_pool.start(parse_workers)
+    try:
+        return run(engine, metrics, resume, allow_partial, mirror)
+    finally:
+        parse_pool.close()
+        run_metrics.finish(http={**engine.stats, **{f"limiter_{k}": v for k, v in engine.limiter.stats.items()}})
+
+def run(engine, metrics, resume, allow_partial, mirror):
+    registry = SetRegistry()
+    checkpoint = ScrapeCheckpoint()
+    if resume and checkpoint.started_at() is None:
+        print("⚠️ No checkpoint found, starting a fresh run")
+        resume = False
+    if not resume: checkpoint.reset()
+    try:
+        with metrics.stage("scrape"):
+            master = asyncio.run(scrape_all(engine, registry, checkpoint, resume))
+        failed = checkpoint.failed()
+    finally:
+        engine.close()
+        registry.save()
+        checkpoint.close()
+    print_fetch_stats(engine)
+
+    if failed:
+        print(f"\n⚠️ {len(failed)} units failed:")
+        for unit, error in failed: print(f"   {unit}: {error}")
+        if not allow_partial:
+            print(f"❌ {DATA_FILE} left unchanged; re-run with --resume to retry them (or --allow-partial)")
+            return False
+
+    with metrics.stage("build_flat_database"):
+        builder = FlatBuilder()
+        try:
+            db, changes = builder.build(master)
+        finally:
+            builder.close()
+        write_changes(changes)
+    metrics.count("records", len(db))
+    metrics.count("records_changed", len(changes["added"]) + len(changes["updated"]) + len(changes["removed"]))
+    print(f"🧮 {changes['codes_changed']} card codes changed: {len(changes['added'])} records added, "
+          f"{len(changes['updated'])} updated, {len(changes['removed'])} removed")
+    dirty_sets = set(changes["sets"])
+    if mirror:
+        with metrics.stage("mirror_images"):
+            local = Mirror()
+            # Records whose images get mirrored now change in their shard too
+            dirty_sets.update(r["set"] for r in db if not is_mirrored(local, r))
+            mirror_records(db, local, only=changed_ids(changes))
+    store = CardStore(json_path=DATA_FILE)
+    try:
+        with metrics.stage("write_cards_json"):
+            # Listings stored under another id before (the old price-order
+            # ids) keep their price history under the new one, and saved
+            # portfolios heal through src/data/id_migrations.json
+            store.sync_from_json()
+            renamed = migrate_ids(store.iter_records(), db)
+            save_migrations(renamed)
+            store.replace_all(db)
+            store.export_json()
+    finally:
+        store.close()
+    with metrics.stage("frontend_data"): build_frontend_data(db, changed_sets=dirty_sets)
+    with metrics.stage("price_history"): record_snapshot(db, renamed=renamed)
     print(f"\n🎉 DONE — {len(db)} records saved to {DATA_FILE}")
+    return True
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape every set and promo search into cards.json")
+    parser.add_argument("--resume", action="store_true", help="Continue the last run from its checkpoint")
+    parser.add_argument("--allow-partial", action="store_true", help="Write cards.json even if some units failed")
+    parser.add_argument("--mirror-images", action="store_true", help="Mirror images into public/card-images (see mirror_images.py)")
+    parser.add_argument("--parse-workers", type=int, default=parse_pool.PARSE_WORKERS,
+                        help="Processes parsing pages (0: parse on the fetch loop)")
+    args = parser.parse_args()
+
+    sys.exit(0 if main(args.resume, args.allow_partial, args.mirror_images, args.parse_workers) else 1)
\ No newline at end of file
@@ -0,0 +1,102 @@
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from http_cache import CACHE_DIR
+from variant_record import Variant
+
+# -------------------- CONFIG --------------------
+CHECKPOINT_FILE = os.path.join(CACHE_DIR, "scrape_checkpoint.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    unit TEXT PRIMARY KEY,          -- set:op05, search:<keyword>
+    status TEXT NOT NULL,           -- running | done | failed
+    error TEXT,
+    pages INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    unit TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    body BLOB NOT NULL,             -- zlib JSON: what the page added to the unit state
+    PRIMARY KEY (unit, page)
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# -------------------- CHECKPOINT --------------------
+# Durable progress of a full scrape. Every parsed page is committed with the
+# variants and tile signatures it added, so a unit (one set listing or one
+# search keyword) can be rebuilt exactly as it was and continued from the
+# next page. Units end as "done" or "failed" (with the error), and failed
+# or unfinished units are the ones a --resume run scrapes again.
+class ScrapeCheckpoint:
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def reset(self):
+        # Start a new run: drop everything from the previous one
+        with self._db:
+            self._db.execute("DELETE FROM units")
+            self._db.execute("DELETE FROM pages")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('started_at', ?)", (str(time.time()),))
+
+    def started_at(self):
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'started_at'").fetchone()
+        return float(row[0]) if row else None
+
+    def status(self, unit):
+        row = self._db.execute("SELECT status FROM units WHERE unit = ?", (unit,)).fetchone()
+        return row[0] if row else None
+
+    def failed(self):
+        # -> [(unit, error)] of units whose last attempt failed
+        return self._db.execute("SELECT unit, error FROM units WHERE status = 'failed' ORDER BY unit").fetchall()
+
+    def restore(self, unit, state):
+        # Replays the unit's saved pages into a fresh unit state;
+        # returns the number of pages restored.
+        cards, code_counts, seen = state["cards"], state["code_counts"], state["seen"]
+        pages = 0
+        for page, body in self._db.execute("SELECT page, body FROM pages WHERE unit = ? ORDER BY page", (unit,)):
+            entry = json.loads(zlib.decompress(body))
+            seen.update(entry["seen"])
+            for code, variant in entry["cards"]:
+                cards.setdefault(code, []).append(Variant.from_dict(variant))
+            code_counts.update(entry["code_counts"])
+            state["last_page"] = max(state["last_page"], entry["last_page"])
+            state["pages_done"] = pages = page
+        return pages
+
+    def save_page(self, unit, page, state):
+        entry = {
+            "seen": state["page_seen"],
+            "cards": [(code, v.to_dict()) for code, v in state["page_cards"]],
+            "code_counts": state["code_counts"],
+            "last_page": state["last_page"],
+        }
+        body = zlib.compress(json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?)", (unit, page, body))
+            self._set_status(unit, "running", None, page)
+
+    def finish(self, unit, state):
+        with self._db:
+            status = "failed" if state["error"] else "done"
+            self._set_status(unit, status, state["error"], state["pages_done"])
+
+    def _set_status(self, unit, status, error, pages):
+        self._db.execute(
+            "INSERT OR REPLACE INTO units VALUES (?, ?, ?, ?, ?)",
+            (unit, status, error, pages, time.time()),
+        )
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,334 @@
+import argparse
+import bisect
+import json
+import os
+import random
+import re
+import struct
+import sys
+import time
+import unicodedata
+import zlib
+from array import array
+
+from cards_file import load_records
+
+# Prebuilt inverted index over the card records, so a lookup does not scan
+# every record.
+#
+# Indexed fields: card_code, base_name (English), the Japanese name, set,
+# rarity and variant_name. Text is NFKC-normalized and case-folded, then
+# split into words (the full card code counts as one more word). Two kinds of
+# keys point at posting lists (sorted record numbers, uint32 arrays):
+#   - prefixes: every word and its leading 1..PREFIX_MAX characters, so a
+#               prefix query ("op0", "lu", "ルフ") is a single lookup
+#   - n-grams:  every 2- and 3-character slice of every word; a query word
+#               that starts no word intersects the postings of its trigrams,
+#               i.e. substring matching like the search box (includes())
+# Multi-word queries intersect the postings of each word, smallest first.
+#
+# Saved as one zlib-compressed file: magic, a JSON header (record ids, terms,
+# prefixes, n-grams) and the offset and posting arrays.
+#
+#   python scripts/search_index.py build
+#   python scripts/search_index.py query ルフィ op01
+#   python scripts/search_index.py bench [--variants 20000]
+
+# -------------------- CONFIG --------------------
+PROJECT_ROOT = os.getcwd()
+DATA_FILE = os.path.join(PROJECT_ROOT, "src", "data", "cards.json")
+INDEX_FILE = os.path.join(PROJECT_ROOT, "public", "data", "search-index.bin")
+TRANSLATION_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "translation_cache.json")
+
+MAGIC = b"OPSI1\n"
+HEADER = struct.Struct("<I")
+GRAM_SIZES = (2, 3)
+PREFIX_MAX = 12                  # longer prefixes are resolved over the sorted terms
+SET_CACHE_MIN = 1024             # postings at least this long keep a set for intersections
+FIELDS = ("card_code", "base_name", "name_ja", "set", "rarity", "variant_name")
+WORD_REGEX = re.compile(r"\w+")
+EMPTY = array("I")
+
+# -------------------- TEXT --------------------
+def normalize(text):
+    return unicodedata.normalize("NFKC", text or "").casefold()
+
+def words(text):
+    return WORD_REGEX.findall(normalize(text))
+
+def grams(word, n):
+    return [word[i:i+n] for i in range(len(word) - n + 1)]
+
+def japanese_names(path=TRANSLATION_CACHE):
+    # English -> Japanese name from the translator's cache, for records
+    # translated before translate_cards.py started keeping name_ja
+    if not os.path.exists(path): return {}
+    with open(path, "r", encoding="utf-8") as f:
+        cache = json.load(f)
+    return {en: ja for ja, en in cache.items()}
+
+def record_texts(r, names_ja):
+    for field in FIELDS:
+        if field == "name_ja":
+            yield r.get("name_ja") or names_ja.get(r.get("base_name"), "")
+        else:
+            yield r.get(field) or ""
+
+# -------------------- POSTINGS --------------------
+def intersect(a, b, members=None):
+    # Sorted record numbers in both sorted sequences: the shorter one is
+    # walked and probed against the longer one, through `members` (a set of
+    # the longer list) when the caller has one, else by binary search
+    if len(a) > len(b): a, b = b, a
+    if not a: return a
+    if members is not None:
+        keep = members(b)
+        if keep is not None: return array("I", [doc for doc in a if doc in keep])
+    out = array("I")
+    lo, n = 0, len(b)
+    for doc in a:
+        lo = bisect.bisect_left(b, doc, lo)
+        if lo == n: break
+        if b[lo] == doc: out.append(doc)
+    return out
+
+def union(lists):
+    if len(lists) == 1: return lists[0]
+    found = set()
+    for postings in lists: found.update(postings)
+    return array("I", sorted(found))
+
+# -------------------- INDEX --------------------
+class SearchIndex:
+    def __init__(self, ids, terms, prefixes, prefix_postings, ngrams, gram_postings):
+        # terms: every distinct word, sorted. prefixes: every word and every
+        # prefix of it up to PREFIX_MAX characters, each with its postings, so
+        # a prefix query is one dict lookup; *_postings are uint32 arrays.
+        self.ids = ids
+        self.terms = terms
+        self.prefix_postings = dict(zip(prefixes, prefix_postings))
+        self.gram_postings = dict(zip(ngrams, gram_postings))
+        # id(postings) -> set of it, built the first time a common key
+        # ("base", "op13") is intersected with something else
+        self._sets = {}
+
+    def _members(self, postings):
+        if len(postings) < SET_CACHE_MIN: return None
+        found = self._sets.get(id(postings))
+        if found is None or found[0] is not postings:
+            found = self._sets[id(postings)] = (postings, frozenset(postings))
+        return found[1]
+
+    @classmethod
+    def build(cls, records, names_ja=None):
+        names_ja = japanese_names() if names_ja is None else names_ja
+        prefixes, ngrams, ids, terms = {}, {}, [], set()
+        for doc, r in enumerate(records):
+            ids.append(r["unique_id"])
+            keys = set()
+            for text in record_texts(r, names_ja):
+                keys.update(words(text))
+            code = normalize(r.get("card_code"))
+            if code: keys.add(code)
+            terms.update(keys)
+            prefix_keys = {w[:n] for w in keys for n in range(1, min(len(w), PREFIX_MAX) + 1)} | keys
+            for key in prefix_keys:
+                prefixes.setdefault(key, array("I")).append(doc)
+            gram_keys = {g for w in keys for n in GRAM_SIZES for g in grams(w, n)}
+            for g in gram_keys:
+                ngrams.setdefault(g, array("I")).append(doc)
+        sorted_prefixes = sorted(prefixes)
+        sorted_grams = sorted(ngrams)
+        return cls(ids, sorted(terms), sorted_prefixes, [prefixes[p] for p in sorted_prefixes],
+                   sorted_grams, [ngrams[g] for g in sorted_grams])
+
+    # -------------------- QUERIES --------------------
+    def prefix(self, word):
+        # Record numbers with a word starting with `word`
+        if len(word) <= PREFIX_MAX or word in self.prefix_postings:
+            return self.prefix_postings.get(word, EMPTY)
+        lo = bisect.bisect_left(self.terms, word)
+        hi = bisect.bisect_left(self.terms, word + "\U0010ffff", lo)
+        return union([self.prefix_postings[t] for t in self.terms[lo:hi]]) if hi > lo else EMPTY
+
+    def substring(self, word):
+        # Record numbers with a word containing `word`. Longer words are
+        # matched by all of their trigrams being present, which can rarely
+        # over-match (abcd vs. abc + bcd in different words)
+        if len(word) < min(GRAM_SIZES): return self.prefix(word)
+        n = min(len(word), max(GRAM_SIZES))
+        lists = []
+        for g in dict.fromkeys(grams(word, n)):
+            postings = self.gram_postings.get(g)
+            if postings is None: return EMPTY
+            lists.append(postings)
+        lists.sort(key=len)
+        found = lists[0]
+        for postings in lists[1:]:
+            found = intersect(found, postings, self._members)
+            if not found: break
+        return found
+
+    def match(self, query, substrings=True):
+        # Sorted record numbers matching every word of the query: words are
+        # prefix matches, falling back to substring (n-gram) matches for a
+        # word that starts no indexed word
+        lists = []
+        for word in set(words(query)):
+            docs = self.prefix(word)
+            if not docs and substrings: docs = self.substring(word)
+            if not docs: return []
+            lists.append(docs)
+        if not lists: return []
+        lists.sort(key=len)
+        found = lists[0]
+        for postings in lists[1:]:
+            found = intersect(found, postings, self._members)
+            if not found: return []
+        return found
+
+    def search(self, query, limit=None):
+        # -> unique_ids of the matching records, in catalog order
+        docs = self.match(query)
+        if limit is not None: docs = docs[:limit]
+        return [self.ids[d] for d in docs]
+
+    # -------------------- STORAGE --------------------
+    def to_bytes(self):
+        prefixes = sorted(self.prefix_postings)
+        ngrams = sorted(self.gram_postings)
+        header = json.dumps({"ids": self.ids, "terms": self.terms, "prefixes": prefixes, "ngrams": ngrams},
+                            ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        offsets = array("I", [0])
+        postings = array("I")
+        for key in prefixes:
+            postings.extend(self.prefix_postings[key])
+            offsets.append(len(postings))
+        for key in ngrams:
+            postings.extend(self.gram_postings[key])
+            offsets.append(len(postings))
+        body = HEADER.pack(len(header)) + header + HEADER.pack(len(offsets)) + offsets.tobytes() + postings.tobytes()
+        return MAGIC + zlib.compress(body, 9)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if not data.startswith(MAGIC): raise ValueError("not a search index")
+        body = memoryview(zlib.decompress(data[len(MAGIC):]))
+        (n,) = HEADER.unpack_from(body, 0)
+        header = json.loads(bytes(body[4:4 + n]).decode("utf-8"))
+        pos = 4 + n
+        (count,) = HEADER.unpack_from(body, pos)
+        pos += 4
+        offsets = array("I")
+        offsets.frombytes(body[pos:pos + 4 * count])
+        postings = array("I")
+        postings.frombytes(body[pos + 4 * count:])
+        lists = [postings[offsets[i]:offsets[i + 1]] for i in range(count - 1)]
+        n_prefixes = len(header["prefixes"])
+        return cls(header["ids"], header["terms"], header["prefixes"], lists[:n_prefixes],
+                   header["ngrams"], lists[n_prefixes:])
+
+    def save(self, path=INDEX_FILE):
+        data = self.to_bytes()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f: f.write(data)
+        os.replace(tmp, path)
+        return len(data)
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+def build_index(records, path=INDEX_FILE):
+    # Used by build_frontend_data.py; -> (index, bytes written)
+    index = SearchIndex.build(records)
+    return index, index.save(path)
+
+# -------------------- BENCHMARK --------------------
+def scale_records(records, target):
+    # Copies of the catalog under made-up set codes until there are `target`
+    # variants, so the index grows the way a bigger catalog would
+    out = list(records)
+    copy = 0
+    while len(out) < target:
+        copy += 1
+        for r in records:
+            if len(out) >= target: break
+            code = f"X{copy:02d}{r['card_code']}"
+            out.append(dict(r, card_code=code, set=code.split("-")[0], unique_id=f"X{copy:02d}{r['unique_id']}"))
+    return out
+
+def sample_queries(records, count, seed=0):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        r = rng.choice(records)
+        kind = rng.randrange(5)
+        if kind == 0: queries.append(r["card_code"])
+        elif kind == 1: queries.append(r["card_code"].split("-")[0].lower())
+        elif kind == 2:
+            ws = words(r.get("base_name")) or [r["card_code"]]
+            queries.append(rng.choice(ws))
+        elif kind == 3:
+            w = rng.choice(words(r.get("base_name")) or ["op"])
+            queries.append(w[:rng.randint(1, 3)])
+        else:
+            queries.append(f"{r['set']} {r.get('variant_name', '').split(' ')[0]}")
+    return queries
+
+def bench(records, variants, count=2000):
+    records = scale_records(records, variants)
+    t0 = time.perf_counter()
+    index = SearchIndex.build(records)
+    built = time.perf_counter() - t0
+    data = index.to_bytes()
+    t0 = time.perf_counter()
+    index = SearchIndex.from_bytes(data)
+    loaded = time.perf_counter() - t0
+
+    queries = sample_queries(records, count)
+    timings = []
+    hits = 0
+    for q in queries:
+        t0 = time.perf_counter()
+        hits += len(index.match(q))
+        timings.append(time.perf_counter() - t0)
+    timings.sort()
+    pct = lambda p: timings[min(len(timings) - 1, int(p * len(timings)))] * 1000
+    print(f"🔎 {len(records)} variants: {len(index.terms)} terms, {len(index.gram_postings)} n-grams, "
+          f"{len(data) / 1024:.0f} KB on disk")
+    print(f"   build {built:.2f}s, load {loaded * 1000:.0f} ms")
+    print(f"   {len(queries)} queries, {hits / len(queries):.0f} hits avg: "
+          f"p50 {pct(0.5):.3f} ms, p99 {pct(0.99):.3f} ms, max {timings[-1] * 1000:.3f} ms")
+    return pct(0.5)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build, query or benchmark the card search index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="Index cards.json")
+    p = sub.add_parser("query", help="Search the saved index")
+    p.add_argument("query", nargs="+")
+    p.add_argument("--limit", type=int, default=20)
+    p = sub.add_parser("bench", help="Build and query an index over a scaled-up catalog")
+    p.add_argument("--variants", type=int, default=20000)
+    p.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--index", default=INDEX_FILE)
+    args = parser.parse_args()
+
+    if args.command == "query":
+        index = SearchIndex.load(args.index)
+        t0 = time.perf_counter()
+        docs = index.match(" ".join(args.query))
+        elapsed = time.perf_counter() - t0
+        for d in docs[:args.limit]: print(f"   {index.ids[d]}")
+        print(f"🔎 {len(docs)} matches in {elapsed * 1000:.3f} ms")
+        sys.exit(0)
+
+    records = load_records(DATA_FILE)
+    if args.command == "build":
+        _, size = build_index(records, args.index)
+        print(f"🔎 Indexed {len(records)} records into {args.index} ({size / 1024:.0f} KB)")
+    else:
+        bench(records, args.variants, args.queries)
@@ -0,0 +1,73 @@
+import json
+import os
+import re
+import time
+
+# -------------------- CONFIG --------------------
+REGISTRY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "set_registry.json")
+EMPTY_RECHECK = 7 * 24 * 3600     # known-empty codes are skipped until this has passed
+DISCOVERY_INTERVAL = 24 * 3600    # how often the site's set index is re-read
+
+# Listing links in the site navigation: /sell/opc/s/op05, /sell/opc/s/prb01, ...
+SET_LINK_REGEX = re.compile(r"/sell/opc/s/([a-z0-9]+(?:-[a-z0-9]+)*)(?=[\"'?#/])", re.I)
+
+# -------------------- REGISTRY --------------------
+# Persisted knowledge about set codes:
+#   {"checked_index_at": ts, "sets": {code: {"status": "valid"|"empty", "checked_at": ts, "variants": n}}}
+# Codes found on the site's set index are added as "new" until first scraped.
+class SetRegistry:
+    def __init__(self, path=REGISTRY_FILE):
+        self.path = path
+        self.data = {"checked_index_at": 0, "sets": {}}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError):
+                print(f"⚠️ Could not read {path}, starting a fresh set registry")
+
+    @property
+    def sets(self):
+        return self.data["sets"]
+
+    def is_due(self, code, now=None):
+        entry = self.sets.get(code)
+        if not entry or entry["status"] != "empty": return True
+        return (now or time.time()) - entry["checked_at"] >= EMPTY_RECHECK
+
+    def plan(self, seed_codes, now=None):
+        # Seed codes first (keeps the old SETS order), then discovered ones
+        codes = list(dict.fromkeys([*seed_codes, *self.sets]))
+        due = [c for c in codes if self.is_due(c, now)]
+        return due, len(codes) - len(due)
+
+    def record(self, code, variants, now=None):
+        self.sets[code] = {
+            "status": "valid" if variants else "empty",
+            "checked_at": now or time.time(),
+            "variants": variants,
+        }
+
+    def index_due(self, now=None):
+        return (now or time.time()) - self.data.get("checked_index_at", 0) >= DISCOVERY_INTERVAL
+
+    def add_discovered(self, codes, now=None):
+        new_codes = [c for c in codes if c not in self.sets]
+        for c in new_codes:
+            self.sets[c] = {"status": "new", "checked_at": 0, "variants": 0}
+        self.data["checked_index_at"] = now or time.time()
+        return new_codes
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp, self.path)
+
+# -------------------- DISCOVERY --------------------
+def parse_set_index(html):
+    codes = []
+    for m in SET_LINK_REGEX.finditer(html):
+        code = m.group(1).lower()
+        if code != "search" and code not in codes: codes.append(code)
+    return codes
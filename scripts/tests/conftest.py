@@ -0,0 +1,27 @@
+import os
+import sys
+import threading
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from fixture_server import make_server
+
+# Offline tests: everything talks to fixture_server.py on a free local port,
+# serving the committed corpus in scripts/fixtures.
+
+@pytest.fixture
+def serve():
+    # serve(**make_server kwargs) -> (base url, server); stopped after the test
+    servers = []
+    def start(**kwargs):
+        server = make_server(0, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}", server
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
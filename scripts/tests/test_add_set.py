@@ -0,0 +1,19 @@
+import os
+
+import add_set
+import scrape_cards
+from fetch_engine import FetchEngine
+from rate_limiter import RateController
+from set_registry import SetRegistry
+
+def test_failed_scrape_is_not_recorded_as_empty(serve, tmp_path, monkeypatch):
+    base, _ = serve(error_rate=1.0)
+    monkeypatch.setattr(scrape_cards, "YUYUTEI_BASE", f"{base}/sell/opc/s")
+    monkeypatch.setattr(scrape_cards, "make_engine", lambda: FetchEngine(
+        host_interval=0, limiter=RateController(initial_rate=None, retries=1, backoff=0.01)))
+    registry_file = str(tmp_path / "registry.json")
+    monkeypatch.setattr(add_set, "SetRegistry", lambda: SetRegistry(registry_file))
+    monkeypatch.setattr(add_set, "DATA_FILE", str(tmp_path / "cards.json"))
+    add_set.add_set("op01")
+    assert SetRegistry(registry_file).sets == {}
+    assert not os.path.exists(tmp_path / "cards.json")
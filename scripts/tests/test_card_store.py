@@ -0,0 +1,82 @@
+import os
+
+from card_store import CardStore
+from cards_file import load_records, write_records
+
+def card(uid, set_id="OP01", price=100, **extra):
+    return {"unique_id": uid, "card_code": uid.split("-X")[0], "set": set_id, "rarity": "C", "price_jpy": price, **extra}
+
+def open_store(tmp_path):
+    return CardStore(json_path=str(tmp_path / "cards.json"))
+
+def keys(store):
+    return [key for key, _ in store.iter_keyed()]
+
+def test_colliding_unique_ids_are_kept_as_uid_n(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        store.replace_all([card("OP01-001-X"), card("OP01-001-X", price=200), card("OP01-002-X")])
+        assert keys(store) == ["OP01-001-X", "OP01-001-X#1", "OP01-002-X"]
+        # upsert updates the row keyed by the unique_id, in place
+        store.upsert([card("OP01-002-X", price=300), card("OP01-003-X")])
+        assert keys(store) == ["OP01-001-X", "OP01-001-X#1", "OP01-002-X", "OP01-003-X"]
+        assert [r["price_jpy"] for r in store.iter_records()] == [100, 200, 300, 100]
+    finally:
+        store.close()
+
+def test_replace_set_only_touches_that_set(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        store.replace_all([card("OP01-001-X"), card("ST01-001-X", "ST01"), card("OP01-002-X")])
+        assert store.replace_set("op01", [card("OP01-005-X")]) == 2      # case-insensitive
+        assert keys(store) == ["ST01-001-X", "OP01-005-X"]
+        assert store.count("OP01") == store.count("ST01") == 1
+        assert store.replace_set("eb01", []) == 0
+    finally:
+        store.close()
+
+def test_replace_records_upserts_and_drops(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        store.replace_all([card("OP01-001-X"), card("OP01-001-X"), card("OP01-002-X"), card("OP01-003-X")])
+        store.replace_records([card("OP01-001-X", price=500)], removed=["OP01-003-X"])
+        # The uid#n duplicate of an upserted id goes, the row itself stays in place
+        assert keys(store) == ["OP01-001-X", "OP01-002-X"]
+        assert next(store.iter_records())["price_jpy"] == 500
+    finally:
+        store.close()
+
+def test_update_records_rewrites_rows_in_place(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        store.replace_all([card("OP01-001-X"), card("OP01-001-X")])
+        key, record = list(store.iter_keyed())[1]
+        store.update_records({key: {**record, "price_jpy": 999, "rarity": "SR"}})
+        assert [(k, r["price_jpy"], r["rarity"]) for k, r in store.iter_keyed()] == [
+            ("OP01-001-X", 100, "C"), ("OP01-001-X#1", 999, "SR")]
+    finally:
+        store.close()
+
+def test_sync_from_json_reimports_only_when_cards_json_changed(tmp_path):
+    path = str(tmp_path / "cards.json")
+    write_records([card("OP01-001-X"), card("OP01-002-X")], path)
+    store = open_store(tmp_path)
+    try:
+        assert store.sync_from_json() and store.count() == 2
+        assert not store.sync_from_json()
+        store.upsert([card("OP01-003-X")])
+        store.export_json()
+        assert not store.sync_from_json()            # our own export
+        assert [r["unique_id"] for r in load_records(path)] == ["OP01-001-X", "OP01-002-X", "OP01-003-X"]
+
+        # Edited outside the store (translate_cards.py, by hand)
+        write_records([card("OP01-001-X", base_name="Luffy")], path)
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        assert store.sync_from_json()
+        assert [r.get("base_name") for r in store.iter_records()] == ["Luffy"]
+
+        with open(path, "w", encoding="utf-8") as f: f.write("[{\"unique_id\": ")
+        assert not store.sync_from_json() and store.count() == 1
+    finally:
+        store.close()
@@ -0,0 +1,40 @@
+import check_images
+from check_images import CheckCache, check_all, verify
+
+def image(base, size, name):
+    return f"{base}/opc/{size}/op01/{name}.jpg"
+
+def test_check_all_reports_status_per_url(serve, tmp_path):
+    base, _ = serve()
+    ok, missing = image(base, "100_140", "10150"), image(base, "100_140", "99999")
+    cache = CheckCache(str(tmp_path / "checks.sqlite"))
+    try:
+        assert check_all([ok, missing, ok], cache) == {ok: 200, missing: 404}
+        # Cached now: a second run does not need the server
+        assert cache.fresh([ok, missing]) == {ok: 200, missing: 404}
+    finally:
+        cache.close()
+
+def test_check_all_survives_throttling(serve):
+    base, server = serve(rate_limit=5, burst=2)
+    urls = [image(base, "100_140", n) for n in ("10150", "10151", "10152", "10153")]
+    limiter = check_images.RateController(initial_rate=50, retries=6, backoff=0.01)
+    assert set(check_all(urls, limiter=limiter).values()) == {200}
+    assert server.counts["throttled"] > 0
+
+def test_verify_upgrades_and_reports_broken(serve):
+    base, _ = serve()
+    records = [
+        {"unique_id": "A", "image_url": image(base, "100_140", "10150"), "official_image_url": image(base, "100_140", "10152")},
+        # mirrored record: the remote URL is in source_image_url
+        {"unique_id": "B", "image_url": "/card-images/x.jpg", "source_image_url": image(base, "100_140", "10151"),
+         "official_image_url": image(base, "100_140", "10153")},
+        {"unique_id": "C", "image_url": image(base, "100_140", "10152"), "official_image_url": image(base, "100_140", "99999")},
+    ]
+    changed, report = verify(lambda: ((r["unique_id"], r) for r in records))
+    assert changed["A"]["image_url"] == image(base, "200_280", "10150")
+    assert changed["B"]["source_image_url"] == image(base, "200_280", "10151")
+    assert changed["B"]["image_url"] == "/card-images/x.jpg"
+    assert "C" not in changed   # no larger size on the server
+    assert report["upgraded"] == 2
+    assert [(b["url"], b["status"], b["records"]) for b in report["broken"]] == [(image(base, "100_140", "99999"), 404, ["C"])]
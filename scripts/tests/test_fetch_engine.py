@@ -0,0 +1,56 @@
+import asyncio
+
+from fetch_engine import FetchEngine
+from http_cache import ResponseCache
+from rate_limiter import RateController
+
+def fetch_all(engine, urls):
+    async def run():
+        return await asyncio.gather(*(engine.fetch(u) for u in urls))
+    return asyncio.run(run())
+
+def test_cache_serves_fresh_then_revalidates(serve, tmp_path):
+    base, _ = serve()
+    url = f"{base}/sell/opc/s/op01?page=1"
+    cache = ResponseCache(str(tmp_path / "http.sqlite"))
+    engine = FetchEngine(host_interval=0, cache=cache)
+    try:
+        first, = fetch_all(engine, [url])
+        again, = fetch_all(engine, [url])
+        cache.ttl = 0   # expired: conditional request, answered 304
+        revalidated, = fetch_all(engine, [url])
+    finally:
+        engine.close()
+    assert (first.status, first.source) == (200, "downloaded")
+    assert (again.source, again.bytes) == ("fresh", 0)
+    assert (revalidated.status, revalidated.source) == (200, "revalidated")
+    assert first.text == again.text == revalidated.text
+    assert "card-list3" in first.text
+    assert engine.stats["downloaded"] == engine.stats["fresh"] == engine.stats["revalidated"] == 1
+
+def test_throttled_requests_are_retried_after_retry_after(serve):
+    base, server = serve(rate_limit=4, burst=1)
+    urls = [f"{base}/sell/opc/s/op01?page={p}" for p in range(1, 5)]
+    limiter = RateController(initial_rate=None, backoff=0.01)
+    engine = FetchEngine(host_interval=0, limiter=limiter)
+    try:
+        pages = fetch_all(engine, urls)
+    finally:
+        engine.close()
+    assert [p.status for p in pages] == [200] * 4
+    assert server.counts["throttled"] > 0
+    assert engine.stats["retries"] >= server.counts["throttled"]
+    # The limiter saw every 429 (and paused the host for its Retry-After)
+    assert limiter.stats["throttled"] == server.counts["throttled"]
+
+def test_server_errors_give_up_after_the_retries(serve):
+    base, server = serve(error_rate=1.0)
+    limiter = RateController(initial_rate=None, retries=2, backoff=0.01)
+    engine = FetchEngine(host_interval=0, limiter=limiter)
+    try:
+        page, = fetch_all(engine, [f"{base}/sell/opc/s/op01?page=1"])
+    finally:
+        engine.close()
+    assert page.status == 503
+    assert server.counts["errors"] == 3
+    assert engine.stats["retries"] == 2
@@ -0,0 +1,78 @@
+import flat_builder
+from flat_builder import FlatBuilder, flatten_code, migrate_ids, save_migrations
+from scrape_cards import classify_variant
+from variant_record import Variant
+
+NOIMAGE = "https://card.yuyu-tei.jp/opc/front/noimage.jpg"
+
+def variant(name, rarity, price, image=NOIMAGE):
+    return Variant("Promo", name, rarity, price, 0, False, image, None)
+
+def ids(variants):
+    return {r["base_name"]: r["unique_id"] for r in flatten_code("P-001", variants)}
+
+def test_noimage_ids_do_not_depend_on_scrape_order():
+    a, b = variant("Luffy", "P", 100), variant("Luffy (Event)", "P", 200)
+    assert ids([a, b]) == ids([b, a])
+    assert all(not uid.endswith(("-2", "-3")) for uid in ids([a, b]).values())
+
+def test_image_ids_ignore_size_directory():
+    small = variant("Luffy", "P", 100, "https://card.yuyu-tei.jp/opc/100_140/op01/10150.jpg")
+    large = variant("Luffy", "P", 100, "https://card.yuyu-tei.jp/opc/200_280/op01/10150.jpg")
+    assert ids([small]) == ids([large])
+
+def test_ids_survive_price_and_position_labels():
+    # The same unmarked listing, classified at three prices and two positions
+    image = "https://card.yuyu-tei.jp/opc/100_140/op01/10150.jpg"
+    uids = set()
+    for price, index in ((300, 0), (300, 1), (1800, 1), (6000, 0)):
+        label, rank, is_high = classify_variant("OP01-001 ルフィ", price, index)
+        v = Variant(label, "ルフィ", "L", price, rank, is_high, image, None)
+        uids.add(flatten_code("OP01-001", [v])[0]["unique_id"])
+    assert len(uids) == 1
+
+    old = flatten_code("P-001", [Variant("Variant #2", "ルフィ", "P", 100, 0, False, NOIMAGE, None)])
+    new = flatten_code("P-001", [Variant("Parallel (Unmarked)", "ルフィ", "P", 1600, 5, True, NOIMAGE, None)])
+    assert old[0]["unique_id"] == new[0]["unique_id"]
+    translated = {**old[0], "unique_id": "P-001-VARIANT2-0", "base_name": "Luffy", "name_ja": "ルフィ"}
+    assert migrate_ids([translated], new) == {"P-001-VARIANT2-0": new[0]["unique_id"]}
+
+def test_builder_reports_changed_ids(tmp_path):
+    a, b = variant("Luffy", "P", 100), variant("Zoro", "P", 200)
+    builder = FlatBuilder(str(tmp_path / "build.sqlite"))
+    try:
+        first, changes = builder.build({"P-001": [a], "P-002": [b]})
+        assert len(changes["added"]) == 2 and changes["codes_changed"] == 2
+        _, changes = builder.build({"P-001": [a], "P-002": [b]})
+        assert changes["codes_changed"] == 0 and not changes["added"] + changes["updated"] + changes["removed"]
+        records, changes = builder.build({"P-001": [variant("Luffy", "P", 150)]})
+        assert changes["updated"] == [records[0]["unique_id"]] == [first[0]["unique_id"]]
+        assert changes["removed"] == [first[1]["unique_id"]] and changes["sets"] == ["P"]
+    finally:
+        builder.close()
+
+def test_migrations_point_at_current_ids(tmp_path):
+    path = str(tmp_path / "id_migrations.json")
+    old = [{"card_code": "P-001", "variant_name": "Promo", "base_name": "Luffy", "image_url": NOIMAGE, "unique_id": "P-001-PROMO-0"}]
+    new = flatten_code("P-001", [variant("Luffy", "P", 100)])
+    renamed = migrate_ids(old, new)
+    assert renamed == {"P-001-PROMO-0": new[0]["unique_id"]}
+    save_migrations(renamed, path)
+    assert save_migrations({new[0]["unique_id"]: "P-001-PROMO-x"}, path) == {
+        "P-001-PROMO-0": "P-001-PROMO-x", new[0]["unique_id"]: "P-001-PROMO-x"}
+    assert save_migrations({"P-001-PROMO-x": "P-001-PROMO-0"}, path) == {
+        new[0]["unique_id"]: "P-001-PROMO-0", "P-001-PROMO-x": "P-001-PROMO-0"}
+
+def test_builder_flattens_only_changed_codes(tmp_path, monkeypatch):
+    master = {"P-001": [variant("Luffy", "P", 100)], "P-002": [variant("Zoro", "P", 200)]}
+    builder = FlatBuilder(str(tmp_path / "build.sqlite"))
+    try:
+        first, _ = builder.build(master)
+        flattened = []
+        monkeypatch.setattr(flat_builder, "flatten_code", lambda code, variants: flattened.append(code) or flatten_code(code, variants))
+        master["P-002"] = [variant("Zoro", "P", 250)]
+        records, changes = builder.build(master)
+        assert flattened == ["P-002"] and changes["codes_changed"] == 1
+        assert records == flat_builder.build_flat_database(master) and records[0] == first[0]
+    finally:
+        builder.close()
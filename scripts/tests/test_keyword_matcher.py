@@ -0,0 +1,24 @@
+import random
+
+from keyword_matcher import KeywordMatcher
+from scrape_cards import VARIANTS, VARIANT_MATCHER
+
+def brute_force(text):
+    # The loop classify_variant used before the matcher
+    best, rank = None, 0
+    for i, (jp, _, r) in enumerate(VARIANTS):
+        if jp in text and r > rank: best, rank = i, r
+    return best
+
+def test_variant_keywords_match_the_substring_loop():
+    rng = random.Random(6)
+    pieces = [jp for jp, _, _ in VARIANTS] + ["OP01-001", " ", "円", "L", "et's", "B", "est", "プ", "ン"]
+    for _ in range(5000):
+        text = "".join(rng.choice(pieces)[rng.randrange(2):] for _ in range(rng.randrange(1, 6)))
+        assert VARIANT_MATCHER.best(text) == brute_force(text), text
+
+def test_keyword_straddling_a_hit_is_found():
+    matcher = KeywordMatcher(["ab", "bcd", "b"], lambda i: [1, 3, 2][i])
+    assert matcher.best("abcd") == 1    # "ab" is the hit, "bcd" starts inside it
+    assert matcher.best("abc") == 2     # "b" is inside the hit
+    assert matcher.best("xyz") is None
@@ -0,0 +1,74 @@
+import json
+import os
+
+import pytest
+
+from mirror_images import MANIFEST_NAME, Image, Mirror, mirror_records
+
+# fixtures/images: 10150 and 10151 are the same picture, 10152 another one
+
+def image(base, name, size="100_140"):
+    return f"{base}/opc/{size}/op01/{name}.jpg"
+
+def objects(directory):
+    # Mirrored originals on disk (no manifest, no thumbnails)
+    return sorted(os.path.relpath(os.path.join(d, n), directory) for d, _, names in os.walk(directory)
+                  for n in names if n.endswith(".jpg"))
+
+def test_store_keeps_identical_images_once(tmp_path):
+    mirror = Mirror(str(tmp_path))
+    a = mirror.store("https://a.example/x/1.jpg", b"same bytes", "image/jpeg")
+    b = mirror.store("https://b.example/y/2.jpg", b"same bytes", "image/jpeg")
+    c = mirror.store("https://a.example/x/3.jpg", b"other bytes", "image/jpeg")
+    assert a == b != c
+    assert len(objects(str(tmp_path))) == 2
+    assert mirror.object_for("https://b.example/y/2.jpg") == a
+    # No extension in the URL: taken from the content type
+    assert mirror.store("https://a.example/img?id=4", b"png bytes", "image/png").endswith(".png")
+
+def test_mirror_records_dedups_and_rewrites_urls(serve, tmp_path):
+    base, _ = serve()
+    records = [
+        {"unique_id": "A", "image_url": image(base, "10150"), "official_image_url": image(base, "10152")},
+        {"unique_id": "B", "image_url": image(base, "10151")},
+        {"unique_id": "C", "image_url": image(base, "99999")},   # 404: keeps the remote URL
+    ]
+    mirror = Mirror(str(tmp_path), prefix="/card-images")
+    changed = mirror_records(records, mirror, thumbnails=False, concurrency=2)
+
+    assert [r["unique_id"] for r in changed] == ["A", "B"]
+    a, b, c = records
+    assert a["image_url"] == b["image_url"] != a["official_image_url"]
+    assert a["image_url"].startswith("/card-images/")
+    assert a["source_image_url"] == image(base, "10150") and b["source_image_url"] == image(base, "10151")
+    assert c["image_url"] == image(base, "99999") and "source_image_url" not in c
+    assert len(objects(str(tmp_path))) == 2
+    with open(tmp_path / MANIFEST_NAME, encoding="utf-8") as f:
+        assert len(json.load(f)["urls"]) == 3
+
+@pytest.mark.skipif(Image is None, reason="needs Pillow")
+def test_rerun_skips_what_the_manifest_has(serve, tmp_path):
+    base, server = serve(rate_limit=1000, burst=1000)   # only to count the requests
+    records = [
+        {"unique_id": "A", "image_url": image(base, "10150"), "official_image_url": image(base, "10152")},
+        {"unique_id": "B", "image_url": image(base, "10153")},
+    ]
+    mirror_records(records, Mirror(str(tmp_path)), concurrency=2, workers=1)
+    assert server.counts["served"] == 3
+    assert set(records[0]["thumbnails"]) == {"160", "320"}
+    first = [dict(r) for r in records]
+
+    # A new run loads manifest.json and downloads / renders nothing again,
+    # also for records that already point at the mirror
+    assert mirror_records(records, Mirror(str(tmp_path)), concurrency=2, workers=1) == []
+    assert server.counts["served"] == 3
+    assert records == first
+
+    # A new image is the only download; a deleted object is fetched again
+    records.append({"unique_id": "C", "image_url": image(base, "10151", "200_280")})
+    mirror = Mirror(str(tmp_path))
+    os.remove(mirror.path(mirror.object_for(image(base, "10153"))))
+    changed = mirror_records(records, mirror, concurrency=2, workers=1)
+    assert [r["unique_id"] for r in changed] == ["C"]
+    assert server.counts["served"] == 5
+    assert os.path.exists(mirror.path(mirror.object_for(image(base, "10153"))))
@@ -0,0 +1,45 @@
+from price_history import MISSING, PriceHistory, record_snapshot
+
+def snap(prices):
+    return [{"unique_id": uid, "price_jpy": price} for uid, price in prices.items()]
+
+def test_blocks_hold_runs_of_unchanged_series_and_deltas(tmp_path):
+    history = PriceHistory(str(tmp_path))
+    assert history.append(snap({"a": 100, "b": 200, "c": 300, "d": 400}), ts=1) == 4
+    assert history.append(snap({"a": 100, "b": 200, "c": 350, "d": 400}), ts=2) == 1
+    assert history.append(snap({"a": 100, "b": 200, "c": 350, "d": 400}), ts=3) == 0
+    blocks = list(history._blocks())
+    assert [(ts, n) for ts, n, _ in blocks] == [(1, 4), (2, 4), (3, 4)]
+    assert list(blocks[0][2]) == [0, 101, 0, 201, 0, 301, 0, 401]   # from MISSING (-1)
+    assert list(blocks[1][2]) == [2, 50]                            # skip a, b; c +50
+    assert blocks[2][2] is None                                     # nothing moved: header only
+
+def test_missing_ids_and_reopening(tmp_path):
+    history = PriceHistory(str(tmp_path))
+    history.append(snap({"a": 100, "b": 200}), ts=1)
+    history.append(snap({"b": 250, "c": 50}), ts=2)      # a delisted, c new
+    history.append(snap({"a": 120, "b": 250, "c": 50}), ts=3)
+    reopened = PriceHistory(str(tmp_path))
+    assert reopened.ids == ["a", "b", "c"] and list(reopened.latest) == [120, 250, 50]
+    assert reopened.history("a") == [(1, 100), (2, None), (3, 120)]
+    assert reopened.history("b") == [(1, 200), (2, 250)]
+    assert reopened.history("c") == [(2, 50)]
+    assert reopened.history("zzz") == []
+    assert list(reopened.column_at(1)) == [100, 200]   # c did not exist yet
+
+def test_top_movers(tmp_path):
+    history = PriceHistory(str(tmp_path))
+    history.append(snap({"a": 100, "b": 1000, "c": 10, "d": 500}), ts=10)
+    history.append(snap({"a": 300, "b": 1100, "c": 5}), ts=20)
+    assert history.top_movers(10) == [("a", 100, 300, 200), ("b", 1000, 1100, 100), ("c", 10, 5, -5)]
+    assert [m[0] for m in history.top_movers(10, relative=True)] == ["a", "c", "b"]
+    assert history.top_movers(10, limit=1) == [("a", 100, 300, 200)]
+    assert history.top_movers(20) == []
+
+def test_partial_snapshot_keeps_other_series(tmp_path):
+    directory = str(tmp_path)
+    record_snapshot(snap({"op01": 100, "op02": 200, "op02-old": 300}), directory)
+    record_snapshot(snap({"op02": 250}), directory, partial=True, removed={"op02-old"})
+    history = PriceHistory(directory)
+    assert list(history.latest) == [100, 250, MISSING]
+    assert history.history("op01") == [(history.snapshots()[0], 100)]
@@ -0,0 +1,41 @@
+import email.utils
+
+from rate_limiter import RateController, TokenBucket, parse_retry_after
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(email.utils.formatdate(1000 + 30, usegmt=True), now=1000) == 30.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+def test_bucket_paces_past_the_burst():
+    bucket = TokenBucket(2.0, burst=2)
+    now = bucket.updated
+    assert bucket.reserve(now=now) == 0.0
+    assert bucket.reserve(now=now) == 0.0
+    assert bucket.reserve(now=now) == 0.5
+    bucket.pause(3.0, now=now)
+    assert bucket.paused(now=now + 2.9)
+    assert not bucket.paused(now=now + 3.1)
+
+def test_throttle_slows_down_once_per_pause():
+    limiter = RateController(initial_rate=4.0, min_rate=0.1)
+    limiter.feedback("h", 429, retry_after=5)
+    limiter.feedback("h", 429, retry_after=5)   # in flight with the first one
+    assert limiter.rate("h") == 2.0
+    assert limiter.bucket("h").paused()
+
+def test_fast_answers_speed_back_up_and_errors_slow_down():
+    limiter = RateController(initial_rate=2.0, max_rate=4.0)
+    for _ in range(100): limiter.feedback("h", 200, latency=0.01)
+    assert limiter.rate("h") == 4.0
+    limiter.feedback("h", None)
+    assert limiter.rate("h") == 3.0
+
+def test_retry_delay_honours_retry_after():
+    limiter = RateController(backoff=0.01)
+    assert limiter.retry_delay(0, retry_after=3) == 3
+    assert limiter.retry_delay(3) <= 0.08
+    assert limiter.should_retry(503, 0) and limiter.should_retry(None, 0)
+    assert not limiter.should_retry(404, 0)
+    assert not limiter.should_retry(503, limiter.retries)
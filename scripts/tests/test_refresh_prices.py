@@ -0,0 +1,36 @@
+import asyncio
+
+import scrape_cards
+from fetch_engine import FetchEngine
+from flat_builder import build_flat_database
+from refresh_prices import match_prices, observe_prices
+
+def test_prices_match_by_image_after_an_image_upgrade(serve, monkeypatch):
+    base, _ = serve()
+    monkeypatch.setattr(scrape_cards, "YUYUTEI_BASE", f"{base}/sell/opc/s")
+    async def scrape_then_observe(engine):
+        master = await scrape_cards.scrape_set_async(engine, "op01")
+        return master, *await observe_prices(engine, ["op01"], [])
+    engine = FetchEngine(host_interval=0)
+    try:
+        master, observed, failed = asyncio.run(scrape_then_observe(engine))
+    finally:
+        engine.close()
+    assert not failed
+    records = build_flat_database(master)
+    scraped = {r["unique_id"]: r["price_jpy"] for r in records}
+    # check_images.py moved the stored URLs to the larger size; prices are stale
+    for r in records:
+        r["image_url"] = r["image_url"].replace("/100_140/", "/200_280/")
+        r["price_jpy"] = 1
+    # Same code and label, told apart only by their image
+    parallels = [r for r in records if r["card_code"] == "OP01-120" and r["variant_name"] == "Parallel (AA)"]
+    assert len(parallels) == 2 and len({scraped[r["unique_id"]] for r in parallels}) == 2
+
+    seen = set()
+    changed, diff, stats = match_prices([(r["unique_id"], r) for r in records], observed, seen)
+    assert {r["unique_id"]: r["price_jpy"] for r in records} == scraped
+    assert stats["unmatched"] == stats["unseen"] == 0
+    # Only the records without an image fall back to code + label
+    assert stats["by_label"] == sum("noimage" in r["image_url"] for r in records)
+    assert len(changed) == len(diff) == len(records) == len(seen)
@@ -0,0 +1,55 @@
+import asyncio
+
+import scrape_cards
+from card_store import CardStore
+from fetch_engine import FetchEngine
+from refresh_scheduler import RefreshScheduler, Schedule
+from scrape_cards import new_unit_state
+from set_registry import SetRegistry
+
+def refresh_sets(base, tmp_path, store, set_codes):
+    engine = FetchEngine(host_interval=0)
+    scheduler = RefreshScheduler(engine, store, SetRegistry(str(tmp_path / "registry.json")),
+                                 Schedule(str(tmp_path / "schedule.json")), history_dir=str(tmp_path / "history"))
+    async def run():
+        for code in set_codes:
+            state = new_unit_state()
+            await scheduler.refresh_set(code, state)
+            assert not state["error"]
+    try:
+        asyncio.run(run())
+    finally:
+        engine.close()
+
+def test_range_unit_refreshes_do_not_pile_up(serve, tmp_path, monkeypatch):
+    base, _ = serve()
+    monkeypatch.setattr(scrape_cards, "YUYUTEI_BASE", f"{base}/sell/opc/s")
+    store = CardStore(json_path=str(tmp_path / "cards.json"))
+    try:
+        refresh_sets(base, tmp_path, store, ["op01", "op01-op10"])
+        count = store.count()
+        # A translation made in between survives the next refreshes
+        key, record = next(store.iter_keyed())
+        store.update_records({key: {**record, "name_ja": record["base_name"], "base_name": "Translated"}})
+        refresh_sets(base, tmp_path, store, ["op01-op10", "op01-op10", "op01"])
+        assert store.count() == count
+        assert store.count() == len({r["unique_id"] for r in store.iter_records()})
+        assert dict(store.iter_keyed())[key]["base_name"] == "Translated"
+    finally:
+        store.close()
+
+def test_records_only_the_unit_listed_are_dropped_when_gone(serve, tmp_path, monkeypatch):
+    base, _ = serve()
+    monkeypatch.setattr(scrape_cards, "YUYUTEI_BASE", f"{base}/sell/opc/s")
+    store = CardStore(json_path=str(tmp_path / "cards.json"))
+    try:
+        refresh_sets(base, tmp_path, store, ["op01"])
+        stale = {**next(store.iter_records()), "unique_id": "OP01-999-NORMAL-00000000"}
+        elsewhere = {**stale, "unique_id": "OP01-998-NORMAL-00000000", "sources": [f"{base}/sell/opc/s/op02?page=1"]}
+        store.upsert([stale, elsewhere])
+        refresh_sets(base, tmp_path, store, ["op01"])
+        ids = {r["unique_id"] for r in store.iter_records()}
+        assert stale["unique_id"] not in ids
+        assert elsewhere["unique_id"] in ids
+    finally:
+        store.close()
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+import scrape_cards
+from fetch_engine import FetchEngine
+from scrape_cards import new_unit_state, scrape_all
+from scrape_checkpoint import ScrapeCheckpoint
+
+# An interrupted scrape resumed from its checkpoint must end with the same
+# master as a run that never failed, without fetching the saved pages again.
+
+class RecordingEngine(FetchEngine):
+    # Logs every request; requests matching `fail` raise like a dropped connection
+    def __init__(self, fail=()):
+        super().__init__(host_interval=0)
+        self.fail = fail
+        self.requests = []
+
+    async def fetch(self, url, params=None):
+        request = f"{url} {params['search_word']}:{params['page']}" if params else url
+        self.requests.append(request)
+        if any(f in request for f in self.fail): raise ConnectionError("connection reset")
+        return await super().fetch(url, params)
+
+def run(engine, checkpoint=None, resume=False):
+    master = asyncio.run(scrape_all(engine, None, checkpoint, resume))
+    return [(code, [v.to_dict() for v in variants]) for code, variants in master.items()]
+
+@pytest.fixture
+def fixture_site(serve, monkeypatch):
+    base, _ = serve()
+    monkeypatch.setattr(scrape_cards, "YUYUTEI_BASE", f"{base}/sell/opc/s")
+    monkeypatch.setattr(scrape_cards, "SEARCH_BASE", f"{base}/sell/opc/s/search")
+    monkeypatch.setattr(scrape_cards, "SETS", ["op01", "eb01", "st01"])
+    monkeypatch.setattr(scrape_cards, "SEARCH_KEYWORDS", ["P-"])
+    return base
+
+def test_resumed_run_matches_an_uninterrupted_one(fixture_site, tmp_path):
+    expected = run(RecordingEngine())
+    assert len(expected) > 50
+
+    checkpoint = ScrapeCheckpoint(str(tmp_path / "checkpoint.sqlite"))
+    try:
+        checkpoint.reset()
+        # op01 dies on page 3 (of 4), the P- search on page 2 (of 2)
+        interrupted = run(RecordingEngine(fail=("/op01?page=3", " P-:2")), checkpoint)
+        assert interrupted != expected
+        assert [unit for unit, _ in checkpoint.failed()] == ["search:P-", "set:op01"]
+        assert "ConnectionError" in dict(checkpoint.failed())["set:op01"]
+        assert checkpoint.status("set:eb01") == checkpoint.status("set:st01") == "done"
+        assert checkpoint.restore("set:op01", new_unit_state()) == 2
+        assert checkpoint.restore("search:P-", new_unit_state()) == 1
+
+        engine = RecordingEngine()
+        assert run(engine, checkpoint, resume=True) == expected
+        # Done units and saved pages are replayed, not fetched
+        assert not any("/eb01" in r or "/st01" in r for r in engine.requests)
+        assert not any(f"/op01?page={p}" in r for r in engine.requests for p in (1, 2))
+        assert not any(r.endswith(" P-:1") for r in engine.requests)
+        assert any("/op01?page=3" in r for r in engine.requests) and any(r.endswith(" P-:2") for r in engine.requests)
+        assert checkpoint.failed() == []
+        assert checkpoint.status("set:op01") == checkpoint.status("search:P-") == "done"
+
+        # Everything is done now: a further resume fetches nothing
+        engine = RecordingEngine()
+        assert run(engine, checkpoint, resume=True) == expected
+        assert engine.requests == []
+    finally:
+        checkpoint.close()
@@ -0,0 +1,108 @@
+import itertools
+from array import array
+
+import pytest
+
+from search_index import MAGIC, PREFIX_MAX, SearchIndex, normalize, words
+
+def card(uid, code, name, variant="Base / Normal", rarity="SR", name_ja=None):
+    r = {"unique_id": uid, "card_code": code, "set": code.split("-")[0], "base_name": name,
+         "rarity": rarity, "variant_name": variant}
+    if name_ja: r["name_ja"] = name_ja
+    return r
+
+RECORDS = [
+    card("a", "OP01-001", "Roronoa Zoro", rarity="L", name_ja="ロロノア・ゾロ"),
+    card("b", "OP01-120", "Shanks", variant="Parallel", rarity="SEC", name_ja="シャンクス"),
+    card("c", "OP02-013", "Portgas.D.Ace", variant="Manga", rarity="SP"),
+    card("d", "ST01-012", "Monkey.D.Luffy", name_ja="モンキー・D・ルフィ"),
+    card("e", "OP05-119", "Monkey.D.Luffy", variant="Parallel", rarity="SEC", name_ja="モンキー・D・ルフィ"),
+    card("f", "EB01-006", "Tony Tony.Chopper", rarity="UC"),
+    card("g", "OP01-016", "Nami", variant="Supercalifragilisticexpialidocious Art"),
+]
+
+@pytest.fixture(scope="module")
+def index():
+    return SearchIndex.build(RECORDS, names_ja={})
+
+def reference(query):
+    # Brute force over the records: every query word starts a word of the
+    # record or, when it starts no word anywhere, each of its 3-grams (its
+    # 2-gram if shorter) is inside a word of the record
+    def record_words(r):
+        ws = {w for f in ("card_code", "base_name", "name_ja", "set", "rarity", "variant_name") for w in words(r.get(f))}
+        return ws | {normalize(r["card_code"])}
+    all_words = [record_words(r) for r in RECORDS]
+    found = set(range(len(RECORDS)))
+    for q in set(words(query)):
+        starts = {i for i, ws in enumerate(all_words) if any(w.startswith(q) for w in ws)}
+        n = min(len(q), 3)
+        parts = [q[i:i + n] for i in range(len(q) - n + 1)] if n >= 2 else []
+        found &= starts or {i for i, ws in enumerate(all_words) if parts and all(any(g in w for w in ws) for g in parts)}
+    return [RECORDS[i]["unique_id"] for i in sorted(found)] if words(query) else []
+
+@pytest.mark.parametrize("query, expected", [
+    ("op01", ["a", "b", "g"]),              # prefix of the set and of the codes
+    ("op0", ["a", "b", "c", "e", "g"]),
+    ("OP01-120", ["b"]),                    # the full code is one more word
+    ("ＯＰ０２", ["c"]),                     # NFKC: full-width matches
+    ("luf", ["d", "e"]),
+    ("monkey sec", ["e"]),                  # every word has to match
+    ("ルフ", ["d", "e"]),                    # the Japanese name
+    ("supercalifragilistic", ["g"]),        # longer than PREFIX_MAX, resolved over the terms
+])
+def test_prefix_queries(index, query, expected):
+    assert index.search(query) == expected
+
+@pytest.mark.parametrize("query, expected", [
+    ("uffy", ["d", "e"]),                   # trigrams
+    ("ff", ["d", "e"]),                     # bigram
+    ("anks", ["b"]),
+    ("ンクス", ["b"]),
+    ("opper uc", ["f"]),                    # substring and prefix words together
+    ("xyz", []),
+])
+def test_ngram_queries(index, query, expected):
+    assert index.search(query) == expected
+
+@pytest.mark.parametrize("query", ["", "   ", "・!?", "zz luffy"])
+def test_empty_results(index, query):
+    assert index.match(query) == []
+    assert index.search(query) == []
+
+def test_queries_match_brute_force(index):
+    vocabulary = sorted({w for r in RECORDS for w in words(" ".join(str(v) for v in r.values()))})
+    queries = set()
+    for w in vocabulary:
+        queries.update(w[i:j] for i in range(len(w)) for j in range(i + 1, min(len(w), i + 5) + 1))
+    queries.update(" ".join(pair) for pair in itertools.combinations(vocabulary[:12], 2))
+    for q in sorted(queries):
+        assert index.search(q) == reference(q), q
+
+def test_round_trip(index, tmp_path):
+    data = index.to_bytes()
+    assert data.startswith(MAGIC)
+    path = str(tmp_path / "search-index.bin")
+    assert index.save(path) == len(data)
+    loaded = SearchIndex.load(path)
+    assert loaded.ids == index.ids == [r["unique_id"] for r in RECORDS]
+    assert loaded.terms == index.terms
+    assert loaded.prefix_postings == index.prefix_postings
+    assert loaded.gram_postings == index.gram_postings
+    # Postings are sorted uint32 record numbers
+    for postings in list(loaded.prefix_postings.values()) + list(loaded.gram_postings.values()):
+        assert isinstance(postings, array) and postings.typecode == "I" and postings.itemsize == 4
+        assert list(postings) == sorted(set(postings))
+    # Prefix keys stop at PREFIX_MAX characters; whole words are always kept
+    assert max(len(k) for k in loaded.prefix_postings if k not in loaded.terms) == PREFIX_MAX
+    assert {len(g) for g in loaded.gram_postings} == {2, 3}
+    for q in ("op0", "uffy", "monkey sec", "supercalifragilistic", ""):
+        assert loaded.search(q) == index.search(q)
+
+def test_empty_catalog_round_trips():
+    index = SearchIndex.from_bytes(SearchIndex.build([], names_ja={}).to_bytes())
+    assert index.ids == [] and index.search("op01") == []
+
+def test_rejects_other_files():
+    with pytest.raises(ValueError):
+        SearchIndex.from_bytes(b"[]")
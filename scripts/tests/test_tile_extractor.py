@@ -0,0 +1,42 @@
+import pytest
+
+from benchmark import _groups, fixture_pages, legacy_tiles
+from tile_extractor import extract_tiles
+
+# extract_tiles must find the same tiles as the BeautifulSoup path it
+# replaced (benchmark.legacy_tiles). The signature is raw markup instead of
+# re-serialized markup, so only the way it groups tiles has to match.
+
+PAGES = fixture_pages()
+
+def assert_same_tiles(html):
+    old, new = legacy_tiles(html), extract_tiles(html)
+    assert (old is None) == (new is None)
+    if old is None: return
+    assert [t[:2] + t[3:] for t in new] == [t[:2] + t[3:] for t in old]
+    assert _groups([t.signature for t in new]) == _groups([t.signature for t in old])
+
+@pytest.mark.parametrize("html", [html for _, html in PAGES], ids=[rel for rel, _ in PAGES])
+def test_fixture_pages_match_bs4(html):
+    assert_same_tiles(html)
+
+def test_corpus_has_tiles():
+    assert sum(len(extract_tiles(html) or []) for _, html in PAGES) > 100
+
+@pytest.mark.parametrize("html", [
+    # No product images at all
+    "<html><body><p>メンテナンス中</p></body></html>",
+    # Void elements, unclosed <p>, stray end tags and entities
+    '<div class="col-md-4"><img alt="A &amp; B" src="/a.jpg"><br><p>1,000円<p>SP</span></div>',
+    # Script / style text is not part of the container text
+    '<div class="card_unit"><script>var x = "<h4>no</h4>";</script><h4> Name </h4>'
+    '<img alt="X" data-original="/x.jpg" src="/blank.gif"><style>.a{}</style>500 円</div>',
+    # Nested containers
+    '<li class="card_unit"><div class="col-md-4"><img alt="inner"></div><span>300円</span></li>',
+    # Same markup twice: one signature group
+    '<div class="col-md-4"><img alt="dup">100円</div>' * 2,
+    # Image outside any container
+    '<section><img alt="loose" src="/l.jpg"> 10円</section>',
+], ids=["empty", "void-and-stray", "script-text", "nested", "duplicate", "no-container"])
+def test_edge_cases_match_bs4(html):
+    assert_same_tiles(html)
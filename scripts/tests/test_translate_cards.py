@@ -0,0 +1,100 @@
+import json
+import os
+
+import pytest
+
+from cards_file import load_records, write_records
+from rate_limiter import RateController
+from translate_cards import (
+    StubBackend, TranslationCache, compose_name, decompose_name, main, translate_names, translate_with_retry,
+)
+
+class FlakyBackend(StubBackend):
+    # Fails the first `failures` calls, then answers like the stub
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def translate_batch(self, batch):
+        if self.failures:
+            self.failures -= 1
+            self.calls += 1
+            raise ConnectionError('flaky')
+        return super().translate_batch(batch)
+
+def test_pipeline_with_the_stub_backend(tmp_path):
+    cards = str(tmp_path / 'cards.json')
+    cache = str(tmp_path / 'cache.json')
+    write_records([
+        {'unique_id': 'a', 'base_name': 'キャロット(パラレル/箔押し)'},
+        {'unique_id': 'b', 'base_name': 'キャロット'},
+        {'unique_id': 'c', 'base_name': 'Monkey D. Luffy'},
+    ], cards)
+    assert main(cards, cache, backend='stub', batch_size=1, concurrency=2)
+    records = load_records(cards)
+    assert [r['base_name'] for r in records] == [
+        '[en] キャロット (Parallel/Foil Stamped)', '[en] キャロット', 'Monkey D. Luffy']
+    assert records[0]['name_ja'] == 'キャロット(パラレル/箔押し)' and 'name_ja' not in records[2]
+    # Both prints share one cache entry; the journal was folded into the cache
+    with open(cache, encoding='utf-8') as f:
+        assert json.load(f) == {'キャロット': '[en] キャロット'}
+    assert not os.path.exists(cache + '.journal')
+
+def test_journal_is_replayed_then_compacted(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    cache = TranslationCache(path)
+    cache.add_many([('ルフィ', 'Luffy'), ('ゾロ', 'Zoro')])
+    cache._journal.close()   # crash: no compact()
+    with open(path + '.journal', 'a', encoding='utf-8') as f:
+        f.write('["ナミ", "Na')   # torn last line
+    reopened = TranslationCache(path)
+    assert reopened.entries == {'ルフィ': 'Luffy', 'ゾロ': 'Zoro'}
+    reopened.add_many([('ナミ', 'Nami')])
+    reopened.compact()
+    assert not os.path.exists(path + '.journal')
+    assert TranslationCache(path).entries == {'ルフィ': 'Luffy', 'ゾロ': 'Zoro', 'ナミ': 'Nami'}
+
+def test_failed_batches_are_retried_through_the_rate_controller():
+    limiter = RateController(initial_rate=None, retries=3, backoff=0.001)
+    backend = FlakyBackend(failures=2)
+    assert translate_with_retry(backend, ['ルフィ'], retries=3, backoff=0.001, limiter=limiter) == ['[en] ルフィ']
+    assert backend.calls == 3 and limiter.stats['retries'] == 2 and limiter.stats['errors'] == 2
+
+    with pytest.raises(ConnectionError):
+        translate_with_retry(FlakyBackend(failures=5), ['ルフィ'], retries=2, backoff=0.001, limiter=limiter)
+
+def test_batches_that_keep_failing_are_returned(tmp_path):
+    cache = TranslationCache(str(tmp_path / 'cache.json'))
+    try:
+        failed = translate_names(['a', 'b', 'c'], StubBackend(fail_rate=1.0), cache, batch_size=2, retries=1, backoff=0.001)
+    finally:
+        cache.compact()
+    assert sorted(map(tuple, failed)) == [('a', 'b'), ('c',)]
+    assert len(cache) == 0
+
+# name -> (base, tag groups, composed with the base left as is)
+NAMES = [
+    ('キャロット(パラレル/箔押し)', 'キャロット', [['パラレル', '箔押し']], 'キャロット (Parallel/Foil Stamped)'),
+    ('ルフィ（パラレル）', 'ルフィ', [['パラレル']], 'ルフィ (Parallel)'),
+    ('ルフィ(PRB)(パラレル)', 'ルフィ', [['PRB'], ['パラレル']], 'ルフィ (PRB) (Parallel)'),
+    ('ナミ(3rd ANNIVERSARY SET)', 'ナミ', [['3rd ANNIVERSARY SET']], 'ナミ (3rd ANNIVERSARY SET)'),
+    ('ロー (プロモーションパックEX Vol.2) ', 'ロー', [['プロモーションパックEX Vol.2']], 'ロー (Promotion Pack EX Vol.2)'),
+    ('ウタ(交流会 2024年5月開催記念品)', 'ウタ', [['交流会 2024年5月開催記念品']], 'ウタ (Exchange Event 2024/05 Gift)'),
+    # Not a tag group: stays part of the name
+    ('ドン!!カード(サボ)', 'ドン!!カード(サボ)', [], 'ドン!!カード(サボ)'),
+    ('ゾロ(ゾロ十郎)', 'ゾロ(ゾロ十郎)', [], 'ゾロ(ゾロ十郎)'),
+    ('ルフィ(パラレル/サボ)', 'ルフィ(パラレル/サボ)', [], 'ルフィ(パラレル/サボ)'),
+    ('サンジ(パラレル)(ゾロ)', 'サンジ(パラレル)(ゾロ)', [], 'サンジ(パラレル)(ゾロ)'),
+    ('ルフィ(Vol.1 特典)', 'ルフィ(Vol.1 特典)', [], 'ルフィ(Vol.1 特典)'),   # ASCII and Japanese mixed
+    ('ルフィ()', 'ルフィ()', [], 'ルフィ()'),
+    ('(PRB)', '(PRB)', [], '(PRB)'),                                     # nothing left for a name
+]
+
+@pytest.mark.parametrize('name, base, groups, composed', NAMES)
+def test_decompose_compose_round_trip(name, base, groups, composed):
+    assert decompose_name(name) == (base, groups)
+    assert compose_name(base, groups) == composed
+    # Nothing is lost: the tags put back as they were give the name again
+    restored = base + ''.join(f"({'/'.join(g)})" for g in groups)
+    normalize = lambda text: text.replace(' ', '').replace('（', '(').replace('）', ')')
+    assert normalize(restored) == normalize(name)
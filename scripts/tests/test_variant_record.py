@@ -0,0 +1,14 @@
+from variant_record import FIELDS, Variant
+
+def test_dict_round_trip():
+    v = Variant("Parallel (AA)", "Shanks", "SEC", 3980, 7, True, "https://card.yuyu-tei.jp/opc/100_140/op01/10151.jpg",
+                "https://yuyu-tei.jp/sell/opc/s/op01?page=1", sources=["https://yuyu-tei.jp/sell/opc/s/op01?page=1"])
+    d = v.to_dict()
+    assert set(d) == set(FIELDS) | {"sources"}
+    assert Variant.from_dict(d) == v
+    assert "sources" not in Variant.from_dict({**d, "sources": None}).to_dict()
+
+def test_repeated_strings_are_shared():
+    a = Variant("".join(["Para", "llel"]), "x", "SR", 1, 0, False, None, None)
+    b = Variant("".join(["Paral", "lel"]), "y", "SR", 2, 0, False, None, None)
+    assert a.label is b.label
@@ -0,0 +1,253 @@
+import bisect
+import re
+from collections import namedtuple
+from html import unescape
+
+# Single-pass product tile extraction for yuyu-tei listing pages.
+#
+# This replaces BeautifulSoup + find_product_container: instead of building a
+# full tree and walking up from every <img alt>, the page is scanned once with
+# a tag tokenizer while recording, per element, its parent, its class list and
+# the range of text strings it contains. Containers, their text and their
+# <h4> are then resolved from those ranges without rebuilding text for every
+# ancestor. Attributes are only parsed for the tags that matter (img/div/li).
+#
+# Tree construction mirrors bs4's html.parser builder (void elements close
+# immediately, an end tag pops back to the nearest open tag of that name,
+# stray end tags are ignored) so the containers found are the same ones.
+
+# Tile: one <img alt> that looks like a product image
+#   alt            stripped alt text
+#   image          data-original or src
+#   signature      raw markup of the container (dedup key, replaces str(container))
+#   text           container.get_text(" ", strip=True)
+#   name           text of the first <h4> in the container, or None
+Tile = namedtuple("Tile", ["alt", "image", "signature", "text", "name"])
+
+VOID_ELEMENTS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem",
+    "meta", "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame",
+    "image", "isindex", "nextid", "spacer",
+])
+# Raw text elements: their content is never parsed as markup
+RAW_TEXT_ELEMENTS = frozenset(["script", "style"])
+# Strings inside these are not part of get_text() on an ancestor
+NON_TEXT_ELEMENTS = frozenset(["script", "style", "template"])
+ATTR_ELEMENTS = frozenset(["img", "div", "li"])
+CONTAINER_TAGS = ("div", "li")
+CONTAINER_CLASSES = ("col-md-4", "card_unit")
+PRICE_MARK = "円"
+
+_TOKEN = re.compile(r"""
+    <!--.*?(?:--!?>|\Z)                                        # comment
+  | <!\[CDATA\[(?P<cdata>.*?)(?:\]\]>|\Z)                      # CDATA section (text)
+  | <[!?][^>]*>?                                                # doctype, declaration, PI
+  | </(?P<end>[a-zA-Z][^\t\n\r\f />\x00]*)[^>]*>                # end tag
+  | </[^a-zA-Z][^>]*>?                                          # bogus end tag, ignored
+  | <(?P<start>[a-zA-Z][^\t\n\r\f />\x00]*)(?P<attrs>(?:[^>"']|"[^"]*"|'[^']*')*)>
+""", re.S | re.X)
+# Same attribute grammar as html.parser
+_ATTR = re.compile(r"""((?<=['"\s/])[^\s/>][^\s/=>]*)(\s*=+\s*('[^']*'|"[^"]*"|(?!['"])[^>\s]*))?(?:\s|/(?!>))*""")
+# ?page=N links of the pagination widget
+_PAGE_LINK = re.compile(r"""href\s*=\s*["'][^"'>]*[?&](?:amp;)?page=(\d+)""", re.I)
+_RAW_END = {tag: re.compile(r"</\s*%s\s*>" % tag, re.I) for tag in RAW_TEXT_ELEMENTS}
+
+def _attrs(html, start, end):
+    attrs = {}
+    for m in _ATTR.finditer(html, start, end):
+        value = m.group(3)
+        if value is None: value = ""
+        elif value[:1] in ("'", '"') and value[:1] == value[-1:]: value = value[1:-1]
+        if "&" in value: value = unescape(value)
+        attrs[m.group(1).lower()] = value
+    return attrs
+
+class _PageTree:
+    # Flat element table built in one pass over the page
+    def __init__(self, html):
+        self.html = html
+        # Per element (index 0 is the document itself)
+        self.names = ["[document]"]
+        self.classes = [()]
+        self.parents = [-1]
+        self.starts = [0]       # source offset of the start tag
+        self.ends = [len(html)]
+        self.first_str = [0]    # [first_str, end_str) indexes into self.strings
+        self.end_str = [0]
+        self.last_desc = [0]    # index of the last element nested inside
+        self.h4s = []
+        # Stripped, non-empty strings that get_text() would return
+        self.strings = []
+        self.imgs = []          # (alt, image, parent element)
+        self._stack = [0]
+        self._non_text_depth = 0
+        self._pending = []
+        self._scan()
+
+    def _text(self, data):
+        # Text is buffered until the next token that ends a string in bs4
+        # (everything except a redundant end tag of a void element and "</>")
+        if not self._non_text_depth: self._pending.append(data)
+
+    def _flush(self):
+        if not self._pending: return
+        data = "".join(self._pending)
+        self._pending = []
+        if "&" in data: data = unescape(data)
+        data = data.strip()
+        if data: self.strings.append(data)
+
+    def _scan(self):
+        html = self.html
+        pos = 0
+        n = len(html)
+        already_closed = []
+        while pos < n:
+            m = _TOKEN.search(html, pos)
+            if not m:
+                self._text(html[pos:])
+                break
+            if m.start() > pos: self._text(html[pos:m.start()])
+            pos = m.end()
+
+            tag = m.group("end")
+            if tag:
+                tag = tag.lower()
+                if tag in already_closed:
+                    already_closed.remove(tag)
+                else:
+                    self._flush()
+                    self._pop_to(tag, m.start())
+                continue
+            if m.group(0) == "</>": continue
+
+            self._flush()
+            tag = m.group("start")
+            if tag:
+                tag = tag.lower()
+                self_closing = m.group("attrs").endswith("/")
+                attrs = _attrs(html, m.start("attrs"), m.end("attrs")) if tag in ATTR_ELEMENTS else {}
+                self._open(tag, attrs, m.start())
+                if self_closing:
+                    self._pop_to(tag, m.start())
+                elif tag in VOID_ELEMENTS:
+                    self._pop_to(tag, m.start())
+                    already_closed.append(tag)
+                elif tag in RAW_TEXT_ELEMENTS:
+                    # Skip the body; its text never reaches get_text() of an ancestor
+                    end = _RAW_END[tag].search(html, pos)
+                    if not end:
+                        pos = n
+                        break
+                    self._pop_to(tag, end.start())
+                    pos = end.end()
+                continue
+
+            if m.group("cdata") is not None:
+                self._text(m.group("cdata"))
+                self._flush()
+
+        self._flush()
+        end = len(html)
+        while len(self._stack) > 1:
+            self._close(self._stack.pop(), end)
+        self._close(0, end)
+
+    def _open(self, tag, attrs, offset):
+        if tag == "img" and "alt" in attrs:
+            self.imgs.append((attrs["alt"].strip(), attrs.get("data-original") or attrs.get("src"), self._stack[-1]))
+
+        idx = len(self.names)
+        self.names.append(tag)
+        self.classes.append(attrs.get("class", "").split())
+        self.parents.append(self._stack[-1])
+        self.starts.append(offset)
+        self.ends.append(None)
+        self.first_str.append(len(self.strings))
+        self.end_str.append(None)
+        self.last_desc.append(idx)
+        if tag == "h4": self.h4s.append(idx)
+        self._stack.append(idx)
+        if tag in NON_TEXT_ELEMENTS: self._non_text_depth += 1
+
+    def _pop_to(self, tag, offset):
+        stack = self._stack
+        names = self.names
+        for pos in range(len(stack) - 1, 0, -1):
+            if names[stack[pos]] == tag: break
+        else:
+            return
+        while len(stack) > pos:
+            self._close(stack.pop(), offset)
+
+    def _close(self, idx, offset):
+        self.ends[idx] = offset
+        self.end_str[idx] = len(self.strings)
+        self.last_desc[idx] = len(self.names) - 1
+        if self.names[idx] in NON_TEXT_ELEMENTS: self._non_text_depth -= 1
+
+# -------------------- EXTRACTION --------------------
+def extract_tiles(html):
+    # Returns the product tiles of a page in <img> document order,
+    # or None when the page has no <img alt> at all.
+    p = _PageTree(html)
+    if not p.imgs: return None
+
+    strings = p.strings
+    # yen_before[i]: number of strings before i that contain the price mark,
+    # so "does this element's text contain 円" is a constant-time lookup
+    yen_before = [0]
+    for s in strings:
+        yen_before.append(yen_before[-1] + (PRICE_MARK in s))
+
+    names, classes, parents = p.names, p.classes, p.parents
+    first_str, end_str = p.first_str, p.end_str
+    resolved = {}
+
+    def container_of(parent):
+        # Nearest div/li ancestor that is a product tile or shows a price
+        chain = []
+        idx = parent
+        found = None
+        while idx >= 0:
+            if idx in resolved:
+                found = resolved[idx]
+                break
+            chain.append(idx)
+            if names[idx] in CONTAINER_TAGS:
+                cls = classes[idx]
+                if any(c in cls for c in CONTAINER_CLASSES) or yen_before[end_str[idx]] > yen_before[first_str[idx]]:
+                    found = idx
+                    break
+            idx = parents[idx]
+        for c in chain: resolved[c] = found
+        return found
+
+    texts = {}
+    def text_of(idx):
+        if idx not in texts:
+            texts[idx] = " ".join(strings[first_str[idx]:end_str[idx]])
+        return texts[idx]
+
+    tiles = []
+    for alt, image, parent in p.imgs:
+        container = container_of(parent)
+        if container is None: container = parent
+
+        name = None
+        pos = bisect.bisect_right(p.h4s, container)
+        if pos < len(p.h4s) and p.h4s[pos] <= p.last_desc[container]:
+            name = text_of(p.h4s[pos])
+
+        tiles.append(Tile(
+            alt,
+            image,
+            html[p.starts[container]:p.ends[container]],
+            text_of(container),
+            name,
+        ))
+    return tiles
+
+def page_count(html):
+    # Highest page number linked from the page (0 when there is no pagination)
+    return max((int(n) for n in _PAGE_LINK.findall(html)), default=0)
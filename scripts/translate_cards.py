@@ -1,97 +1,344 @@
-
+import argparse
 import json
 import os
+import random
+import re
+import threading
 import time
-from deep_translator import GoogleTranslator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Config
-FILE_PATH = r'c:\Users\Noemi\OneDrive\Desktop\Projects\OPTCG\optcg-ph-hub\src\data\cards.json'
-CACHE_PATH = r'c:\Users\Noemi\OneDrive\Desktop\Projects\OPTCG\optcg-ph-hub\scripts\translation_cache.json'
+import run_metrics
+from cards_file import iter_records, write_records
+from flat_builder import changed_ids, load_changes
+from rate_limiter import RateController
 
-def load_json(path):
-    if not os.path.exists(path): return []
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+# Config
+PROJECT_ROOT = os.getcwd()
+FILE_PATH = os.path.join(PROJECT_ROOT, 'src', 'data', 'cards.json')
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'translation_cache.json')
+BATCH_SIZE = 20
+CONCURRENCY = 4      # batches in flight at once
+MAX_RETRIES = 4      # attempts per batch after the first one
+BACKOFF = 2.0        # seconds; doubled per retry, with full jitter
+RATE = 4.0           # starting batch requests per second; adapts to the backend
 
 def save_json(data, path):
     with open(path, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
 
-def main():
-    print("Loading cards...")
-    cards = load_json(FILE_PATH)
-    if not cards:
-        print("No cards found.")
-        return
+# -------------------- CACHE --------------------
+# translation_cache.json plus an append-only journal next to it. New
+# translations are appended to the journal as one JSON line each, so saving
+# is O(batch) instead of rewriting the whole cache; compact() folds the
+# journal back into translation_cache.json on exit. A journal left by a
+# crashed run is replayed on the next load (a torn last line is ignored).
+class TranslationCache:
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                print(f"Could not read {path}, starting with an empty cache.")
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        original, translated = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries[original] = translated
+                    self._dirty = True
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def __contains__(self, original):
+        return original in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, original, default=None):
+        return self.entries.get(original, default)
+
+    def add_many(self, pairs):
+        with self._lock:
+            for original, translated in pairs:
+                self.entries[original] = translated
+                self._journal.write(json.dumps([original, translated], ensure_ascii=False) + '\n')
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._dirty = True
+
+    def compact(self):
+        with self._lock:
+            if self._dirty:
+                tmp = self.path + '.tmp'
+                save_json(self.entries, tmp)
+                os.replace(tmp, self.path)
+            self._journal.close()
+            os.remove(self.journal_path)
+
+def needs_translation(name):
+    # Simple heuristic: if it has non-ascii, assume it needs translation
+    return any(ord(c) > 128 for c in name)
+
+# -------------------- BACKENDS --------------------
+# A backend is any object with translate_batch(list_of_ja) -> list_of_en.
+class GoogleBackend:
+    def __init__(self):
+        # Imported here so the stub backend works without deep-translator
+        from deep_translator import GoogleTranslator
+        self._local = threading.local()
+        self._factory = lambda: GoogleTranslator(source='ja', target='en')
+
+    def translate_batch(self, batch):
+        # One translator per worker thread
+        if not hasattr(self._local, 'translator'):
+            self._local.translator = self._factory()
+        return self._local.translator.translate_batch(batch)
+
+class StubBackend:
+    # Offline stand-in for tests: deterministic, no network
+    def __init__(self, fail_rate=0.0, delay=0.0):
+        self.fail_rate = fail_rate
+        self.delay = delay
+        self.calls = 0
+
+    def translate_batch(self, batch):
+        self.calls += 1
+        if self.delay: time.sleep(self.delay)
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise ConnectionError('stub backend failure')
+        return [f'[en] {name}' for name in batch]
+
+BACKENDS = {'google': GoogleBackend, 'stub': StubBackend}
 
-    # Load cache
-    translation_cache = {}
-    if os.path.exists(CACHE_PATH):
+# -------------------- NAME DECOMPOSITION --------------------
+# Product names are a card name plus trailing tags, e.g.
+#   キャロット(パラレル/箔押し)  ->  キャロット + [[パラレル, 箔押し]]
+# Only the base name goes to the translator; the tags come from this fixed
+# dictionary (the same keywords scrape_cards.VARIANTS classifies on), so
+# every parallel/foil/promo print of a card shares one cache entry.
+SUFFIX_TOKENS = {
+    'パラレル': 'Parallel',
+    'スーパーパラレル': 'Super Parallel',
+    '特別パラレル': 'Special Parallel',
+    '金パラレル': 'Gold Parallel',
+    '銀パラレル': 'Silver Parallel',
+    'SPパラレル': 'SP Parallel',
+    'リーダーパラレル': 'Leader Parallel',
+    '箔押し': 'Foil Stamped',
+    'ラメフォイル': 'Lamé Foil',
+    '海賊旗フォイル': 'Pirate Flag Foil',
+    'ホロなし': 'No Holo',
+    '刻印あり': 'Engraved',
+    '刻印なし': 'No Engraving',
+    'コミック': 'Manga',
+    'シリアル': 'Serial',
+    'サイン': 'Signed',
+    '手配書': 'Wanted Poster',
+    '書き下ろし': 'Original Art',
+    'フラッグシップバトル': 'Flagship Battle',
+    'チャンピオンシップ': 'Championship',
+    '優勝': 'Winner',
+    'ベスト8': 'Top 8',
+    '記念品': 'Commemorative',
+    'ONE PIECE FILM RED入場者プレゼント': 'ONE PIECE FILM RED Admission Gift',
+}
+# Tags with a number or date in them
+SUFFIX_PATTERNS = [
+    (re.compile(r'プロモーションパック\s*(EX\s*)?Vol\.\s*(\d+)'), lambda m: f"Promotion Pack {'EX ' if m.group(1) else ''}Vol.{m.group(2)}"),
+    (re.compile(r'スタンダードバトルパック\s*Vol\.\s*(\d+)'), lambda m: f"Standard Battle Pack Vol.{m.group(1)}"),
+    (re.compile(r'プロモーションカードセット(\d{4})ゲットキャンペーン'), lambda m: f"Promotion Card Set {m.group(1)} Campaign"),
+    (re.compile(r'交流会\s*(\d{4})年(\d{1,2})月開催記念品'), lambda m: f"Exchange Event {m.group(1)}/{int(m.group(2)):02d} Gift"),
+    # Already English (PRB, PRB2, 3rd ANNIVERSARY SET, Live Action Edition, ...)
+    (re.compile(r"[\x20-\x7e]+"), lambda m: m.group(0).strip()),
+]
+_TRAILING_GROUP = re.compile(r'[(（]([^()（）]*)[)）]\s*$')
+
+def translate_token(token):
+    token = token.strip()
+    if token in SUFFIX_TOKENS: return SUFFIX_TOKENS[token]
+    for pattern, fmt in SUFFIX_PATTERNS:
+        m = pattern.fullmatch(token)
+        if m: return fmt(m)
+    return None
+
+def decompose_name(name):
+    # -> (base name, [[suffix token, ...] per trailing group]). Groups are
+    # peeled off from the end while every token in them is known; anything
+    # else (e.g. ドン!!カード(サボ)) stays part of the base name.
+    base = name.strip()
+    groups = []
+    while True:
+        m = _TRAILING_GROUP.search(base)
+        if not m or m.start() == 0: break
+        tokens = re.split(r'[/／]', m.group(1))
+        if not all(translate_token(t) for t in tokens): break
+        groups.insert(0, [t.strip() for t in tokens])
+        base = base[:m.start()].rstrip()
+    return base, groups
+
+def compose_name(base_en, groups):
+    return base_en + ''.join(f" ({'/'.join(translate_token(t) for t in g)})" for g in groups)
+
+def resolve_name(name, cache):
+    # English name from the cache, or None. A full-name entry (written
+    # before names were decomposed) still counts as a hit.
+    if name in cache: return cache.get(name)
+    base, groups = decompose_name(name)
+    if base in cache: return compose_name(cache.get(base), groups)
+    if not needs_translation(base): return compose_name(base, groups) if groups else None
+    return None
+
+# -------------------- TRANSLATION --------------------
+def translate_with_retry(backend, batch, retries=MAX_RETRIES, backoff=BACKOFF, limiter=None):
+    # Requests are paced by the shared rate controller; a failed batch slows
+    # it down and is retried after a jittered backoff
+    limiter = limiter or RateController(initial_rate=RATE, retries=retries, backoff=backoff)
+    for attempt in range(retries + 1):
+        limiter.wait('translate')
+        t0 = time.perf_counter()
         try:
-            with open(CACHE_PATH, 'r', encoding='utf-8') as f:
-                translation_cache = json.load(f)
-        except:
-             translation_cache = {}
-            
-    print(f"Loaded {len(translation_cache)} cached translations.")
-
-    # Identify unique names needing translation
-    unique_names = set()
-    for card in cards:
-        # Check if name contains Japanese characters (basic range check)
-        name = card.get('base_name', '')
-        if not name: continue
-        
-        # Simple heuristic: if it has non-ascii, assume it needs translation
-        # (or specifically checked against cache)
-        if name not in translation_cache:
-            if any(ord(c) > 128 for c in name):
-                unique_names.add(name)
-
-    print(f"Found {len(unique_names)} new unique names to translate.")
-    
-    if not unique_names:
-        print("All names are already translated or cached.")
-    else:
-        translator = GoogleTranslator(source='ja', target='en')
-        names_list = list(unique_names)
-        
-        # Deep translator handles batching internally for some, but let's be safe with manual batching
-        # GoogleTranslator usually accepts a list
-        batch_size = 20 
-        
-        for i in range(0, len(names_list), batch_size):
-            batch = names_list[i:i+batch_size]
-            print(f"Translating batch {i//batch_size + 1}/{(len(names_list)//batch_size) + 1}...")
-            
+            translations = backend.translate_batch(batch)
+            if len(translations) != len(batch) or any(t is None for t in translations):
+                raise ValueError(f'got {len(translations)} translations for {len(batch)} names')
+            limiter.feedback('translate', 200, time.perf_counter() - t0)
+            return translations
+        except Exception as e:
+            limiter.feedback('translate', None, time.perf_counter() - t0)
+            if attempt == retries: raise
+            run_metrics.current().swallowed('translate_batch', e)
+            run_metrics.current().count('translation_retries')
+            delay = limiter.retry_delay(attempt)
+            print(f"  Batch failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+def translate_names(names, backend, cache, batch_size=BATCH_SIZE, concurrency=CONCURRENCY,
+                    retries=MAX_RETRIES, backoff=BACKOFF):
+    # Translates `names` into the cache with a bounded pool of batch requests.
+    # Returns the batches that still failed after every retry.
+    batches = [names[i:i+batch_size] for i in range(0, len(names), batch_size)]
+    limiter = RateController(initial_rate=RATE, retries=retries, backoff=backoff)
+    failed = []
+    done = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(translate_with_retry, backend, b, retries, backoff, limiter): b for b in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            done += 1
             try:
-                # deep-translator translate_batch
-                translations = translator.translate_batch(batch)
-                
-                for original, translated in zip(batch, translations):
-                    translation_cache[original] = translated
-                    
-                # Save cache periodically
-                with open(CACHE_PATH, 'w', encoding='utf-8') as f:
-                    json.dump(translation_cache, f, indent=2, ensure_ascii=False)
-                    
-                time.sleep(1) # Rate limit politeness
+                cache.add_many(zip(batch, future.result()))
+                print(f"Translated batch {done}/{len(batches)}")
             except Exception as e:
-                print(f"Error in batch: {e}")
-                time.sleep(5) 
-                continue
-
-    # Apply translations
-    print("Applying translations to cards...")
-    applied_count = 0
-    for card in cards:
-        original = card.get('base_name', '')
-        if original in translation_cache:
-            card['base_name'] = translation_cache[original]
-            applied_count += 1
-            
-    save_json(cards, FILE_PATH)
-    print(f"Done. Updated {applied_count} cards.")
+                print(f"Batch {done}/{len(batches)} failed after {retries} retries: {e}")
+                failed.append(batch)
+    return failed
+
+def apply_translation(card, cache):
+    # Rewrites base_name of one card if its translation is cached; returns
+    # whether it did
+    original = card.get('base_name', '')
+    if not original or not needs_translation(original): return False
+    translated = resolve_name(original, cache)
+    if translated is None: return False
+    # Keep the Japanese name for search (search_index.py)
+    card.setdefault('name_ja', original)
+    card['base_name'] = translated
+    return True
+
+def apply_translations(cards, cache):
+    # In place; returns the number of cards updated
+    return sum(apply_translation(card, cache) for card in cards)
+
+def main(cards_path=FILE_PATH, cache_path=CACHE_PATH, backend='google', batch_size=BATCH_SIZE,
+         concurrency=CONCURRENCY, only_changed=False):
+    metrics = run_metrics.current()
+    if not os.path.exists(cards_path):
+        print("No cards found.")
+        return True
+
+    cache = TranslationCache(cache_path)
+    print(f"Loaded {len(cache)} cached translations.")
+
+    try:
+        # Identify unique base names needing translation. cards.json is
+        # streamed (cards_file.py), so only the names are kept in memory. With
+        # --changed only the records added or updated by the last scrape are
+        # looked at; the cached translations are still applied to every card.
+        ids = None
+        if only_changed:
+            changes = load_changes()
+            if changes is None:
+                print("No change list from a scrape yet, looking at every card.")
+            else:
+                ids = changed_ids(changes)
+        print("Reading card names...")
+        names = set()
+        total = looked_at = 0
+        with metrics.stage('load'):
+            for card in iter_records(cards_path):
+                total += 1
+                if ids is not None and card.get('unique_id') not in ids: continue
+                looked_at += 1
+                if card.get('base_name'): names.add(card['base_name'])
+        if not total:
+            print("No cards found.")
+            return True
+        if ids is not None: print(f"Looked at the {looked_at} cards changed by the last scrape.")
+        unique_names = sorted({
+            decompose_name(name)[0] for name in names
+            if needs_translation(name) and resolve_name(name, cache) is None
+        })
+        print(f"Found {len(unique_names)} new unique base names to translate "
+              f"(from {sum(needs_translation(n) for n in names)} distinct names).")
+
+        failed = []
+        if not unique_names:
+            print("All names are already translated or cached.")
+        else:
+            with metrics.stage('translate'):
+                failed = translate_names(unique_names, BACKENDS[backend](), cache, batch_size, concurrency)
+            metrics.count('names_requested', len(unique_names))
+            metrics.count('batches_failed', len(failed))
+            if failed:
+                print(f"{sum(len(b) for b in failed)} names in {len(failed)} batches could not be translated; "
+                      f"they stay untranslated until the next run.")
+
+        # Apply translations, streaming cards.json into its replacement
+        print("Applying translations to cards...")
+        applied_count = 0
+        def translated():
+            nonlocal applied_count
+            for card in iter_records(cards_path):
+                applied_count += apply_translation(card, cache)
+                yield card
+        with metrics.stage('apply'):
+            write_records(translated(), cards_path)
+        metrics.count('records_updated', applied_count)
+        print(f"Done. Updated {applied_count} cards.")
+        return not failed
+    finally:
+        cache.compact()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Translate Japanese card names in cards.json")
+    parser.add_argument('--cards', default=FILE_PATH, help="Path of cards.json")
+    parser.add_argument('--cache', default=CACHE_PATH, help="Path of translation_cache.json")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='google')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--changed', action='store_true', help="Only look for new names in cards changed by the last scrape")
+    args = parser.parse_args()
+
+    run_metrics.start('translate')
+    try:
+        ok = main(args.cards, args.cache, args.backend, args.batch_size, args.concurrency, args.changed)
+    finally:
+        run_metrics.finish()
+    raise SystemExit(0 if ok else 1)
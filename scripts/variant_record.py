@@ -0,0 +1,63 @@
+import sys
+
+# One scraped listing, as held in the master dict ({code: [Variant, ...]})
+# until build_flat_database flattens it.
+#
+# A full run keeps tens of thousands of these alive at once. A slotted object
+# has no per-instance dict and its field names are stored once on the class;
+# the strings that repeat across variants (labels, rarities, card names,
+# listing page URLs, images shared by set and search pages) are interned so
+# each distinct value exists once. to_dict()/from_dict() convert to and from
+# the plain dict shape variants had before (scrape_checkpoint.py stores that).
+
+FIELDS = ("label", "name", "rarity", "price", "rank", "is_high_rarity", "image", "source_url")
+
+# Labels classify_variant (scrape_cards.py) falls back to when no keyword
+# matched. They follow the price and the listing's position on the page, so
+# they can change between scrapes of the same listing.
+BASE_LABEL = "Base / Normal"
+HIGH_VALUE_LABEL = "High Value Variant (Unknown Type)"
+UNMARKED_LABEL = "Parallel (Unmarked)"
+INDEX_LABEL = "Variant #{}"
+
+def keyword_label(label):
+    # The label if a keyword gave it, BASE_LABEL for any fallback
+    if not label or label in (HIGH_VALUE_LABEL, UNMARKED_LABEL) or label.startswith(INDEX_LABEL.format("")):
+        return BASE_LABEL
+    return label
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+class Variant:
+    __slots__ = FIELDS + ("sources",)
+
+    def __init__(self, label, name, rarity, price, rank, is_high_rarity, image, source_url, sources=None):
+        self.label = _intern(label)
+        self.name = _intern(name)
+        self.rarity = _intern(rarity)
+        self.price = price
+        self.rank = rank
+        self.is_high_rarity = bool(is_high_rarity)
+        self.image = _intern(image)
+        self.source_url = _intern(source_url)
+        # Listing pages this variant was found on; filled in by merge_into
+        self.sources = [_intern(url) for url in sources] if sources is not None else None
+
+    def to_dict(self):
+        d = {field: getattr(self, field) for field in FIELDS}
+        if self.sources is not None: d["sources"] = list(self.sources)
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(*(d.get(field) for field in FIELDS), sources=d.get("sources"))
+
+    def __eq__(self, other):
+        if not isinstance(other, Variant): return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Variant({self.label!r}, {self.price}, {self.image!r})"
@@ -5,6 +5,7 @@ import { Search, Filter, Layers, CheckSquare, Square, Plus, Minus, Wallet, Trash
 import CardGroup from '@/src/components/CardGroup';
 import CollectionCard from '@/src/components/CollectionCard';
 import cardRawData from '@/src/data/cards.json';
+import idMigrations from '@/src/data/id_migrations.json';
 
 // --- TYPES ---
 interface FlatCard {
@@ -142,8 +143,17 @@ export default function Home() {
           changesMade = true;
           console.warn(`[Portfolio Healing] ID '${id}' not found. Attempting to re-bind...`);
 
+          // IDs renamed by the scraper map straight to the current ID
+          // (scripts/flat_builder.py, save_migrations)
+          const migratedId = (idMigrations as Record<string, string>)[id];
+          if (migratedId && flatCards.some(c => c.unique_id === migratedId)) {
+            console.log(`[Portfolio Healing] Re-bound '${id}' to '${migratedId}'`);
+            newPortfolio[migratedId] = (newPortfolio[migratedId] || 0) + qty;
+            return;
+          }
+
           // Extract Code and Variant info from the stale ID if possible
-          // Format: CODE-SLUG-INDEX
+          // Format: CODE-SLUG-INDEX (before the CODE-SLUG-HASH IDs)
           // We can try to match by CODE and SLUG
           const pieces = id.split('-');
           if (pieces.length >= 3) {
@@ -152,8 +162,10 @@ export default function Home() {
             // Heuristic attempt to find match by base ID
             const idBase = id.replace(/-\d+$/, '');
 
-            // Look for any card whose unique_id starts with this base
-            const heuristicsMatch = flatCards.find(c => c.unique_id.startsWith(idBase));
+            // Only re-bind when a single card is left under this base;
+            // with several variants there is no telling which one it was
+            const candidates = flatCards.filter(c => c.unique_id.startsWith(`${idBase}-`));
+            const heuristicsMatch = candidates.length === 1 ? candidates[0] : undefined;
 
             if (heuristicsMatch) {
               console.log(`[Portfolio Healing] Re-bound '${id}' to '${heuristicsMatch.unique_id}'`);